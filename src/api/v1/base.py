@@ -1,20 +1,32 @@
+import asyncio
+import calendar
 import mimetypes
 import os
 import uuid
-from datetime import timedelta
-from typing import Annotated
+from dataclasses import replace
+from datetime import datetime, timedelta
+from typing import Annotated, AsyncIterator, List, Literal, Optional, Tuple
+from urllib.parse import quote
 
-import aiofiles
-from fastapi import APIRouter, Depends, Form, HTTPException, UploadFile, status
+import orjson
+
+from fastapi import (
+    APIRouter, BackgroundTasks, Depends, Form, HTTPException, Path, Query,
+    Request, Response, UploadFile, status
+)
 from fastapi.responses import StreamingResponse
 from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from db.db import get_session
+from core.config import app_settings
+from core.metrics import stage, track_transfer
+from db.db import engine, get_session
 from exceptions.api import (
-    DatabaseConnectionError, FileError, FilePathError, FileTypeError
+    CursorExpiredError, DatabaseConnectionError, FileError, FilePathError,
+    FileTypeError, UploadSessionNotFoundError
 )
-from exceptions.auth import AuthError
+from exceptions.auth import AuthError, CredentialException
 from exceptions.dp import UserAlreadyExist
 from models import base as models
 from schemas import base as schemas
@@ -22,13 +34,26 @@ from services.auth import (
     ACCESS_TOKEN_EXPIRE_DAYS, authenticate_user,
     create_access_token, get_current_user
 )
-from services.db import db_ping, file_crud, user_crud
-
-
-FILE_STORAGE = os.path.join(
-    os.path.dirname(os.path.abspath(__name__)),
-    'users_files'
+from services.changes import change_notifier
+from services.db import (
+    decode_cursor, encode_cursor, file_change_crud, file_crud, folder_crud,
+    upload_session_crud, user_crud
+)
+from services.archive import ArchiveEntry, iter_tar_gz, iter_zip
+from services.compression import choose_encoding
+from services.download import file_response
+from services.health import health_checker
+from services.http_cache import (
+    http_date, is_not_modified, not_modified_response
 )
+from services.jobs import job_queue
+from services.previews import FORMATS, PREVIEW_SIZES, preview_generator
+from services.storage import (
+    StagedFile, blob_key, blob_writer, delete_parts, discard_upload,
+    iter_parts, legacy_key, part_key, preview_key, stage_stream, stage_upload,
+    storage
+)
+
 
 router = APIRouter()
 
@@ -37,15 +62,18 @@ router = APIRouter()
     '/ping',
     status_code=status.HTTP_200_OK,
     response_model=schemas.Ping,
-    description='Проверка доступности базы данных'
+    description='Время доступа к базе данных, хранилищу файлов и кэшу, '
+                'а также состояние пула соединений'
 )
-async def ping(
-    db: AsyncSession = Depends(get_session)
-) -> schemas.Ping:
-    ping = await db_ping(db)
-    if ping:
-        return schemas.Ping(db=ping)
-    raise DatabaseConnectionError
+async def ping() -> schemas.Ping:
+    services = await health_checker.check()
+    if not services['db'].ok:
+        raise DatabaseConnectionError
+    return schemas.Ping(
+        **{name: service.latency for name, service in services.items()},
+        services=services,
+        pool=engine.pool.stats()
+    )
 
 
 @router.post(
@@ -93,7 +121,9 @@ async def get_access_token(
         raise AuthError
     access_token_expires = timedelta(days=ACCESS_TOKEN_EXPIRE_DAYS)
     access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
+        data={"sub": user.username},
+        expires_delta=access_token_expires,
+        user=user if app_settings.token_embed_user_claims else None
     )
     return schemas.Token(
         access_token=access_token,
@@ -101,6 +131,55 @@ async def get_access_token(
     )
 
 
+def _resolve_path(
+    file_type: Optional[str],
+    path: str,
+    filename: Optional[str]
+) -> str:
+    """
+        Проверяет MIME-тип файла и возвращает полный путь
+        к файлу в системе MyDisk.
+    """
+    if not file_type:
+        raise FileTypeError
+    if not mimetypes.guess_all_extensions(file_type, strict=False):
+        raise FileTypeError
+
+    file_type_in_path = mimetypes.guess_type(path, strict=False)[0]
+    if (
+        file_type_in_path
+        and file_type_in_path != file_type
+    ):
+        raise FileTypeError
+
+    if file_type_in_path:
+        return path
+    if not filename:
+        raise FileError
+    return os.path.join(path, filename)
+
+
+def _resolve_upload_path(file_in: UploadFile, path: str) -> str:
+    if not file_in.size:
+        raise FileError
+    return _resolve_path(file_in.content_type, path, file_in.filename)
+
+
+def _to_file_in_db(file: models.File) -> schemas.FileInDB:
+    return schemas.FileInDB(
+        id=file.uuid,
+        name=file.path.split('/')[-1],
+        created_at=file.created_at,
+        path=file.path,
+        size=file.size,
+        is_downloadable=file.is_downloadable,
+        mime_type=file.mime_type,
+        stored_size=file.stored_size,
+        content_encoding=file.content_encoding,
+        processing_status=file.processing_status
+    )
+
+
 @router.post(
     '/files/upload',
     status_code=status.HTTP_201_CREATED,
@@ -122,59 +201,356 @@ async def upload_file(
         - **path**: расположение файла в системе MyDisk. Может содержать
         путь к каталог или полный путь к файлу. 
     """
-    if not file_in.size:
-        raise FileError
-    if not (file_type := file_in.content_type):
-        raise FileTypeError  
-    if not mimetypes.guess_all_extensions(file_type, strict=False):
-        raise FileTypeError
+    path = _resolve_upload_path(file_in, path)
+    with track_transfer('upload'):
+        with stage('stage_upload'):
+            staged = await stage_upload(file_in)
 
-    file_type_in_path = mimetypes.guess_type(path, strict=False)[0]
-    if (
-        file_type_in_path
-        and file_type_in_path != file_type
-    ):
-        raise FileTypeError  
+    file = schemas.File(
+        path=path,
+        size=staged.size,
+        user_id=current_user.id,
+        uuid=uuid.uuid4().hex,
+        mime_type=file_in.content_type,
+        blob_digest=staged.digest,
+        stored_size=staged.stored_size,
+        content_encoding=staged.encoding
+    )
 
-    if file_type_in_path:
-        splited_path = path.split('/')
-        file_name = splited_path[-1]
-        catalog = '/'.join(splited_path[:-1])
-    else:
-        file_name = file_in.filename
-        if not file_name:
-            raise Exception
-        catalog = path
-        path = os.path.join(path, file_name)
+    try:
+        with stage('create_or_update'):
+            file_in_db, _ = await file_crud.create_or_update(
+                db=db,
+                obj_in=file,
+                write_blobs=blob_writer([staged]),
+                enqueue_jobs=job_queue.enqueue
+            )
+    except BaseException:
+        await discard_upload(staged.tmp_path)
+        raise
+    job_queue.wake()
+
+    return _to_file_in_db(file_in_db)
+
+
+@router.post(
+    '/files/upload/batch',
+    status_code=status.HTTP_201_CREATED,
+    response_model=List[schemas.FileInDB]
+)
+async def upload_files_batch(
+    files_in: List[UploadFile],
+    paths: Annotated[List[str], Form()],
+    current_user: Annotated[schemas.FullUser, Depends(get_current_user)],
+    db: AsyncSession = Depends(get_session)
+) -> List[schemas.FileInDB]:
+    """
+        Пакетная загрузка файлов. В заголовке запроса
+        необходимо указать токен:
+        - Authorization: Bearer <token>
+        Запрос должен содердать форму с двумя полями:
+
+        - **files_in**: список файлов.
+        - **paths**: список путей в системе MyDisk, по одному
+        на каждый файл в том же порядке. Пути не должны повторяться.
+
+        Файлы записываются на диск параллельно, записи о них
+        сохраняются в базу данных одной транзакцией.
+    """
+    if not files_in or len(files_in) != len(paths):
+        raise FileError(detail='Number of files and paths must match')
+    paths = [
+        _resolve_upload_path(file_in, path)
+        for file_in, path in zip(files_in, paths)
+    ]
+    if len(set(paths)) != len(paths):
+        raise FileError(detail='Paths must be unique')
+
+    semaphore = asyncio.Semaphore(app_settings.upload_batch_concurrency)
+
+    async def stage_one(file_in: UploadFile) -> StagedFile:
+        async with semaphore:
+            return await stage_upload(file_in)
+
+    with track_transfer('upload'), stage('stage_upload_batch'):
+        results = await asyncio.gather(
+            *(stage_one(file_in) for file_in in files_in),
+            return_exceptions=True
+        )
+    staged = [result for result in results if isinstance(result, StagedFile)]
+    errors = [
+        result for result in results if isinstance(result, BaseException)
+    ]
+    if errors:
+        for staged_file in staged:
+            await discard_upload(staged_file.tmp_path)
+        raise errors[0]
+
+    try:
+        with stage('bulk_create_or_update'):
+            files_in_db = await file_crud.bulk_create_or_update(
+                db=db,
+                objs_in=[
+                    schemas.File(
+                        path=path,
+                        size=staged_file.size,
+                        user_id=current_user.id,
+                        uuid=uuid.uuid4().hex,
+                        mime_type=file_in.content_type,
+                        blob_digest=staged_file.digest,
+                        stored_size=staged_file.stored_size,
+                        content_encoding=staged_file.encoding
+                    ) for file_in, path, staged_file in zip(
+                        files_in, paths, staged
+                    )
+                ],
+                write_blobs=blob_writer(staged),
+                enqueue_jobs=job_queue.enqueue
+            )
+    except BaseException:
+        for staged_file in staged:
+            await discard_upload(staged_file.tmp_path)
+        raise
+    job_queue.wake()
+
+    return [_to_file_in_db(file) for file in files_in_db]
+
+
+def _to_upload_session(
+    session: models.UploadSession
+) -> schemas.UploadSession:
+    return schemas.UploadSession(
+        upload_id=session.uuid,
+        path=session.path,
+        mime_type=session.mime_type,
+        created_at=session.created_at,
+        expires_at=session.expires_at,
+        parts=[
+            schemas.UploadPart(part_number=part.part_number, size=part.size)
+            for part in session.parts
+        ]
+    )
 
+
+def _part_list(
+    session: models.UploadSession
+) -> List[Tuple[int, int, datetime]]:
+    return [
+        (part.part_number, part.size, part.created_at)
+        for part in session.parts
+    ]
+
+
+@router.post(
+    '/files/uploads',
+    status_code=status.HTTP_201_CREATED,
+    response_model=schemas.UploadSession
+)
+async def create_upload_session(
+    session_in: schemas.UploadSessionCreate,
+    current_user: Annotated[schemas.FullUser, Depends(get_current_user)],
+    db: AsyncSession = Depends(get_session)
+) -> schemas.UploadSession:
+    """
+        Создает сессию загрузки для больших файлов. В заголовке
+        запроса необходимо указать токен:
+        - Authorization: Bearer <token>
+        Тело запроса:
+        - **path**: расположение файла в системе MyDisk.
+        - **content_type**: MIME-тип файла.
+        - **filename**: имя файла, если **path** указывает на каталог.
+
+        Части файла загружаются запросами
+        PUT /files/uploads/{upload_id}/parts/{part_number} в любом
+        порядке и параллельно, после чего сессия завершается запросом
+        POST /files/uploads/{upload_id}/complete. Незавершенные сессии
+        удаляются по истечении expires_at, каждая загруженная часть
+        продлевает срок жизни сессии.
+    """
+    path = _resolve_path(
+        session_in.content_type, session_in.path, session_in.filename
+    )
+    session = await upload_session_crud.create(
+        db,
+        user_id=current_user.id,
+        path=path,
+        mime_type=session_in.content_type,
+        ttl=app_settings.upload_session_ttl
+    )
+    return _to_upload_session(session)
+
+
+@router.get(
+    '/files/uploads/{upload_id}',
+    status_code=status.HTTP_200_OK,
+    response_model=schemas.UploadSession
+)
+async def get_upload_session(
+    upload_id: str,
+    current_user: Annotated[schemas.FullUser, Depends(get_current_user)],
+    db: AsyncSession = Depends(get_session)
+) -> schemas.UploadSession:
+    """
+        Возвращает состояние сессии загрузки и список уже полученных
+        частей — по нему клиент определяет, какие части нужно
+        отправить повторно после обрыва соединения.
+    """
+    session = await upload_session_crud.get(db, current_user.id, upload_id)
+    if not session:
+        raise UploadSessionNotFoundError
+    return _to_upload_session(session)
+
+
+@router.put(
+    '/files/uploads/{upload_id}/parts/{part_number}',
+    status_code=status.HTTP_200_OK,
+    response_model=schemas.UploadPart
+)
+async def upload_part(
+    request: Request,
+    upload_id: str,
+    part_number: Annotated[int, Path(ge=1, le=10000)],
+    current_user: Annotated[schemas.FullUser, Depends(get_current_user)],
+    db: AsyncSession = Depends(get_session)
+) -> schemas.UploadPart:
+    """
+        Загружает часть файла. Тело запроса — содержимое части
+        без какой-либо обертки. Части нумеруются с 1, повторная
+        загрузка части с тем же номером заменяет предыдущую.
+    """
+    session = await upload_session_crud.get(db, current_user.id, upload_id)
+    if not session:
+        raise UploadSessionNotFoundError
+    session_id = session.id
+    # Соединение с базой не удерживается на время загрузки части.
+    await db.rollback()
+
+    size = 0
+
+    async def iterbody() -> AsyncIterator[bytes]:
+        nonlocal size
+        async for chunk in request.stream():
+            size += len(chunk)
+            yield chunk
+
+    key = part_key(upload_id, part_number)
+    with track_transfer('upload'), stage('upload_part'):
+        await storage.put(key, iterbody())
+    if not size:
+        await storage.delete(key)
+        raise FileError(detail='Part is empty')
+
+    try:
+        await upload_session_crud.add_part(
+            db,
+            session_id,
+            part_number=part_number,
+            size=size,
+            ttl=app_settings.upload_session_ttl
+        )
+    except IntegrityError:
+        # Сессия завершена или удалена, пока загружалась часть.
+        await storage.delete(key)
+        raise UploadSessionNotFoundError
+    return schemas.UploadPart(part_number=part_number, size=size)
+
+
+@router.post(
+    '/files/uploads/{upload_id}/complete',
+    status_code=status.HTTP_201_CREATED,
+    response_model=schemas.FileInDB
+)
+async def complete_upload_session(
+    upload_id: str,
+    current_user: Annotated[schemas.FullUser, Depends(get_current_user)],
+    db: AsyncSession = Depends(get_session)
+) -> schemas.FileInDB:
+    """
+        Собирает файл из загруженных частей. Части должны иметь
+        номера от 1 до N без пропусков. Запись о файле создается
+        и сессия удаляется в одной транзакции.
+
+        Сборка идет без открытой транзакции, после нее сессия
+        блокируется и проверяется, что список частей не изменился.
+    """
+    session = await upload_session_crud.get(db, current_user.id, upload_id)
+    if not session:
+        raise UploadSessionNotFoundError
+    parts = _part_list(session)
+    part_numbers = [part_number for part_number, _, _ in parts]
+    if not part_numbers or part_numbers != list(
+        range(1, len(part_numbers) + 1)
+    ):
+        raise FileError(detail='Parts must be numbered from 1 without gaps')
+    path, mime_type = session.path, session.mime_type
+    # Соединение с базой не удерживается на время сборки файла.
+    await db.rollback()
+
+    with stage('assemble_parts'):
+        staged = await stage_stream(
+            iter_parts(upload_id, part_numbers),
+            choose_encoding(mime_type)
+        )
     file = schemas.File(
         path=path,
-        size=file_in.size,
+        size=staged.size,
         user_id=current_user.id,
-        uuid=uuid.uuid4().hex
+        uuid=uuid.uuid4().hex,
+        mime_type=mime_type,
+        blob_digest=staged.digest,
+        stored_size=staged.stored_size,
+        content_encoding=staged.encoding
     )
 
-    file_in_db, created = await file_crud.create_or_update(
-        db=db, obj_in=file
-    )
+    try:
+        session = await upload_session_crud.get(
+            db, current_user.id, upload_id, for_update=True
+        )
+        if not session:
+            raise UploadSessionNotFoundError
+        if _part_list(session) != parts:
+            raise FileError(
+                status_code=status.HTTP_409_CONFLICT,
+                detail='Parts were changed while the upload was completing'
+            )
+        await upload_session_crud.remove(db, session)
+        with stage('create_or_update'):
+            file_in_db, _ = await file_crud.create_or_update(
+                db=db,
+                obj_in=file,
+                write_blobs=blob_writer([staged]),
+                enqueue_jobs=job_queue.enqueue
+            )
+    except BaseException:
+        await discard_upload(staged.tmp_path)
+        raise
+    await delete_parts(upload_id, part_numbers)
+    job_queue.wake()
 
-    catalog = f'{FILE_STORAGE}/{current_user.username}/{catalog}'
-    os.makedirs(catalog, exist_ok=True)
-    out_file_path = os.path.join(catalog, file_name)
-    if not created:
-        os.remove(out_file_path)
-    async with aiofiles.open(out_file_path, 'wb') as out_file:
-        content = await file_in.read()
-        await out_file.write(content)
+    return _to_file_in_db(file_in_db)
 
-    return schemas.FileInDB(
-        id=file_in_db.uuid,
-        name=file_in_db.path.split('/')[-1],
-        created_at=file_in_db.created_at,
-        path=file_in_db.path,
-        size=file_in_db.size,
-        is_downloadable=file_in_db.is_downloadable
+
+@router.delete(
+    '/files/uploads/{upload_id}',
+    status_code=status.HTTP_204_NO_CONTENT
+)
+async def abort_upload_session(
+    upload_id: str,
+    current_user: Annotated[schemas.FullUser, Depends(get_current_user)],
+    db: AsyncSession = Depends(get_session)
+) -> None:
+    """
+        Отменяет сессию загрузки и удаляет загруженные части.
+    """
+    session = await upload_session_crud.get(
+        db, current_user.id, upload_id, for_update=True
     )
+    if not session:
+        raise UploadSessionNotFoundError
+    part_numbers = [part.part_number for part in session.parts]
+    await upload_session_crud.remove(db, session)
+    await db.commit()
+    await delete_parts(upload_id, part_numbers)
 
 
 @router.get(
@@ -182,10 +558,11 @@ async def upload_file(
     status_code=status.HTTP_200_OK,
 )
 async def download_file(
+    request: Request,
     path: str,
     current_user: Annotated[schemas.FullUser, Depends(get_current_user)],
     db: AsyncSession = Depends(get_session),
-) -> StreamingResponse:
+) -> Response:
     """
         Для щагрузки файла в заголовке запроса 
         необходимо указать токен:
@@ -193,32 +570,169 @@ async def download_file(
         Запрос должен содердать следующие поля:
         - **path**: расположение файла в системе MyDisk. Также
         возможно указать id файла.
+
+        Поддерживаются заголовки Range и If-Range для докачки
+        и параллельной загрузки частей файла. ETag файла — хэш его
+        содержимого, на If-None-Match и If-Modified-Since без изменений
+        возвращается 304.
     """
-    if not '.' in path:
-        _uuid = path
-        file = await file_crud.get(
-            db,
-            user_id=current_user.id,
-            uuid=_uuid
-        )
+    with stage('file_lookup'):
+        if not '.' in path:
+            _uuid = path
+            file = await file_crud.get(
+                db,
+                user_id=current_user.id,
+                uuid=_uuid
+            )
+        else:
+            file = await file_crud.get(
+                db,
+                user_id=current_user.id,
+                path=path
+            )
+    if not file:
+        raise FilePathError
+
+    # Тип, уточненный по содержимому задачей sniff; по расширению
+    # определяется только для файлов без сохраненного типа
+    file_type = file.mime_type or \
+        mimetypes.guess_type(file.path, strict=False)[0]
+
+    if file.blob_digest:
+        key = blob_key(file.blob_digest)
     else:
+        key = legacy_key(current_user.username, file.path)
+
+    return await file_response(
+        request,
+        key,
+        media_type=file_type,
+        encoding=file.content_encoding,
+        size=file.size,
+        etag=f'"{file.blob_digest}"' if file.blob_digest else None,
+        last_modified=file.created_at if file.blob_digest else None
+    )
+
+
+@router.get(
+    '/files/preview',
+    status_code=status.HTTP_200_OK,
+)
+async def get_file_preview(
+    request: Request,
+    path: str,
+    current_user: Annotated[schemas.FullUser, Depends(get_current_user)],
+    size: int = 256,
+    format: Literal['jpeg', 'webp'] = 'jpeg',
+    db: AsyncSession = Depends(get_session),
+) -> Response:
+    """
+        Уменьшенная копия изображения. В заголовке запроса
+        необходимо указать токен:
+        - Authorization: Bearer <token>
+        Запрос должен содердать следующие поля:
+        - **path**: расположение файла в системе MyDisk или id файла.
+        - **size**: размер большей стороны: 64, 128, 256, 512 или 1024.
+        - **format**: jpeg или webp.
+
+        Превью строится при первом запросе и сохраняется, повторные
+        запросы отдаются из хранилища. Для файлов, не являющихся
+        изображениями, возвращается 415.
+    """
+    if size not in PREVIEW_SIZES:
+        raise FileError(
+            detail=f'Size must be one of {", ".join(map(str, PREVIEW_SIZES))}'
+        )
+    with stage('file_lookup'):
         file = await file_crud.get(
-            db,
-            user_id=current_user.id,
-            path=path
+            db, user_id=current_user.id, path=path, uuid=path
         )
     if not file:
         raise FilePathError
+    preview = await preview_generator.get(db, file, size, format)
+    return await file_response(
+        request,
+        preview_key(file.blob_digest, size, format),
+        media_type=FORMATS[format],
+        etag=f'"{file.blob_digest}-{size}.{format}"',
+        last_modified=preview.created_at
+    )
+
 
-    file_type = mimetypes.guess_type(file.path, strict=False)[0]
+ARCHIVE_FORMATS = {
+    'zip': (iter_zip, 'application/zip'),
+    'tar.gz': (iter_tar_gz, 'application/gzip'),
+}
 
-    file_path = f'{FILE_STORAGE}/{current_user.username}/{file.path}'
 
-    def iterfile():
-        with open(file_path, mode="rb") as file_like:
-            yield from file_like 
+@router.get(
+    '/files/download/archive',
+    status_code=status.HTTP_200_OK,
+)
+async def download_archive(
+    path: str,
+    current_user: Annotated[schemas.FullUser, Depends(get_current_user)],
+    format: Literal['zip', 'tar.gz'] = 'zip',
+    compression_level: Annotated[int, Query(ge=0, le=9)] = 6,
+    db: AsyncSession = Depends(get_session),
+) -> StreamingResponse:
+    """
+        Скачивание всех файлов каталога одним архивом. В заголовке
+        запроса необходимо указать токен:
+        - Authorization: Bearer <token>
+        Запрос должен содердать следующие поля:
+        - **path**: каталог в системе MyDisk.
+        - **format**: zip или tar.gz.
+        - **compression_level**: уровень сжатия от 0 (без сжатия) до 9.
 
-    return StreamingResponse(iterfile(), media_type=file_type)
+        Архив собирается на лету и отдается потоком, без временных
+        файлов на сервере.
+    """
+    prefix = path.rstrip('/')
+    root = prefix.split('/')[-1]
+    if not root:
+        raise FilePathError
+    params = schemas.FileFilter(
+        path=prefix,
+        mime_type=None,
+        min_size=None,
+        max_size=None,
+        order_by='path',
+        order='asc',
+        cursor=None,
+        limit=None,
+    )
+    first_page, _ = await file_crud.get_multi(
+        db, current_user.id, replace(params, limit=1)
+    )
+    if not first_page:
+        raise FilePathError
+
+    async def entries() -> AsyncIterator[ArchiveEntry]:
+        async for file in file_crud.stream_multi(
+            db, current_user.id, params
+        ):
+            if file.blob_digest:
+                key = blob_key(file.blob_digest)
+            else:
+                key = legacy_key(current_user.username, file.path)
+            yield ArchiveEntry(
+                name=f'{root}/{file.path[len(prefix) + 1:]}',
+                key=key,
+                size=file.size,
+                mtime=file.created_at,
+                encoding=file.content_encoding
+            )
+
+    build_archive, media_type = ARCHIVE_FORMATS[format]
+    return StreamingResponse(
+        build_archive(entries(), compression_level),
+        media_type=media_type,
+        headers={
+            'Content-Disposition':
+                f'attachment; filename="{quote(root)}.{format}"'
+        }
+    )
 
 
 @router.get(
@@ -227,16 +741,356 @@ async def download_file(
     response_model=schemas.FileList
 )
 async def get_files_list(
+    request: Request,
+    response: Response,
     current_user: Annotated[schemas.FullUser, Depends(get_current_user)],
+    params: Annotated[schemas.FileFilter, Depends()],
+    output: Literal['json', 'ndjson'] = 'json',
     db: AsyncSession = Depends(get_session),
-) -> schemas.FileList:
+) -> schemas.FileList | Response:
     """
         Для получения списка загруженных файлов
         в заголовке запроса  необходимо указать токен:
         - Authorization: Bearer <token>
+
+        Список отдается постранично: для получения следующей страницы
+        нужно передать **cursor** из поля next_cursor предыдущего ответа.
+        Файлы можно отфильтровать по каталогу (**path**), MIME-типу
+        и размеру, а также отсортировать по дате создания, размеру
+        или пути.
+
+        При **output=ndjson** файлы отдаются потоком, по одному
+        JSON-объекту на строку, без разбиения на страницы.
+
+        ETag ответа меняется при любом изменении файлов пользователя.
+        На запрос с If-None-Match или If-Modified-Since, если файлы
+        не менялись, возвращается 304 без тела.
     """
-    files = await file_crud.get_multi(db, current_user.id)
+    version, modified_at = await user_crud.get_files_version(
+        db, current_user.id
+    )
+    headers = {
+        'ETag': f'"files-{version}"',
+        'Cache-Control': app_settings.listing_cache_control,
+    }
+    last_modified = None
+    if modified_at is not None:
+        headers['Last-Modified'] = http_date(modified_at)
+        last_modified = calendar.timegm(modified_at.utctimetuple())
+    if is_not_modified(request.headers, headers['ETag'], last_modified):
+        return not_modified_response(headers)
+
+    if output == 'ndjson':
+        async def iterfiles() -> AsyncIterator[bytes]:
+            async for file in file_crud.stream_multi(
+                db, current_user.id, params
+            ):
+                yield orjson.dumps(_to_file_in_db(file).dict()) + b'\n'
+
+        return StreamingResponse(
+            iterfiles(), media_type='application/x-ndjson', headers=headers
+        )
+
+    files, next_cursor = await file_crud.get_multi(
+        db, current_user.id, params
+    )
+    response.headers.update(headers)
     return schemas.FileList(
         account_id=current_user.uuid,
-        files=files
+        files=[_to_file_in_db(file) for file in files],
+        next_cursor=next_cursor
+    )
+
+
+async def _resolve_source(
+    db: AsyncSession,
+    user_id: int,
+    path: str
+) -> Tuple[str, bool]:
+    """
+        Находит файл по пути или id, а если такого нет — каталог
+        по пути. Возвращает путь и признак каталога.
+    """
+    file = await file_crud.get(db, user_id=user_id, path=path, uuid=path)
+    if file:
+        return file.path, False
+    folder = await folder_crud.get_by_path(db, user_id, path.rstrip('/'))
+    if folder:
+        return folder.path, True
+    raise FilePathError
+
+
+def _resolve_destination(destination: str) -> str:
+    destination = destination.rstrip('/')
+    if not destination:
+        raise FileError(detail='Destination must not be empty')
+    return destination
+
+
+async def _delete_legacy(username: str, paths: List[str]) -> None:
+    for path in paths:
+        await storage.delete(legacy_key(username, path))
+
+
+@router.delete(
+    '/files',
+    status_code=status.HTTP_200_OK,
+    response_model=schemas.FileOperation
+)
+async def delete_files(
+    path: str,
+    background_tasks: BackgroundTasks,
+    current_user: Annotated[schemas.FullUser, Depends(get_current_user)],
+    db: AsyncSession = Depends(get_session),
+) -> schemas.FileOperation:
+    """
+        Для удаления файла или каталога
+        в заголовке запроса  необходимо указать токен:
+        - Authorization: Bearer <token>
+
+        - **path**: путь или id файла либо путь каталога. Каталог
+        удаляется со всем содержимым.
+
+        Удаляются только записи о файлах, содержимое стирается из
+        хранилища позже фоновой задачей, поэтому время запроса почти
+        не зависит от размера каталога.
+    """
+    source, is_folder = await _resolve_source(db, current_user.id, path)
+    with stage('remove_files'):
+        result, legacy = await file_crud.remove(
+            db, current_user.id, source, is_folder
+        )
+    if legacy:
+        background_tasks.add_task(
+            _delete_legacy, current_user.username, legacy
+        )
+    return result
+
+
+@router.post(
+    '/files/move',
+    status_code=status.HTTP_200_OK,
+    response_model=schemas.FileOperation
+)
+async def move_files(
+    move_in: schemas.FileMove,
+    current_user: Annotated[schemas.FullUser, Depends(get_current_user)],
+    db: AsyncSession = Depends(get_session),
+) -> schemas.FileOperation:
+    """
+        Для перемещения или переименования файла или каталога
+        в заголовке запроса  необходимо указать токен:
+        - Authorization: Bearer <token>
+
+        - **path**: путь или id файла либо путь каталога.
+        - **destination**: новый полный путь. Если он занят,
+        возвращается 409.
+
+        Меняются только метаданные, содержимое файлов не копируется.
+    """
+    source, is_folder = await _resolve_source(
+        db, current_user.id, move_in.path
+    )
+    with stage('move_files'):
+        return await file_crud.move(
+            db,
+            current_user.id,
+            source,
+            _resolve_destination(move_in.destination),
+            is_folder
+        )
+
+
+@router.post(
+    '/files/copy',
+    status_code=status.HTTP_201_CREATED,
+    response_model=schemas.FileOperation
+)
+async def copy_files(
+    copy_in: schemas.FileMove,
+    current_user: Annotated[schemas.FullUser, Depends(get_current_user)],
+    db: AsyncSession = Depends(get_session),
+) -> schemas.FileOperation:
+    """
+        Для копирования файла или каталога
+        в заголовке запроса  необходимо указать токен:
+        - Authorization: Bearer <token>
+
+        - **path**: путь или id файла либо путь каталога.
+        - **destination**: полный путь копии. Если он занят,
+        возвращается 409.
+
+        Копии ссылаются на то же содержимое в хранилище, но
+        учитываются в квоте пользователя.
+    """
+    source, is_folder = await _resolve_source(
+        db, current_user.id, copy_in.path
+    )
+    with stage('copy_files'):
+        return await file_crud.copy(
+            db,
+            current_user.id,
+            source,
+            _resolve_destination(copy_in.destination),
+            is_folder
+        )
+
+
+@router.get(
+    '/files/tree',
+    status_code=status.HTTP_200_OK,
+    response_model=schemas.FolderTree
+)
+async def get_files_tree(
+    current_user: Annotated[schemas.FullUser, Depends(get_current_user)],
+    path: str = '',
+    limit: int = Query(default=1000, ge=1, le=1000),
+    db: AsyncSession = Depends(get_session),
+) -> schemas.FolderTree:
+    """
+        Для получения содержимого каталога
+        в заголовке запроса  необходимо указать токен:
+        - Authorization: Bearer <token>
+
+        Возвращает вложенные каталоги с суммарным объемом и
+        количеством файлов в каждом и первые **limit** файлов,
+        лежащих непосредственно в каталоге **path** (пустой путь —
+        корень). Если файлов больше, has_more равен true, и полный
+        список можно получить постранично через GET /files?path=.
+    """
+    path = path.rstrip('/')
+    if path:
+        folder = await folder_crud.get_by_path(db, current_user.id, path)
+        if folder is None:
+            raise FilePathError
+        folder_id, size, files_count = \
+            folder.id, folder.size, folder.files_count
+    else:
+        usage = await user_crud.get_usage(db, current_user.id)
+        if usage is None:
+            raise CredentialException
+        folder_id, size, files_count = \
+            None, usage.used_bytes, usage.files_count
+    folders = await folder_crud.get_children(db, current_user.id, folder_id)
+    files = await file_crud.get_folder_files(
+        db, current_user.id, folder_id, limit + 1
+    )
+    return schemas.FolderTree(
+        path=path,
+        size=size,
+        files_count=files_count,
+        folders=[
+            schemas.Folder(
+                name=child.name,
+                path=child.path,
+                size=child.size,
+                files_count=child.files_count
+            ) for child in folders
+        ],
+        files=[_to_file_in_db(file) for file in files[:limit]],
+        has_more=len(files) > limit
+    )
+
+
+@router.get(
+    '/files/usage',
+    status_code=status.HTTP_200_OK,
+    response_model=schemas.Usage
+)
+async def get_files_usage(
+    current_user: Annotated[schemas.FullUser, Depends(get_current_user)],
+    db: AsyncSession = Depends(get_session),
+) -> schemas.Usage:
+    """
+        Для получения занятого места
+        в заголовке запроса  необходимо указать токен:
+        - Authorization: Bearer <token>
+
+        Возвращает объем и количество файлов пользователя и его
+        квоту (**quota_bytes**, null — без ограничений). Счетчики
+        обновляются при каждой записи файлов, поэтому запрос не
+        зависит от количества файлов.
+    """
+    usage = await user_crud.get_usage(db, current_user.id)
+    if usage is None:
+        raise CredentialException
+    return usage
+
+
+@router.get(
+    '/files/changes',
+    status_code=status.HTTP_200_OK,
+    response_model=schemas.FileChanges
+)
+async def get_files_changes(
+    current_user: Annotated[schemas.FullUser, Depends(get_current_user)],
+    since: Optional[str] = None,
+    limit: int = Query(default=1000, ge=1, le=1000),
+    wait: float = Query(default=0, ge=0, le=60),
+    db: AsyncSession = Depends(get_session),
+) -> schemas.FileChanges:
+    """
+        Для получения изменений файлов
+        в заголовке запроса  необходимо указать токен:
+        - Authorization: Bearer <token>
+
+        Без **since** возвращается курсор текущего состояния без
+        изменений: клиент сначала получает курсор, затем список файлов,
+        а дальше запрашивает только изменения, передавая в **since**
+        курсор из предыдущего ответа. Если **has_more** равен true,
+        следующую порцию нужно запросить сразу.
+
+        При **wait** > 0 запрос ждет появления изменений до wait
+        секунд (long-poll) и возвращается сразу, как только они есть.
+
+        Курсор старше FILE_CHANGES_RETENTION дней не принимается
+        (410): клиенту нужно заново получить полный список файлов.
+    """
+    if since is None:
+        last_id = await file_change_crud.get_last_id(db, current_user.id)
+        return schemas.FileChanges(
+            changes=[], cursor=encode_cursor(datetime.utcnow(), last_id)
+        )
+    issued_at, last_id = decode_cursor(since, 'created_at')
+    retention = timedelta(days=app_settings.file_changes_retention)
+    if issued_at < datetime.utcnow() - retention:
+        raise CursorExpiredError
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + wait
+    while True:
+        event = change_notifier.listen(current_user.id)
+        issued_at = datetime.utcnow()
+        rows = await file_change_crud.get_since(
+            db, current_user.id, last_id, limit + 1
+        )
+        changes = [
+            (row.id, schemas.FileChange(
+                action=row.action,
+                id=row.file_uuid,
+                path=row.path,
+                size=row.size,
+                mime_type=row.mime_type,
+                changed_at=row.created_at,
+            )) for row in rows
+        ]
+        # Соединение не удерживается на время ожидания
+        await db.rollback()
+        remaining = deadline - loop.time()
+        if changes or remaining <= 0:
+            break
+        await change_notifier.wait(
+            current_user.id,
+            event,
+            min(remaining, app_settings.file_changes_poll_interval)
+        )
+
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+    if changes:
+        last_id = changes[-1][0]
+    return schemas.FileChanges(
+        changes=[change for _, change in changes],
+        cursor=encode_cursor(issued_at, last_id),
+        has_more=has_more
     )
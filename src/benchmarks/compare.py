@@ -0,0 +1,49 @@
+"""
+    Сравнение двух файлов с результатами benchmarks.run.
+"""
+import json
+import sys
+from typing import Dict, Iterator, List, Optional, Tuple
+
+METRICS = (
+    'throughput_rps', 'throughput_mb_s', 'latency_p50_ms', 'latency_p99_ms'
+)
+
+
+def flatten(
+    results: Dict,
+    prefix: str = ''
+) -> Iterator[Tuple[str, Dict[str, float]]]:
+    for name, value in results.items():
+        if 'requests' in value:
+            yield f'{prefix}{name}', value
+        else:
+            yield from flatten(value, f'{prefix}{name}.')
+
+
+def compare(old: Dict, new: Dict) -> List[str]:
+    old_results = dict(flatten(old['results']))
+    lines = []
+    for name, stats in flatten(new['results']):
+        baseline = old_results.get(name)
+        if baseline is None:
+            continue
+        for metric in METRICS:
+            before, after = baseline[metric], stats[metric]
+            change = (after - before) / before * 100 if before else 0.0
+            lines.append(
+                f'{name:40} {metric:16} {before:>12} {after:>12} '
+                f'{change:+8.1f}%'
+            )
+    return lines
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    old_path, new_path = (argv or sys.argv[1:])[:2]
+    with open(old_path) as old_file, open(new_path) as new_file:
+        lines = compare(json.load(old_file), json.load(new_file))
+    sys.stdout.write('\n'.join(lines) + '\n')
+
+
+if __name__ == '__main__':
+    main()
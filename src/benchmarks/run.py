@@ -0,0 +1,166 @@
+"""
+    Нагрузочное тестирование API MyDisk.
+
+    Сервер запускается отдельно с рабочей конфигурацией и Postgres
+    (на SQLite модели не работают: используются ON CONFLICT, xmax
+    и SKIP LOCKED), например:
+
+        uvicorn main:app --workers 2 &
+        python -m benchmarks.run --server-pid $! \\
+            --output benchmarks/results/$(git rev-parse --short HEAD).json
+
+    Для сценария листинга файлы пользователей создаются напрямую
+    в базе (DATABASE_DSN). Результаты разных коммитов сравниваются
+    командой python -m benchmarks.compare old.json new.json.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import httpx
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from benchmarks import scenarios
+from benchmarks.seed import seed_files
+from benchmarks.stats import peak_rss, worker_pids
+
+SCENARIOS = ('auth', 'upload', 'download', 'list')
+
+
+def parse_sizes(value: str) -> List[int]:
+    return [int(size) for size in value.split(',') if size]
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], text=True,
+            stderr=subprocess.DEVNULL
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description=__doc__.strip().split('\n')[0]
+    )
+    parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+    parser.add_argument('--dsn', default=os.getenv('DATABASE_DSN'))
+    parser.add_argument(
+        '--scenarios', default=','.join(SCENARIOS),
+        help='Comma-separated list of: ' + ', '.join(SCENARIOS)
+    )
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument(
+        '--upload-sizes', type=parse_sizes,
+        default=[1024, 64 * 1024, 1024 * 1024, 16 * 1024 * 1024]
+    )
+    parser.add_argument(
+        '--download-size', type=int, default=64 * 1024 * 1024
+    )
+    parser.add_argument('--range-size', type=int, default=1024 * 1024)
+    parser.add_argument(
+        '--list-rows', type=parse_sizes, default=[1000, 100000, 1000000]
+    )
+    parser.add_argument('--list-pages', type=int, default=10)
+    parser.add_argument(
+        '--server-pid', type=int,
+        help='PID of the server process, used to report peak RSS'
+    )
+    parser.add_argument('--output', help='Write results to this JSON file')
+    return parser.parse_args(argv)
+
+
+async def run(args: argparse.Namespace) -> Dict:
+    selected = [name for name in args.scenarios.split(',') if name]
+    unknown = set(selected) - set(SCENARIOS)
+    if unknown:
+        raise SystemExit(f'Unknown scenarios: {", ".join(sorted(unknown))}')
+
+    run_id = uuid.uuid4().hex[:8]
+    password = uuid.uuid4().hex
+    results: Dict = {}
+    limits = httpx.Limits(
+        max_connections=args.concurrency,
+        max_keepalive_connections=args.concurrency
+    )
+    async with httpx.AsyncClient(
+        base_url=args.base_url, limits=limits, timeout=300
+    ) as client:
+        username = f'bench-{run_id}'
+        headers = await scenarios.login(client, username, password)
+
+        if 'auth' in selected:
+            results['auth'] = await scenarios.auth_burst(
+                client, username, password,
+                args.requests, args.concurrency
+            )
+        if 'upload' in selected:
+            results['upload'] = await scenarios.uploads(
+                client, headers, args.upload_sizes,
+                args.requests, args.concurrency
+            )
+        if 'download' in selected:
+            results['download'] = await scenarios.downloads(
+                client, headers, args.download_size,
+                args.requests, args.concurrency, args.range_size
+            )
+        if 'list' in selected:
+            if not args.dsn:
+                raise SystemExit('--dsn or DATABASE_DSN is required to seed')
+            engine = create_async_engine(args.dsn)
+            results['list'] = {}
+            try:
+                for rows in args.list_rows:
+                    list_user = f'bench-{run_id}-{rows}'
+                    list_headers = await scenarios.login(
+                        client, list_user, password
+                    )
+                    await seed_files(engine, list_user, rows, 'bench')
+                    results['list'][str(rows)] = await scenarios.listing(
+                        client, list_headers, args.requests,
+                        args.concurrency, args.list_pages, 'bench'
+                    )
+            finally:
+                await engine.dispose()
+
+    report = {
+        'commit': git_commit(),
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'config': {
+            'base_url': args.base_url,
+            'concurrency': args.concurrency,
+            'requests': args.requests,
+        },
+        'results': results,
+    }
+    if args.server_pid:
+        report['peak_rss_bytes'] = {
+            str(pid): peak_rss(pid) for pid in worker_pids(args.server_pid)
+        }
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    report = asyncio.run(run(args))
+    output = json.dumps(report, indent=2)
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+        with open(args.output, 'w') as output_file:
+            output_file.write(output + '\n')
+    sys.stdout.write(output + '\n')
+
+
+if __name__ == '__main__':
+    main()
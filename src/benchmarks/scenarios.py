@@ -0,0 +1,206 @@
+import asyncio
+import os
+import time
+from typing import Awaitable, Callable, Dict, List, Sequence
+
+import httpx
+
+from benchmarks.stats import summarize
+
+API = '/api/v1'
+
+# Запрос сценария возвращает число переданных байт
+Request = Callable[[int], Awaitable[int]]
+
+
+async def run_load(
+    request: Request,
+    total: int,
+    concurrency: int,
+) -> Dict[str, float]:
+    """
+        Выполняет total запросов, не больше concurrency одновременно.
+    """
+    latencies: List[float] = []
+    errors = 0
+    bytes_total = 0
+    counter = iter(range(total))
+
+    async def worker() -> None:
+        nonlocal errors, bytes_total
+        for i in counter:
+            start = time.perf_counter()
+            try:
+                bytes_total += await request(i)
+            except (httpx.HTTPError, AssertionError):
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(
+        latencies, errors, time.perf_counter() - start, bytes_total
+    )
+
+
+async def login(
+    client: httpx.AsyncClient,
+    username: str,
+    password: str,
+) -> Dict[str, str]:
+    await client.post(
+        f'{API}/register',
+        json={'username': username, 'password': password}
+    )
+    response = await client.post(
+        f'{API}/auth',
+        data={'username': username, 'password': password}
+    )
+    response.raise_for_status()
+    return {'Authorization': f'Bearer {response.json()["access_token"]}'}
+
+
+async def auth_burst(
+    client: httpx.AsyncClient,
+    username: str,
+    password: str,
+    total: int,
+    concurrency: int,
+) -> Dict[str, float]:
+    async def request(_: int) -> int:
+        response = await client.post(
+            f'{API}/auth',
+            data={'username': username, 'password': password}
+        )
+        assert response.status_code == 200
+        return len(response.content)
+
+    return await run_load(request, total, concurrency)
+
+
+async def uploads(
+    client: httpx.AsyncClient,
+    headers: Dict[str, str],
+    sizes: Sequence[int],
+    total: int,
+    concurrency: int,
+) -> Dict[str, Dict[str, float]]:
+    results = {}
+    for size in sizes:
+        # Одинаковое содержимое проверило бы только дедупликацию блобов
+        payloads = [os.urandom(size) for _ in range(min(total, 8))]
+
+        async def request(i: int) -> int:
+            response = await client.post(
+                f'{API}/files/upload',
+                headers=headers,
+                data={'path': f'bench/upload/{size}/{i}.bin'},
+                files={'file_in': (
+                    f'{i}.bin',
+                    payloads[i % len(payloads)],
+                    'application/octet-stream'
+                )},
+            )
+            assert response.status_code == 201
+            return size
+
+        results[str(size)] = await run_load(request, total, concurrency)
+    return results
+
+
+async def downloads(
+    client: httpx.AsyncClient,
+    headers: Dict[str, str],
+    size: int,
+    total: int,
+    concurrency: int,
+    range_size: int,
+) -> Dict[str, Dict[str, float]]:
+    path = f'bench/download/{size}.bin'
+    response = await client.post(
+        f'{API}/files/upload',
+        headers=headers,
+        data={'path': path},
+        files={'file_in': (
+            f'{size}.bin', os.urandom(size), 'application/octet-stream'
+        )},
+    )
+    response.raise_for_status()
+
+    async def full(_: int) -> int:
+        received = 0
+        async with client.stream(
+            'GET', f'{API}/files/download',
+            params={'path': path}, headers=headers
+        ) as response:
+            assert response.status_code == 200
+            async for chunk in response.aiter_raw():
+                received += len(chunk)
+        return received
+
+    async def ranged(i: int) -> int:
+        start = (i * range_size) % max(size - range_size, 1)
+        response = await client.get(
+            f'{API}/files/download',
+            params={'path': path},
+            headers={
+                **headers,
+                'Range': f'bytes={start}-{start + range_size - 1}'
+            },
+        )
+        assert response.status_code == 206
+        return len(response.content)
+
+    return {
+        'full': await run_load(full, total, concurrency),
+        'range': await run_load(ranged, total, concurrency),
+    }
+
+
+async def listing(
+    client: httpx.AsyncClient,
+    headers: Dict[str, str],
+    total: int,
+    concurrency: int,
+    pages: int,
+    prefix: str,
+) -> Dict[str, Dict[str, float]]:
+    """
+        Первая страница, обход нескольких страниц по курсору
+        и фильтр по каталогу.
+    """
+    async def walk(params: Dict[str, str]) -> int:
+        received = 0
+        cursor = None
+        for _ in range(pages):
+            response = await client.get(
+                f'{API}/files',
+                headers=headers,
+                params={**params, **({'cursor': cursor} if cursor else {})},
+            )
+            assert response.status_code == 200
+            received += len(response.content)
+            cursor = response.json()['next_cursor']
+            if not cursor:
+                break
+        return received
+
+    async def first_page(_: int) -> int:
+        response = await client.get(
+            f'{API}/files', headers=headers, params={'limit': 100}
+        )
+        assert response.status_code == 200
+        return len(response.content)
+
+    async def paginate(_: int) -> int:
+        return await walk({'limit': 100})
+
+    async def by_folder(i: int) -> int:
+        return await walk({'limit': 100, 'path': f'{prefix}/{i % 100}/'})
+
+    return {
+        'first_page': await run_load(first_page, total, concurrency),
+        'paginate': await run_load(paginate, total, concurrency),
+        'by_folder': await run_load(by_folder, total, concurrency),
+    }
@@ -0,0 +1,106 @@
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+# Файлы вставляются одним запросом на стороне Postgres, поэтому
+# подготовка 10^6 строк занимает секунды, а не часы через API.
+SEED_FILES = text('''
+    INSERT INTO files (
+        user_id, uuid, path, size, is_downloadable, created_at, mime_type
+    )
+    SELECT
+        :user_id,
+        md5(:prefix || n::text),
+        :prefix || '/' || (n % 100)::text || '/file-' || n::text || '.txt',
+        (n * 7919) % 10000000,
+        true,
+        now() - (n || ' seconds')::interval,
+        'text/plain'
+    FROM generate_series(1, :rows) AS n
+    ON CONFLICT ON CONSTRAINT uq_files_user_id_path DO NOTHING
+''')
+
+# Каталоги, счетчики занятого места и версия списка файлов
+# пересчитываются по таблице files так же, как при загрузке через API
+RESET_FOLDERS = text('''
+    UPDATE folders SET size = 0, files_count = 0 WHERE user_id = :user_id
+''')
+SEED_FOLDERS = text('''
+    INSERT INTO folders (user_id, name, path, size, files_count, created_at)
+    SELECT
+        user_id, regexp_replace(folder, '^.*/', ''), folder,
+        sum(size), count(*), now() at time zone 'utc'
+    FROM (
+        SELECT
+            files.user_id,
+            files.size,
+            array_to_string(
+                (string_to_array(files.path, '/'))[1:n], '/'
+            ) AS folder
+        FROM files, generate_series(
+            1, array_length(string_to_array(files.path, '/'), 1) - 1
+        ) AS n
+        WHERE files.user_id = :user_id
+            AND (string_to_array(files.path, '/'))[n] <> ''
+    ) AS ancestors
+    GROUP BY user_id, folder
+    ON CONFLICT ON CONSTRAINT uq_folders_user_id_path DO UPDATE
+        SET size = excluded.size, files_count = excluded.files_count
+''')
+LINK_FOLDERS = text('''
+    UPDATE folders SET parent_id = (
+        SELECT parent.id FROM folders AS parent
+        WHERE parent.user_id = folders.user_id
+            AND left(folders.path, length(parent.path) + 1)
+                = parent.path || '/'
+        ORDER BY length(parent.path) DESC
+        LIMIT 1
+    )
+    WHERE user_id = :user_id AND parent_id IS NULL
+''')
+LINK_FILES = text('''
+    UPDATE files SET folder_id = (
+        SELECT folders.id FROM folders
+        WHERE folders.user_id = files.user_id
+            AND left(files.path, length(folders.path) + 1)
+                = folders.path || '/'
+        ORDER BY length(folders.path) DESC
+        LIMIT 1
+    )
+    WHERE user_id = :user_id AND folder_id IS NULL
+''')
+UPDATE_USER = text('''
+    UPDATE users SET
+        used_bytes = usage.size,
+        files_count = usage.count,
+        files_version = files_version + 1,
+        files_modified_at = now() at time zone 'utc'
+    FROM (
+        SELECT coalesce(sum(size), 0) AS size, count(*) AS count
+        FROM files
+        WHERE user_id = :user_id
+    ) AS usage
+    WHERE users.id = :user_id
+''')
+
+USER_ID = text('SELECT id FROM users WHERE username = :username')
+
+
+async def seed_files(
+    engine: AsyncEngine,
+    username: str,
+    rows: int,
+    prefix: str,
+) -> None:
+    async with engine.begin() as conn:
+        user_id = (
+            await conn.execute(USER_ID, {'username': username})
+        ).scalar_one()
+        await conn.execute(
+            SEED_FILES,
+            {'user_id': user_id, 'rows': rows, 'prefix': prefix}
+        )
+        for statement in (
+            RESET_FOLDERS, SEED_FOLDERS, LINK_FOLDERS, LINK_FILES,
+            UPDATE_USER
+        ):
+            await conn.execute(statement, {'user_id': user_id})
@@ -0,0 +1,71 @@
+import math
+import os
+from typing import Dict, List, Optional, Sequence
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """
+        Перцентиль методом ближайшего ранга, q в диапазоне [0, 100].
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(math.ceil(q / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def summarize(
+    latencies: Sequence[float],
+    errors: int,
+    elapsed: float,
+    bytes_total: int = 0,
+) -> Dict[str, float]:
+    """
+        Сводка по сценарию: латентность в миллисекундах, пропускная
+        способность в запросах и мегабайтах в секунду.
+    """
+    count = len(latencies)
+    return {
+        'requests': count,
+        'errors': errors,
+        'elapsed_s': round(elapsed, 3),
+        'throughput_rps': round(count / elapsed, 2) if elapsed else 0.0,
+        'throughput_mb_s': round(
+            bytes_total / elapsed / 1024 / 1024, 2
+        ) if elapsed else 0.0,
+        'latency_p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'latency_p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        'latency_mean_ms': round(
+            sum(latencies) / count * 1000, 2
+        ) if count else 0.0,
+        'latency_max_ms': round(max(latencies, default=0.0) * 1000, 2),
+    }
+
+
+def peak_rss(pid: int) -> Optional[int]:
+    """
+        Пиковый RSS процесса в байтах (VmHWM из /proc, только Linux).
+    """
+    try:
+        with open(f'/proc/{pid}/status') as status_file:
+            for line in status_file:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+
+def worker_pids(pid: int) -> List[int]:
+    """
+        Процесс сервера и его дочерние процессы (воркеры
+        uvicorn/gunicorn).
+    """
+    pids = [pid]
+    try:
+        for task in os.listdir(f'/proc/{pid}/task'):
+            with open(f'/proc/{pid}/task/{task}/children') as children:
+                pids.extend(int(child) for child in children.read().split())
+    except OSError:
+        pass
+    return pids
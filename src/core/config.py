@@ -1,11 +1,10 @@
 import os
-from logging import config as logging_config
 
 from pydantic import BaseSettings, PostgresDsn
 
-from core.logger import LOGGING
+from core.logger import setup_logging
 
-logging_config.dictConfig(LOGGING)
+setup_logging()
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__name__)))
 
@@ -20,7 +19,115 @@ class AppSettings(BaseSettings):
         'SECRET_KEY',
         'a8e65ae1f66694950808f5318419a729c8576d2275f823edde47f7cc36a26d51'
     )
-    echo = (os.getenv('ECHO', 'True') == 'True')
+    echo = (os.getenv('ECHO', 'False') == 'True')
+    db_slow_query_ms: float = float(os.getenv('DB_SLOW_QUERY_MS', '500'))
+    db_query_sample_rate: float = float(
+        os.getenv('DB_QUERY_SAMPLE_RATE', '0')
+    )
+    db_pool_size: int = int(os.getenv('DB_POOL_SIZE', '5'))
+    db_max_overflow: int = int(os.getenv('DB_MAX_OVERFLOW', '10'))
+    db_pool_timeout: float = float(os.getenv('DB_POOL_TIMEOUT', '30'))
+    db_pool_recycle: int = int(os.getenv('DB_POOL_RECYCLE', '1800'))
+    db_pool_pre_ping: bool = (
+        os.getenv('DB_POOL_PRE_PING', 'True') == 'True'
+    )
+    db_prepared_statement_cache_size: int = int(
+        os.getenv('DB_PREPARED_STATEMENT_CACHE_SIZE', '500')
+    )
+    upload_chunk_size: int = int(
+        os.getenv('UPLOAD_CHUNK_SIZE', str(1024 * 1024))
+    )
+    upload_batch_concurrency: int = int(
+        os.getenv('UPLOAD_BATCH_CONCURRENCY', '8')
+    )
+    download_chunk_size: int = int(
+        os.getenv('DOWNLOAD_CHUNK_SIZE', str(256 * 1024))
+    )
+    download_cache_control: str = os.getenv(
+        'DOWNLOAD_CACHE_CONTROL', 'private, no-cache'
+    )
+    listing_cache_control: str = os.getenv(
+        'LISTING_CACHE_CONTROL', 'private, no-cache'
+    )
+    storage_backend: str = os.getenv('STORAGE_BACKEND', 'local')
+    storage_root: str = os.getenv(
+        'STORAGE_ROOT', os.path.abspath('users_files')
+    )
+    storage_tmp_dir: str | None = os.getenv('STORAGE_TMP_DIR')
+    storage_compression: str = os.getenv('STORAGE_COMPRESSION', 'gzip')
+    storage_compression_level: int = int(
+        os.getenv('STORAGE_COMPRESSION_LEVEL', '6')
+    )
+    s3_bucket: str = os.getenv('S3_BUCKET', 'mydisk')
+    s3_endpoint_url: str | None = os.getenv('S3_ENDPOINT_URL')
+    s3_access_key: str | None = os.getenv('S3_ACCESS_KEY')
+    s3_secret_key: str | None = os.getenv('S3_SECRET_KEY')
+    s3_region: str | None = os.getenv('S3_REGION')
+    s3_part_size: int = int(os.getenv('S3_PART_SIZE', str(8 * 1024 * 1024)))
+    blob_reap_interval: float = float(
+        os.getenv('BLOB_REAP_INTERVAL', '300')
+    )
+    upload_session_ttl: float = float(
+        os.getenv('UPLOAD_SESSION_TTL', str(24 * 60 * 60))
+    )
+    upload_session_reap_interval: float = float(
+        os.getenv('UPLOAD_SESSION_REAP_INTERVAL', '600')
+    )
+    user_quota_bytes: int = int(os.getenv('USER_QUOTA_BYTES', '0'))
+    usage_reconcile_interval: float = float(
+        os.getenv('USAGE_RECONCILE_INTERVAL', str(24 * 60 * 60))
+    )
+    job_workers: int = int(os.getenv('JOB_WORKERS', '2'))
+    job_poll_interval: float = float(os.getenv('JOB_POLL_INTERVAL', '5'))
+    job_timeout: float = float(os.getenv('JOB_TIMEOUT', '120'))
+    job_max_attempts: int = int(os.getenv('JOB_MAX_ATTEMPTS', '5'))
+    job_retry_backoff: float = float(os.getenv('JOB_RETRY_BACKOFF', '10'))
+    job_retry_backoff_max: float = float(
+        os.getenv('JOB_RETRY_BACKOFF_MAX', '3600')
+    )
+    preview_workers: int = int(os.getenv('PREVIEW_WORKERS', '2'))
+    preview_concurrency: int = int(os.getenv('PREVIEW_CONCURRENCY', '4'))
+    preview_quality: int = int(os.getenv('PREVIEW_QUALITY', '80'))
+    preview_max_source_size: int = int(
+        os.getenv('PREVIEW_MAX_SOURCE_SIZE', str(50 * 1024 * 1024))
+    )
+    preview_eager_size: int = int(os.getenv('PREVIEW_EAGER_SIZE', '256'))
+    preview_cache_max_bytes: int = int(
+        os.getenv('PREVIEW_CACHE_MAX_BYTES', str(1024 * 1024 * 1024))
+    )
+    preview_evict_interval: float = float(
+        os.getenv('PREVIEW_EVICT_INTERVAL', '600')
+    )
+    file_changes_retention: int = int(
+        os.getenv('FILE_CHANGES_RETENTION', '30')
+    )
+    file_changes_reap_interval: float = float(
+        os.getenv('FILE_CHANGES_REAP_INTERVAL', '3600')
+    )
+    file_changes_poll_interval: float = float(
+        os.getenv('FILE_CHANGES_POLL_INTERVAL', '1')
+    )
+    health_cache_ttl: float = float(os.getenv('HEALTH_CACHE_TTL', '2'))
+    health_probe_timeout: float = float(
+        os.getenv('HEALTH_PROBE_TIMEOUT', '2')
+    )
+    user_cache_size: int = int(os.getenv('USER_CACHE_SIZE', '1024'))
+    user_cache_ttl: float = float(os.getenv('USER_CACHE_TTL', '60'))
+    user_cache_stale_ttl: float = float(
+        os.getenv('USER_CACHE_STALE_TTL', '0')
+    )
+    token_cache_size: int = int(os.getenv('TOKEN_CACHE_SIZE', '4096'))
+    token_embed_user_claims: bool = (
+        os.getenv('TOKEN_EMBED_USER_CLAIMS', 'True') == 'True'
+    )
+    token_epoch: int = int(os.getenv('TOKEN_EPOCH', '0'))
+    password_hash_executor: str = os.getenv(
+        'PASSWORD_HASH_EXECUTOR', 'thread'
+    )
+    password_hash_workers: int = int(os.getenv('PASSWORD_HASH_WORKERS', '2'))
+    password_hash_concurrency: int = int(
+        os.getenv('PASSWORD_HASH_CONCURRENCY', '4')
+    )
     
 
     class Config:
@@ -1,5 +1,20 @@
+import atexit
+import logging
+import os
+import queue
+from datetime import datetime, timezone
+from logging import config as logging_config
+from logging.handlers import QueueHandler, QueueListener
+from typing import List
+
+import orjson
+
 LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 LOG_DEFAULT_HANDLERS = ['console', ]
+# JSON-логи (по одному объекту на строку) для сборщиков логов
+LOG_JSON = (os.getenv('LOG_JSON', 'False') == 'True')
+# Запись логов в отдельном потоке, чтобы не блокировать event loop
+LOG_QUEUE = (os.getenv('LOG_QUEUE', 'True') == 'True')
 
 # Настраивается логирование uvicorn-сервера
 # Про логирование в Python можно прочитать в документации 
@@ -22,12 +37,15 @@ LOGGING = {
             '()': 'uvicorn.logging.AccessFormatter',
             'fmt': "%(levelprefix)s %(client_addr)s - '%(request_line)s' %(status_code)s",
         },
+        'json': {
+            '()': 'core.logger.JsonFormatter',
+        },
     },
     'handlers': {
         'console': {
             'level': 'DEBUG',
             'class': 'logging.StreamHandler',
-            'formatter': 'verbose',
+            'formatter': 'json' if LOG_JSON else 'verbose',
         },
         'default': {
             'formatter': 'default',
@@ -35,7 +53,7 @@ LOGGING = {
             'stream': 'ext://sys.stdout',
         },
         'access': {
-            'formatter': 'access',
+            'formatter': 'json' if LOG_JSON else 'access',
             'class': 'logging.StreamHandler',
             'stream': 'ext://sys.stdout',
         },
@@ -59,4 +77,87 @@ LOGGING = {
         'formatter': 'verbose',
         'handlers': LOG_DEFAULT_HANDLERS,
     },
-}
\ No newline at end of file
+}
+
+# Атрибуты LogRecord, которые не попадают в JSON как дополнительные поля
+_RECORD_ATTRS = frozenset(vars(
+    logging.LogRecord('', 0, '', 0, '', None, None)
+)) | {'message', 'asctime', 'color_message'}
+# Аргументы записи лога доступа uvicorn
+_ACCESS_FIELDS = (
+    'client_addr', 'method', 'path', 'http_version', 'status_code'
+)
+
+_listeners: List[QueueListener] = []
+
+
+class JsonFormatter(logging.Formatter):
+    """
+        Форматирует запись лога в одну строку JSON. Поля, переданные
+        через extra, добавляются в объект как есть.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            'time': datetime.fromtimestamp(
+                record.created, timezone.utc
+            ).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        if record.name == 'uvicorn.access' and \
+                isinstance(record.args, tuple) and \
+                len(record.args) == len(_ACCESS_FIELDS):
+            data.update(zip(_ACCESS_FIELDS, record.args))
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS:
+                data[key] = value
+        if record.exc_info:
+            data['exc_info'] = self.formatException(record.exc_info)
+        return orjson.dumps(data, default=str).decode()
+
+
+class LocalQueueHandler(QueueHandler):
+    """
+        QueueHandler для очереди внутри процесса. Стандартный prepare
+        форматирует сообщение заранее и обнуляет args, а форматтеру
+        лога доступа uvicorn и JsonFormatter аргументы нужны.
+        Записи не сериализуются, поэтому передаются как есть.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def _enqueue(logger: logging.Logger) -> None:
+    """
+        Подменяет обработчики логгера одним QueueHandler, а исходные
+        обработчики вызываются из фонового потока QueueListener.
+    """
+    handlers = logger.handlers[:]
+    if not handlers:
+        return
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    listener = QueueListener(
+        log_queue, *handlers, respect_handler_level=True
+    )
+    logger.handlers = [LocalQueueHandler(log_queue)]
+    listener.start()
+    _listeners.append(listener)
+
+
+def stop_listeners() -> None:
+    while _listeners:
+        _listeners.pop().stop()
+
+
+def setup_logging() -> None:
+    logging_config.dictConfig(LOGGING)
+    if LOG_QUEUE:
+        stop_listeners()
+        _enqueue(logging.getLogger())
+        _enqueue(logging.getLogger('uvicorn.access'))
+
+
+atexit.register(stop_listeners)
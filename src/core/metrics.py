@@ -0,0 +1,171 @@
+import os
+import time
+from typing import Optional
+
+from prometheus_client import (
+    REGISTRY, CollectorRegistry, Counter, Gauge,
+    Histogram, generate_latest
+)
+from prometheus_client.multiprocess import MultiProcessCollector
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Границы корзин рассчитаны на диапазон от миллисекунд до минут:
+# загрузки больших файлов длятся заметно дольше обычных запросов.
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0
+)
+DB_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0
+)
+DB_OPERATIONS = frozenset(
+    ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH', 'BEGIN', 'COMMIT')
+)
+
+REQUEST_LATENCY = Histogram(
+    'mydisk_http_request_duration_seconds',
+    'HTTP request latency',
+    ['method', 'route', 'status'],
+    buckets=LATENCY_BUCKETS,
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    'mydisk_http_requests_in_flight',
+    'HTTP requests being processed',
+    multiprocess_mode='livesum',
+)
+REQUEST_BYTES = Counter(
+    'mydisk_http_request_bytes_total',
+    'Bytes received in request bodies',
+    ['route'],
+)
+RESPONSE_BYTES = Counter(
+    'mydisk_http_response_bytes_total',
+    'Bytes sent in response bodies',
+    ['route'],
+)
+TRANSFERS_IN_FLIGHT = Gauge(
+    'mydisk_transfers_in_flight',
+    'Uploads and downloads in progress',
+    ['kind'],
+    multiprocess_mode='livesum',
+)
+STAGE_LATENCY = Histogram(
+    'mydisk_stage_duration_seconds',
+    'Latency of named stages inside request handlers',
+    ['stage'],
+    buckets=LATENCY_BUCKETS,
+)
+JOBS_PROCESSED = Counter(
+    'mydisk_jobs_total',
+    'Background jobs processed',
+    ['kind', 'outcome'],
+)
+JOB_LATENCY = Histogram(
+    'mydisk_job_duration_seconds',
+    'Background job latency',
+    ['kind'],
+    buckets=LATENCY_BUCKETS,
+)
+DB_QUERY_LATENCY = Histogram(
+    'mydisk_db_query_duration_seconds',
+    'Database query latency',
+    ['operation'],
+    buckets=DB_BUCKETS,
+)
+
+
+class stage:
+    """
+        Замеряет длительность именованного этапа обработки запроса:
+
+            with stage('create_or_update'):
+                ...
+    """
+
+    __slots__ = ('_histogram', '_start')
+
+    def __init__(self, name: str) -> None:
+        self._histogram = STAGE_LATENCY.labels(name)
+        self._start = 0.0
+
+    def __enter__(self) -> 'stage':
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._histogram.observe(time.perf_counter() - self._start)
+
+
+def track_transfer(kind: str):
+    return TRANSFERS_IN_FLIGHT.labels(kind).track_inprogress()
+
+
+def observe_query(statement: str, duration: float) -> None:
+    words = statement.split(None, 1)
+    operation = words[0].upper() if words else 'OTHER'
+    if operation not in DB_OPERATIONS:
+        operation = 'OTHER'
+    DB_QUERY_LATENCY.labels(operation).observe(duration)
+
+
+def render_metrics() -> bytes:
+    """
+        При запуске в нескольких процессах (gunicorn) метрики
+        собираются из каталога PROMETHEUS_MULTIPROC_DIR.
+    """
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+
+class MetricsMiddleware:
+    """
+        ASGI-middleware: латентность, число запросов в обработке
+        и объем переданных данных по маршрутам. В отличие от
+        BaseHTTPMiddleware не буферизует потоковые ответы.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        status_code: Optional[int] = None
+        bytes_in = 0
+        bytes_out = 0
+
+        async def receive_wrapper() -> Message:
+            nonlocal bytes_in
+            message = await receive()
+            if message['type'] == 'http.request':
+                bytes_in += len(message.get('body', b''))
+            return message
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code, bytes_out
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+            elif message['type'] == 'http.response.body':
+                bytes_out += len(message.get('body', b''))
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive_wrapper, send_wrapper)
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+            route = scope.get('route')
+            route_path = route.path if route is not None else 'unmatched'
+            REQUEST_LATENCY.labels(
+                scope['method'], route_path, str(status_code or 500)
+            ).observe(time.perf_counter() - start)
+            if bytes_in:
+                REQUEST_BYTES.labels(route_path).inc(bytes_in)
+            if bytes_out:
+                RESPONSE_BYTES.labels(route_path).inc(bytes_out)
@@ -2,10 +2,29 @@ from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import declarative_base, sessionmaker
 
 from core.config import app_settings
+from db.pool import MeteredQueuePool
+from db.query_log import install_query_logging
 
 Base = declarative_base()
 engine = create_async_engine(
-    app_settings.database_dsn, echo=app_settings.echo, future=True
+    app_settings.database_dsn,
+    echo=app_settings.echo,
+    future=True,
+    poolclass=MeteredQueuePool,
+    pool_size=app_settings.db_pool_size,
+    max_overflow=app_settings.db_max_overflow,
+    pool_timeout=app_settings.db_pool_timeout,
+    pool_recycle=app_settings.db_pool_recycle,
+    pool_pre_ping=app_settings.db_pool_pre_ping,
+    connect_args={
+        'prepared_statement_cache_size':
+            app_settings.db_prepared_statement_cache_size,
+    },
+)
+install_query_logging(
+    engine.sync_engine,
+    slow_query_ms=app_settings.db_slow_query_ms,
+    sample_rate=app_settings.db_query_sample_rate,
 )
 async_session = sessionmaker(
     engine, class_=AsyncSession, expire_on_commit=False
@@ -0,0 +1,56 @@
+import time
+from typing import Dict, Union
+
+from sqlalchemy.exc import TimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+
+class MeteredQueuePool(AsyncAdaptedQueuePool):
+    """
+        Пул соединений, который учитывает, сколько раз и как долго
+        запросы ждали освобождения соединения. Использует только
+        публичный API пула: ожиданием считается запрос соединения,
+        когда свободных соединений нет и лимит переполнения исчерпан.
+    """
+
+    def __init__(self, *args, max_overflow: int = 10, **kwargs) -> None:
+        super().__init__(*args, max_overflow=max_overflow, **kwargs)
+        self.max_overflow = max_overflow
+        self.waits = 0
+        self.timeouts = 0
+        self.wait_time = 0.0
+        self.max_wait_time = 0.0
+
+    def exhausted(self) -> bool:
+        return (
+            self.checkedin() == 0
+            and self.max_overflow >= 0
+            and self.overflow() >= self.max_overflow
+        )
+
+    def connect(self):
+        if not self.exhausted():
+            return super().connect()
+        self.waits += 1
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        except TimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            self.wait_time += elapsed
+            self.max_wait_time = max(self.max_wait_time, elapsed)
+
+    def stats(self) -> Dict[str, Union[int, float]]:
+        return {
+            'size': self.size(),
+            'checked_in': self.checkedin(),
+            'checked_out': self.checkedout(),
+            'overflow': self.overflow(),
+            'waits': self.waits,
+            'timeouts': self.timeouts,
+            'wait_time': self.wait_time,
+            'max_wait_time': self.max_wait_time,
+        }
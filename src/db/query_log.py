@@ -0,0 +1,63 @@
+import logging
+import random
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from core.metrics import observe_query
+
+logger = logging.getLogger('db.query')
+
+
+def install_query_logging(
+    engine: Engine,
+    slow_query_ms: float,
+    sample_rate: float = 0.0,
+) -> None:
+    """
+        Логирует медленные запросы (дольше slow_query_ms) и случайную
+        долю sample_rate остальных вместо вывода всех запросов через
+        echo. Параметры запросов в лог не попадают. Длительность
+        каждого запроса также попадает в метрики.
+    """
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def before_cursor_execute(
+        conn, cursor, statement, parameters, context, executemany
+    ) -> None:
+        conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def after_cursor_execute(
+        conn, cursor, statement, parameters, context, executemany
+    ) -> None:
+        duration = time.perf_counter() - conn.info['query_start'].pop()
+        observe_query(statement, duration)
+        duration_ms = duration * 1000
+        if duration_ms >= slow_query_ms:
+            level = logging.WARNING
+            message = 'Slow query'
+        elif sample_rate and random.random() < sample_rate:
+            level = logging.INFO
+            message = 'Sampled query'
+        else:
+            return
+        logger.log(
+            level,
+            '%s (%.1f ms): %s',
+            message,
+            duration_ms,
+            statement,
+            extra={
+                'duration_ms': round(duration_ms, 3),
+                'statement': statement,
+                'executemany': executemany,
+            }
+        )
+
+    @event.listens_for(engine, 'handle_error')
+    def handle_error(context) -> None:
+        conn = context.connection
+        if conn is not None and conn.info.get('query_start'):
+            conn.info['query_start'].pop()
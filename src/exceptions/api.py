@@ -46,4 +46,89 @@ class FilePathError(FileError):
     ) -> None:
         super().__init__(
             detail=detail,
-        )
\ No newline at end of file
+        )
+
+class RangeNotSatisfiableError(HTTPException):
+    def __init__(
+        self,
+        size: int,
+        status_code: int = status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+        detail: str = 'Requested range not satisfiable',
+    ) -> None:
+        super().__init__(
+            status_code=status_code,
+            detail=detail,
+            headers={'Content-Range': f'bytes */{size}'}
+        )
+
+
+class CursorError(FileError):
+    def __init__(
+        self,
+        detail: str = 'Incorrect cursor',
+    ) -> None:
+        super().__init__(
+            detail=detail,
+        )
+
+
+class UploadSessionNotFoundError(HTTPException):
+    def __init__(
+        self,
+        status_code: int = status.HTTP_404_NOT_FOUND,
+        detail: str = 'Upload session not found or expired',
+        headers: dict = {"WWW-Authenticate": "Bearer"}
+    ) -> None:
+        super().__init__(
+            status_code=status_code,
+            detail=detail,
+            headers=headers
+        )
+
+
+class CursorExpiredError(HTTPException):
+    def __init__(
+        self,
+        status_code: int = status.HTTP_410_GONE,
+        detail: str = 'Cursor is too old, full resync is required',
+    ) -> None:
+        super().__init__(
+            status_code=status_code,
+            detail=detail,
+        )
+
+
+class QuotaExceededError(HTTPException):
+    def __init__(
+        self,
+        status_code: int = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail: str = 'Storage quota exceeded',
+    ) -> None:
+        super().__init__(
+            status_code=status_code,
+            detail=detail,
+        )
+
+
+class PathConflictError(HTTPException):
+    def __init__(
+        self,
+        status_code: int = status.HTTP_409_CONFLICT,
+        detail: str = 'File or folder with this path already exists',
+    ) -> None:
+        super().__init__(
+            status_code=status_code,
+            detail=detail,
+        )
+
+
+class PreviewNotSupportedError(HTTPException):
+    def __init__(
+        self,
+        status_code: int = status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+        detail: str = 'Preview is not available for this file',
+    ) -> None:
+        super().__init__(
+            status_code=status_code,
+            detail=detail,
+        )
@@ -1,18 +1,57 @@
 import uvicorn
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.responses import ORJSONResponse
+from prometheus_client import CONTENT_TYPE_LATEST
 
 from api.v1 import base
 from core.config import app_settings
+from core.metrics import MetricsMiddleware, render_metrics
+from services.auth import hashing_pool
+from services.background import start_periodic, stop_all
+from services.changes import reap_file_changes
+from services.jobs import job_queue
+from services.previews import evict_previews, preview_pool
+from services.quota import QuotaMiddleware, reconcile_usage
+from services.storage import reap_blobs, reap_upload_sessions, storage
 
 app = FastAPI(
     title=app_settings.app_title,
     default_response_class=ORJSONResponse,
 )
 
+app.add_middleware(QuotaMiddleware)
+app.add_middleware(MetricsMiddleware)
 app.include_router(base.router, prefix=app_settings.api_v1_prefix)
 
 
+@app.get('/metrics', include_in_schema=False)
+def metrics() -> Response:
+    return Response(render_metrics(), media_type=CONTENT_TYPE_LATEST)
+
+
+@app.on_event('startup')
+async def startup() -> None:
+    job_queue.start()
+    start_periodic(reap_blobs, app_settings.blob_reap_interval)
+    start_periodic(
+        reap_upload_sessions, app_settings.upload_session_reap_interval
+    )
+    start_periodic(reconcile_usage, app_settings.usage_reconcile_interval)
+    start_periodic(
+        reap_file_changes, app_settings.file_changes_reap_interval
+    )
+    start_periodic(evict_previews, app_settings.preview_evict_interval)
+
+
+@app.on_event('shutdown')
+async def shutdown() -> None:
+    await stop_all()
+    await job_queue.stop()
+    await storage.close()
+    hashing_pool.shutdown()
+    preview_pool.shutdown()
+
+
 if __name__ == "__main__":
     uvicorn.run(
         'main:app',
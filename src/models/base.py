@@ -1,6 +1,9 @@
 from datetime import datetime
 
-from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Integer, String
+from sqlalchemy import (
+    BigInteger, Boolean, Column, DateTime, ForeignKey, Index, Integer, String,
+    Text, UniqueConstraint, text
+)
 from sqlalchemy.orm import relationship
 
 from db.db import Base
@@ -13,6 +16,18 @@ class User(Base):
     hashed_password = Column(String(100), nullable=False)
     files = relationship('File', back_populates='user', cascade='delete, merge, save-update')
     uuid = Column(String(100), unique=True, nullable=False)
+    files_version = Column(
+        BigInteger, nullable=False, default=0, server_default='0'
+    )
+    files_modified_at = Column(DateTime)
+    used_bytes = Column(
+        BigInteger, nullable=False, default=0, server_default='0'
+    )
+    files_count = Column(
+        BigInteger, nullable=False, default=0, server_default='0'
+    )
+    # Индивидуальная квота, None — квота по умолчанию (USER_QUOTA_BYTES)
+    quota_bytes = Column(BigInteger)
 
     def __repr__(self) -> str:
         return f'User {self.username}'
@@ -20,11 +35,172 @@ class User(Base):
 
 class File(Base):
     __tablename__ = 'files'
+    __table_args__ = (
+        UniqueConstraint('user_id', 'path', name='uq_files_user_id_path'),
+        Index('ix_files_user_id_created_at_id', 'user_id', 'created_at', 'id'),
+        Index('ix_files_user_id_size_id', 'user_id', 'size', 'id'),
+        Index('ix_files_user_id_mime_type', 'user_id', 'mime_type'),
+        Index(
+            'ix_files_user_id_path_pattern', 'user_id', 'path',
+            postgresql_ops={'path': 'varchar_pattern_ops'}
+        ),
+        Index(
+            'ix_files_user_id_folder_id_path', 'user_id', 'folder_id', 'path'
+        ),
+    )
     id = Column(Integer, primary_key=True)
     created_at = Column(DateTime, index=True, default=datetime.utcnow) 
-    path = Column(String(300), unique=True, nullable=False)
-    size = Column(Integer, nullable=False)
+    path = Column(String(300), nullable=False)
+    size = Column(BigInteger, nullable=False)
     is_downloadable = Column(Boolean, default=True)
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
     user = relationship('User', back_populates="files")
     uuid = Column(String(100), unique=True, nullable=False)
+    mime_type = Column(String(100))
+    blob_digest = Column(String(64), ForeignKey('blobs.digest'), index=True)
+    # None — файл лежит в корне
+    folder_id = Column(Integer, ForeignKey('folders.id'))
+    # Состояние фоновой обработки: pending, done или failed
+    processing_status = Column(String(16))
+    blob = relationship('Blob')
+    stored_size = Column(BigInteger)
+    content_encoding = Column(String(16))
+
+
+class Blob(Base):
+    __tablename__ = 'blobs'
+    __table_args__ = (
+        Index(
+            'ix_blobs_unreferenced', 'updated_at',
+            postgresql_where=text('ref_count = 0')
+        ),
+    )
+    digest = Column(String(64), primary_key=True)
+    size = Column(BigInteger, nullable=False)
+    stored_size = Column(BigInteger)
+    encoding = Column(String(16))
+    ref_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+
+class UploadSession(Base):
+    __tablename__ = 'upload_sessions'
+    id = Column(Integer, primary_key=True)
+    uuid = Column(String(100), unique=True, nullable=False)
+    user_id = Column(
+        Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False
+    )
+    path = Column(String(300), nullable=False)
+    mime_type = Column(String(100))
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, index=True, nullable=False)
+    parts = relationship(
+        'UploadPart',
+        order_by='UploadPart.part_number',
+        cascade='all, delete-orphan',
+        passive_deletes=True
+    )
+
+
+class UploadPart(Base):
+    __tablename__ = 'upload_parts'
+    session_id = Column(
+        Integer,
+        ForeignKey('upload_sessions.id', ondelete='CASCADE'),
+        primary_key=True
+    )
+    part_number = Column(Integer, primary_key=True)
+    size = Column(BigInteger, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class FileChange(Base):
+    __tablename__ = 'file_changes'
+    __table_args__ = (
+        Index('ix_file_changes_user_id_id', 'user_id', 'id'),
+    )
+    id = Column(BigInteger, primary_key=True)
+    user_id = Column(
+        Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False
+    )
+    file_uuid = Column(String(100), nullable=False)
+    path = Column(String(300), nullable=False)
+    action = Column(String(16), nullable=False)
+    size = Column(BigInteger)
+    mime_type = Column(String(100))
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+
+class Folder(Base):
+    """
+        Каталог пользователя. Каталоги создаются неявно при записи
+        файлов. size и files_count — суммарный объем и количество
+        файлов во всем поддереве, обновляются при каждой записи.
+    """
+    __tablename__ = 'folders'
+    __table_args__ = (
+        UniqueConstraint('user_id', 'path', name='uq_folders_user_id_path'),
+        Index(
+            'ix_folders_user_id_parent_id_name',
+            'user_id', 'parent_id', 'name'
+        ),
+    )
+    id = Column(Integer, primary_key=True)
+    user_id = Column(
+        Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False
+    )
+    parent_id = Column(Integer, ForeignKey('folders.id', ondelete='CASCADE'))
+    name = Column(String(300), nullable=False)
+    path = Column(String(300), nullable=False)
+    size = Column(BigInteger, nullable=False, default=0, server_default='0')
+    files_count = Column(
+        BigInteger, nullable=False, default=0, server_default='0'
+    )
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class Job(Base):
+    """
+        Задача фоновой обработки файла. Выполненные задачи удаляются,
+        упавшие после всех попыток остаются со статусом failed.
+    """
+    __tablename__ = 'jobs'
+    __table_args__ = (
+        Index('ix_jobs_status_run_at', 'status', 'run_at'),
+    )
+    id = Column(BigInteger, primary_key=True)
+    kind = Column(String(32), nullable=False)
+    file_id = Column(
+        Integer, ForeignKey('files.id', ondelete='CASCADE'), index=True
+    )
+    # pending, running или failed; у running run_at — срок аренды,
+    # после которого задачу подберет другой воркер
+    status = Column(String(16), nullable=False, default='pending')
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False)
+    run_at = Column(DateTime, nullable=False)
+    last_error = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class Preview(Base):
+    """
+        Уменьшенная копия изображения в хранилище. Привязана к блобу,
+        а не к файлу: при перезаписи файла меняется его блоб, и старые
+        превью перестают использоваться, пока их не удалит вытеснение
+        или очистка блобов.
+    """
+    __tablename__ = 'previews'
+    __table_args__ = (
+        UniqueConstraint(
+            'digest', 'size', 'format', name='uq_previews_digest_size_format'
+        ),
+    )
+    id = Column(BigInteger, primary_key=True)
+    digest = Column(String(64), nullable=False)
+    size = Column(BigInteger, nullable=False)
+    format = Column(String(8), nullable=False)
+    stored_size = Column(BigInteger, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    accessed_at = Column(DateTime, default=datetime.utcnow, index=True)
@@ -1,11 +1,35 @@
-from datetime import datetime, timedelta
-from typing import List
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Literal, Optional
 
+from fastapi import Query
 from pydantic import BaseModel
 
 
+class PoolStats(BaseModel):
+    size: int
+    checked_in: int
+    checked_out: int
+    overflow: int
+    waits: int
+    timeouts: int
+    wait_time: float
+    max_wait_time: float
+
+
+class ServiceHealth(BaseModel):
+    ok: bool
+    latency: Optional[float] = None
+    error: Optional[str] = None
+    details: Dict[str, Any] = {}
+
+
 class Ping(BaseModel):
-    db: timedelta
+    db: Optional[float] = None
+    storage: Optional[float] = None
+    cache: Optional[float] = None
+    services: Dict[str, ServiceHealth] = {}
+    pool: Optional[PoolStats] = None
 
 class Token(BaseModel):
     access_token: str
@@ -38,6 +62,17 @@ class FileUpdate(BaseModel):
 class File(FileUpdate):
     is_downloadable: bool = True
     uuid: str
+    mime_type: Optional[str] = None
+    blob_digest: Optional[str] = None
+    stored_size: Optional[int] = None
+    content_encoding: Optional[str] = None
+
+
+class Blob(BaseModel):
+    digest: str
+    size: int
+    stored_size: Optional[int] = None
+    encoding: Optional[str] = None
 
 
 class FileInDB(BaseModel):
@@ -47,8 +82,98 @@ class FileInDB(BaseModel):
     path: str
     size: int
     is_downloadable: bool
+    mime_type: Optional[str] = None
+    stored_size: Optional[int] = None
+    content_encoding: Optional[str] = None
+    processing_status: Optional[str] = None
 
 
 class FileList(BaseModel):
     account_id: str
-    files: List[FileInDB]
\ No newline at end of file
+    files: List[FileInDB]
+    next_cursor: Optional[str] = None
+
+
+@dataclass
+class FileFilter:
+    path: Optional[str] = Query(
+        None, description='Каталог, в котором искать файлы'
+    )
+    mime_type: Optional[str] = Query(
+        None, description='MIME-тип, например image/png или image/*'
+    )
+    min_size: Optional[int] = Query(None, ge=0)
+    max_size: Optional[int] = Query(None, ge=0)
+    order_by: Literal['created_at', 'size', 'path'] = Query('created_at')
+    order: Literal['asc', 'desc'] = Query('asc')
+    cursor: Optional[str] = Query(
+        None, description='Значение next_cursor из предыдущего ответа'
+    )
+    limit: Optional[int] = Query(None, ge=1, le=1000)
+
+
+class UploadSessionCreate(BaseModel):
+    path: str
+    content_type: str
+    filename: Optional[str] = None
+
+
+class UploadPart(BaseModel):
+    part_number: int
+    size: int
+
+
+class UploadSession(BaseModel):
+    upload_id: str
+    path: str
+    mime_type: Optional[str] = None
+    created_at: datetime
+    expires_at: datetime
+    parts: List[UploadPart] = []
+
+
+class FileChange(BaseModel):
+    action: Literal['created', 'updated', 'deleted']
+    id: str
+    path: str
+    size: Optional[int] = None
+    mime_type: Optional[str] = None
+    changed_at: datetime
+
+
+class FileChanges(BaseModel):
+    changes: List[FileChange]
+    cursor: str
+    has_more: bool = False
+
+
+class Usage(BaseModel):
+    used_bytes: int
+    files_count: int
+    quota_bytes: Optional[int] = None
+
+
+class Folder(BaseModel):
+    name: str
+    path: str
+    size: int
+    files_count: int
+
+
+class FolderTree(BaseModel):
+    path: str
+    size: int
+    files_count: int
+    folders: List[Folder]
+    files: List[FileInDB]
+    has_more: bool = False
+
+
+class FileMove(BaseModel):
+    path: str
+    destination: str
+
+
+class FileOperation(BaseModel):
+    files_count: int
+    size: int
@@ -0,0 +1,129 @@
+import calendar
+import sys
+import tarfile
+import zipfile
+import zlib
+from datetime import datetime
+from typing import AsyncIterator, List, NamedTuple, Optional
+
+from core.config import app_settings
+from services.compression import offload
+from services.storage import read_blob
+
+
+class ArchiveEntry(NamedTuple):
+    name: str
+    key: str
+    size: int
+    mtime: datetime
+    encoding: Optional[str] = None
+
+
+class _Sink:
+    """
+        Файлоподобный объект без seek: собирает записанные данные
+        до следующего вызова drain.
+    """
+
+    def __init__(self) -> None:
+        self._chunks: List[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _iter_content(entry: ArchiveEntry) -> AsyncIterator[bytes]:
+    return read_blob(
+        entry.key, entry.encoding,
+        chunk_size=app_settings.download_chunk_size
+    )
+
+
+def _set_compress_level(info: zipfile.ZipInfo, level: Optional[int]) -> None:
+    """
+        Уровень сжатия отдельного файла архива. Публичный атрибут
+        ZipInfo.compress_level появился в Python 3.13, в более ранних
+        версиях ZipFile.open(name, 'w') задает его так же, через
+        _compresslevel, а публичного способа передать уровень вместе
+        с ZipInfo (и временем изменения файла) нет.
+    """
+    if sys.version_info >= (3, 13):
+        info.compress_level = level
+    else:
+        info._compresslevel = level
+
+
+async def iter_zip(
+    entries: AsyncIterator[ArchiveEntry],
+    compression_level: int = 6,
+) -> AsyncIterator[bytes]:
+    """
+        Потоково собирает zip-архив. Размер и CRC каждого файла
+        записываются после его содержимого (data descriptor), поэтому
+        архив не требует временного файла. В памяти остается только
+        оглавление архива. Сжатие крупных чанков выполняется
+        в пуле потоков.
+    """
+    compression = zipfile.ZIP_DEFLATED if compression_level else \
+        zipfile.ZIP_STORED
+    sink = _Sink()
+    with zipfile.ZipFile(sink, mode='w', allowZip64=True) as archive:
+        async for entry in entries:
+            info = zipfile.ZipInfo(
+                entry.name,
+                date_time=max(entry.mtime.timetuple()[:6], (1980, 1, 1))
+            )
+            info.compress_type = compression
+            _set_compress_level(info, compression_level or None)
+            info.file_size = entry.size
+            with archive.open(info, mode='w') as dest:
+                async for chunk in _iter_content(entry):
+                    await offload(dest.write, chunk)
+                    if data := sink.drain():
+                        yield data
+            yield sink.drain()
+    yield sink.drain()
+
+
+async def iter_tar_gz(
+    entries: AsyncIterator[ArchiveEntry],
+    compression_level: int = 6,
+) -> AsyncIterator[bytes]:
+    """
+        Потоково собирает tar.gz: заголовок tar, содержимое файла
+        и выравнивание до блока сжимаются по мере чтения из хранилища.
+        Сжатие крупных чанков выполняется в пуле потоков.
+    """
+    compressor = zlib.compressobj(
+        compression_level, zlib.DEFLATED, zlib.MAX_WBITS | 16
+    )
+    async for entry in entries:
+        info = tarfile.TarInfo(entry.name)
+        info.size = entry.size
+        # mtime в базе данных хранится в UTC без часового пояса
+        info.mtime = calendar.timegm(entry.mtime.utctimetuple())
+        info.mode = 0o644
+        yield compressor.compress(info.tobuf(format=tarfile.PAX_FORMAT))
+        written = 0
+        async for chunk in _iter_content(entry):
+            written += len(chunk)
+            if data := await offload(compressor.compress, chunk):
+                yield data
+        if written != entry.size:
+            raise RuntimeError(
+                f'Size mismatch for {entry.name}: '
+                f'expected {entry.size}, got {written}'
+            )
+        padding = -entry.size % tarfile.BLOCKSIZE
+        yield compressor.compress(tarfile.NUL * padding)
+    yield compressor.compress(tarfile.NUL * tarfile.BLOCKSIZE * 2)
+    yield compressor.flush()
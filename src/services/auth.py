@@ -1,5 +1,8 @@
+import asyncio
+import hashlib
+import time
 from datetime import datetime, timedelta
-from typing import Annotated
+from typing import Annotated, Dict, Optional
 
 from fastapi import Depends
 from fastapi.security import OAuth2PasswordBearer
@@ -8,73 +11,180 @@ from passlib.context import CryptContext
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from core.config import app_settings
-from db.db import get_session
+from core.metrics import stage
+from db.db import async_session, get_session
 from exceptions.auth import CredentialException
 from models import base as models
 from schemas import base as schemas
-from services.db import user_crud
+from services import db as crud
+from services.cache import TTLCache
+from services.workers import WorkerPool
 
 SECRET_KEY = app_settings.secret_key
 ALGORITHM = 'HS256'
 ACCESS_TOKEN_EXPIRE_DAYS = 7
+# Увеличение эпохи отзывает все ранее выданные токены
+TOKEN_EPOCH = app_settings.token_epoch
 
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl='/api/v1/auth')
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-
-def get_password_hash(password: str) -> str:
+hashing_pool = WorkerPool(
+    executor=app_settings.password_hash_executor,
+    workers=app_settings.password_hash_workers,
+    concurrency=app_settings.password_hash_concurrency,
+    name='hashing',
+)
+
+user_cache: TTLCache[str, schemas.FullUser] = TTLCache(
+    maxsize=app_settings.user_cache_size,
+    ttl=app_settings.user_cache_ttl,
+    stale_ttl=app_settings.user_cache_stale_ttl,
+)
+_refresh_tasks: Dict[str, asyncio.Task] = {}
+# Ключ — SHA-256 токена, запись живет до истечения токена (exp)
+token_cache: TTLCache[str, dict] = TTLCache(
+    maxsize=app_settings.token_cache_size,
+    ttl=0,
+)
+
+
+def _hash_password(password: str) -> str:
     return pwd_context.hash(password)
 
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
+def _verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+async def get_password_hash(password: str) -> str:
+    return await hashing_pool.run(_hash_password, password)
+
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return await hashing_pool.run(
+        _verify_password, plain_password, hashed_password
+    )
+
+
 async def authenticate_user(
     db: AsyncSession,
     username: str,
     password: str
 ) -> models.User | None:
-    user: models.User | None = await user_crud.get(
+    user: models.User | None = await crud.user_crud.get(
         db=db,
         username=username
     )
     if not user:
         return None
-    if not verify_password(password, user.hashed_password):
+    if not await verify_password(password, user.hashed_password):
         return None
     return user
 
 
-def create_access_token(data: dict, expires_delta: timedelta):
+def create_access_token(
+    data: dict,
+    expires_delta: timedelta,
+    user: Optional[models.User] = None
+):
+    """
+        Если передан user, в токен добавляются его id и uuid, и для
+        проверки такого токена обращение к базе данных не требуется.
+    """
     to_encode = data.copy()
     expire = datetime.utcnow() + expires_delta
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "epoch": TOKEN_EPOCH})
+    if user is not None:
+        to_encode.update({"id": user.id, "uuid": user.uuid})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
 
-async def get_current_user(
-    token: Annotated[str, Depends(oauth2_scheme)],
-    db: AsyncSession = Depends(get_session),
-) -> schemas.User:
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise CredentialException
-    except JWTError:
-        raise CredentialException
-    user_in_db: models.User | None = await user_crud.get(
+async def load_user(
+    db: AsyncSession,
+    username: str
+) -> Optional[schemas.FullUser]:
+    user_in_db: models.User | None = await crud.user_crud.get(
         db=db,
         username=username
     )
     if user_in_db is None:
-        raise CredentialException
-    return schemas.FullUser(
+        user_cache.invalidate(username)
+        return None
+    user = schemas.FullUser(
         username=username,
         id=user_in_db.id,
         uuid=user_in_db.uuid
     )
+    user_cache.set(username, user)
+    return user
+
+
+async def _revalidate_user(username: str) -> None:
+    async with async_session() as db:
+        await load_user(db, username)
+
+
+def refresh_user(username: str) -> None:
+    """
+        Обновляет устаревшую запись кэша в фоне, не задерживая запрос.
+    """
+    if username in _refresh_tasks:
+        return
+    task = asyncio.create_task(_revalidate_user(username))
+    _refresh_tasks[username] = task
+    task.add_done_callback(lambda _: _refresh_tasks.pop(username, None))
+
+
+def decode_token(token: str) -> dict:
+    """
+        Проверяет подпись и срок действия токена. Результат кэшируется
+        до истечения токена, так что повторные запросы с тем же
+        токеном не декодируют его заново.
+    """
+    key = hashlib.sha256(token.encode()).hexdigest()
+    payload = token_cache.get(key)
+    if payload is not None:
+        return payload
+    try:
+        with stage('jwt_decode'):
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        raise CredentialException
+    if payload.get("sub") is None:
+        raise CredentialException
+    if payload.get("epoch", 0) < TOKEN_EPOCH:
+        raise CredentialException
+    ttl = payload.get("exp", 0) - time.time()
+    if ttl > 0:
+        token_cache.set(key, payload, ttl=ttl)
+    return payload
+
+
+async def user_from_token(db: AsyncSession, token: str) -> schemas.FullUser:
+    payload = decode_token(token)
+    username: str = payload["sub"]
+    if "id" in payload and "uuid" in payload:
+        return schemas.FullUser(
+            username=username,
+            id=payload["id"],
+            uuid=payload["uuid"]
+        )
+    with stage('user_lookup'):
+        user, stale = user_cache.lookup(username)
+        if user is None:
+            user = await load_user(db, username)
+        elif stale:
+            refresh_user(username)
+    if user is None:
+        raise CredentialException
+    return user
+
+
+async def get_current_user(
+    token: Annotated[str, Depends(oauth2_scheme)],
+    db: AsyncSession = Depends(get_session),
+) -> schemas.FullUser:
+    return await user_from_token(db, token)
@@ -0,0 +1,267 @@
+import asyncio
+import errno
+import os
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import AsyncExitStack
+from typing import Any, AsyncIterator, NamedTuple, Optional
+
+import aiofiles
+import aiofiles.os
+
+DEFAULT_CHUNK_SIZE = 256 * 1024
+
+
+class StorageStat(NamedTuple):
+    size: int
+    mtime: float
+    etag: str
+
+
+async def iter_local_file(
+    file_path: str,
+    chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> AsyncIterator[bytes]:
+    async with aiofiles.open(file_path, mode='rb') as file_like:
+        while chunk := await file_like.read(chunk_size):
+            yield chunk
+
+
+class StorageBackend(ABC):
+    """
+        Хранилище содержимого файлов. Ключи — относительные пути
+        вида blobs/ab/cd/<digest>.
+    """
+
+    @abstractmethod
+    async def put(self, key: str, chunks: AsyncIterator[bytes]) -> None:
+        ...
+
+    async def put_file(self, key: str, local_path: str) -> None:
+        """
+            Переносит локальный временный файл в хранилище.
+            После успешного вызова локальный файл удален.
+        """
+        await self.put(key, iter_local_file(local_path))
+        await aiofiles.os.remove(local_path)
+
+    @abstractmethod
+    def get(
+        self,
+        key: str,
+        start: int = 0,
+        length: Optional[int] = None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ) -> AsyncIterator[bytes]:
+        ...
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        ...
+
+    @abstractmethod
+    async def stat(self, key: str) -> Optional[StorageStat]:
+        ...
+
+    async def exists(self, key: str) -> bool:
+        return await self.stat(key) is not None
+
+    async def close(self) -> None:
+        pass
+
+
+class LocalStorage(StorageBackend):
+    def __init__(self, root: str) -> None:
+        self.root = root
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    async def put(self, key: str, chunks: AsyncIterator[bytes]) -> None:
+        file_path = self.path(key)
+        await aiofiles.os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        tmp_path = f'{file_path}.{uuid.uuid4().hex}.part'
+        async with aiofiles.open(tmp_path, 'wb') as out_file:
+            async for chunk in chunks:
+                await out_file.write(chunk)
+        await aiofiles.os.replace(tmp_path, file_path)
+
+    async def put_file(self, key: str, local_path: str) -> None:
+        file_path = self.path(key)
+        await aiofiles.os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        try:
+            await aiofiles.os.replace(local_path, file_path)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            await super().put_file(key, local_path)
+
+    async def get(
+        self,
+        key: str,
+        start: int = 0,
+        length: Optional[int] = None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ) -> AsyncIterator[bytes]:
+        async with aiofiles.open(self.path(key), mode='rb') as file_like:
+            await file_like.seek(start)
+            while length is None or length > 0:
+                size = chunk_size if length is None else min(chunk_size, length)
+                chunk = await file_like.read(size)
+                if not chunk:
+                    break
+                if length is not None:
+                    length -= len(chunk)
+                yield chunk
+
+    async def delete(self, key: str) -> None:
+        try:
+            await aiofiles.os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+    async def stat(self, key: str) -> Optional[StorageStat]:
+        try:
+            stat_result = await aiofiles.os.stat(self.path(key))
+        except FileNotFoundError:
+            return None
+        return StorageStat(
+            size=stat_result.st_size,
+            mtime=stat_result.st_mtime,
+            etag=f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"',
+        )
+
+
+class S3Storage(StorageBackend):
+    """
+        S3-совместимое хранилище (AWS S3, MinIO). Крупные файлы
+        загружаются multipart upload, чтение идет ranged GET-запросами.
+    """
+
+    MIN_PART_SIZE = 5 * 1024 * 1024
+
+    def __init__(
+        self,
+        bucket: str,
+        endpoint_url: Optional[str] = None,
+        access_key: Optional[str] = None,
+        secret_key: Optional[str] = None,
+        region: Optional[str] = None,
+        part_size: int = 8 * 1024 * 1024,
+    ) -> None:
+        try:
+            from aiobotocore.session import get_session
+        except ImportError:
+            raise RuntimeError(
+                'aiobotocore is required for the s3 storage backend'
+            )
+        self.bucket = bucket
+        self.part_size = max(part_size, self.MIN_PART_SIZE)
+        self._session = get_session()
+        self._client_kwargs = {
+            'endpoint_url': endpoint_url,
+            'aws_access_key_id': access_key,
+            'aws_secret_access_key': secret_key,
+            'region_name': region,
+        }
+        self._client: Any = None
+        self._exit_stack: Optional[AsyncExitStack] = None
+        self._lock = asyncio.Lock()
+
+    async def _get_client(self) -> Any:
+        if self._client is None:
+            async with self._lock:
+                if self._client is None:
+                    exit_stack = AsyncExitStack()
+                    self._client = await exit_stack.enter_async_context(
+                        self._session.create_client('s3', **self._client_kwargs)
+                    )
+                    self._exit_stack = exit_stack
+        return self._client
+
+    async def put(self, key: str, chunks: AsyncIterator[bytes]) -> None:
+        client = await self._get_client()
+        upload = await client.create_multipart_upload(
+            Bucket=self.bucket, Key=key
+        )
+        upload_id = upload['UploadId']
+        parts = []
+        buffer = bytearray()
+
+        async def upload_part(body: bytes) -> None:
+            part_number = len(parts) + 1
+            response = await client.upload_part(
+                Bucket=self.bucket,
+                Key=key,
+                UploadId=upload_id,
+                PartNumber=part_number,
+                Body=body,
+            )
+            parts.append({'ETag': response['ETag'], 'PartNumber': part_number})
+
+        try:
+            async for chunk in chunks:
+                buffer.extend(chunk)
+                if len(buffer) >= self.part_size:
+                    await upload_part(bytes(buffer))
+                    buffer.clear()
+            if buffer or not parts:
+                await upload_part(bytes(buffer))
+            await client.complete_multipart_upload(
+                Bucket=self.bucket,
+                Key=key,
+                UploadId=upload_id,
+                MultipartUpload={'Parts': parts},
+            )
+        except BaseException:
+            await client.abort_multipart_upload(
+                Bucket=self.bucket, Key=key, UploadId=upload_id
+            )
+            raise
+
+    async def get(
+        self,
+        key: str,
+        start: int = 0,
+        length: Optional[int] = None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ) -> AsyncIterator[bytes]:
+        client = await self._get_client()
+        kwargs = {'Bucket': self.bucket, 'Key': key}
+        if length is not None:
+            if length <= 0:
+                return
+            kwargs['Range'] = f'bytes={start}-{start + length - 1}'
+        elif start:
+            kwargs['Range'] = f'bytes={start}-'
+        response = await client.get_object(**kwargs)
+        body = response['Body']
+        try:
+            while chunk := await body.read(chunk_size):
+                yield chunk
+        finally:
+            body.close()
+
+    async def delete(self, key: str) -> None:
+        client = await self._get_client()
+        await client.delete_object(Bucket=self.bucket, Key=key)
+
+    async def stat(self, key: str) -> Optional[StorageStat]:
+        client = await self._get_client()
+        try:
+            response = await client.head_object(Bucket=self.bucket, Key=key)
+        except client.exceptions.ClientError as e:
+            if e.response['Error']['Code'] in ('404', 'NoSuchKey'):
+                return None
+            raise
+        return StorageStat(
+            size=response['ContentLength'],
+            mtime=response['LastModified'].timestamp(),
+            etag=response['ETag'],
+        )
+
+    async def close(self) -> None:
+        if self._exit_stack is not None:
+            await self._exit_stack.aclose()
+            self._exit_stack = None
+            self._client = None
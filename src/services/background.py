@@ -0,0 +1,37 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, List
+
+logger = logging.getLogger(__name__)
+
+_tasks: List[asyncio.Task] = []
+
+
+async def run_periodically(
+    func: Callable[[], Awaitable[None]],
+    interval: float
+) -> None:
+    while True:
+        try:
+            await func()
+        except Exception:
+            logger.exception('Periodic task %s failed', func.__name__)
+        await asyncio.sleep(interval)
+
+
+def start_periodic(
+    func: Callable[[], Awaitable[None]],
+    interval: float
+) -> None:
+    """
+        Запускает func каждые interval секунд в фоне до остановки
+        приложения.
+    """
+    _tasks.append(asyncio.create_task(run_periodically(func, interval)))
+
+
+async def stop_all() -> None:
+    for task in _tasks:
+        task.cancel()
+    await asyncio.gather(*_tasks, return_exceptions=True)
+    _tasks.clear()
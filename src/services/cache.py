@@ -0,0 +1,92 @@
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Generic, Hashable, Optional, Tuple, TypeVar
+
+KeyType = TypeVar('KeyType', bound=Hashable)
+ValueType = TypeVar('ValueType')
+
+
+class TTLCache(Generic[KeyType, ValueType]):
+    """
+        Внутрипроцессный LRU-кэш с ограниченным временем жизни записей.
+
+        Запись считается свежей в течение ttl секунд, после чего еще
+        stale_ttl секунд может быть отдана как устаревшая
+        (stale-while-revalidate) — вызывающий код сам решает,
+        обновлять ли ее в фоне.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: float,
+        stale_ttl: float = 0.0,
+        timer: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._timer = timer
+        self._data: OrderedDict[
+            KeyType, Tuple[ValueType, float]
+        ] = OrderedDict()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def lookup(self, key: KeyType) -> Tuple[Optional[ValueType], bool]:
+        """
+            Возвращает значение и признак того, что оно устарело.
+        """
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return None, False
+        value, expires_at = item
+        now = self._timer()
+        if now < expires_at:
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value, False
+        if now < expires_at + self.stale_ttl:
+            self._data.move_to_end(key)
+            self.stale_hits += 1
+            return value, True
+        del self._data[key]
+        self.misses += 1
+        return None, False
+
+    def get(self, key: KeyType) -> Optional[ValueType]:
+        value, stale = self.lookup(key)
+        return None if stale else value
+
+    def set(
+        self,
+        key: KeyType,
+        value: ValueType,
+        ttl: Optional[float] = None
+    ) -> None:
+        if self.maxsize <= 0:
+            return
+        expires_at = self._timer() + (self.ttl if ttl is None else ttl)
+        self._data[key] = (value, expires_at)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, key: KeyType) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'size': len(self._data),
+            'hits': self.hits,
+            'stale_hits': self.stale_hits,
+            'misses': self.misses,
+        }
@@ -0,0 +1,77 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Iterable
+
+from core.config import app_settings
+from db.db import async_session
+from services import db as crud
+
+logger = logging.getLogger(__name__)
+
+
+class ChangeNotifier:
+    """
+        Будит long-poll запросы ленты изменений пользователя в текущем
+        процессе. Изменения, сделанные другими воркерами, замечаются
+        по таймауту ожидания (FILE_CHANGES_POLL_INTERVAL).
+    """
+
+    def __init__(self) -> None:
+        self._events: Dict[int, asyncio.Event] = {}
+
+    def listen(self, user_id: int) -> asyncio.Event:
+        """
+            Возвращает событие, которое будет установлено при следующем
+            изменении файлов пользователя. Подписываться нужно до
+            чтения ленты, чтобы не пропустить изменение между чтением
+            и ожиданием.
+        """
+        event = self._events.get(user_id)
+        if event is None:
+            event = self._events[user_id] = asyncio.Event()
+        return event
+
+    def notify(self, user_ids: Iterable[int]) -> None:
+        for user_id in user_ids:
+            event = self._events.pop(user_id, None)
+            if event is not None:
+                event.set()
+
+    async def wait(
+        self,
+        user_id: int,
+        event: asyncio.Event,
+        timeout: float
+    ) -> bool:
+        """
+            Ждет события не дольше timeout секунд. Возвращает True,
+            если изменения были.
+        """
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            if self._events.get(user_id) is event:
+                del self._events[user_id]
+            return False
+        return True
+
+
+change_notifier = ChangeNotifier()
+
+
+async def reap_file_changes() -> None:
+    """
+        Удаляет записи ленты изменений старше срока хранения. Запас
+        в сутки нужен, чтобы курсор, выданный на границе срока, не
+        потерял изменения.
+    """
+    older_than = datetime.utcnow() - timedelta(
+        days=app_settings.file_changes_retention + 1
+    )
+    removed = 0
+    async with async_session() as db:
+        while count := await crud.file_change_crud.reap(db, older_than):
+            removed += count
+    if removed:
+        logger.info('Removed %s expired file changes', removed)
@@ -0,0 +1,156 @@
+import asyncio
+import zlib
+from typing import AsyncIterator, Callable, Optional, TypeVar
+
+from core.config import app_settings
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+GZIP = 'gzip'
+ZSTD = 'zstd'
+
+COMPRESSIBLE_TYPES = frozenset((
+    'application/json',
+    'application/javascript',
+    'application/x-ndjson',
+    'application/xml',
+    'application/x-yaml',
+    'application/csv',
+    'application/sql',
+    'image/svg+xml',
+    'image/bmp',
+))
+# Чанки крупнее порога сжимаются в пуле потоков, чтобы не
+# блокировать event loop (zlib и zstandard отпускают GIL).
+OFFLOAD_THRESHOLD = 64 * 1024
+
+ResultType = TypeVar('ResultType')
+
+
+def available_encodings() -> tuple:
+    return (GZIP, ZSTD) if zstandard is not None else (GZIP,)
+
+
+def choose_encoding(mime_type: Optional[str]) -> Optional[str]:
+    """
+        Кодирование для хранения файла с данным MIME-типом или None,
+        если файл хранится как есть (изображения, архивы, видео
+        уже сжаты).
+    """
+    encoding = app_settings.storage_compression
+    if encoding == 'none' or not mime_type:
+        return None
+    if not (
+        mime_type.startswith('text/') or mime_type in COMPRESSIBLE_TYPES
+    ):
+        return None
+    if encoding == ZSTD and zstandard is None:
+        return GZIP
+    return encoding
+
+
+def accepts_encoding(header: Optional[str], encoding: str) -> bool:
+    """
+        Проверяет, принимает ли клиент данное кодирование
+        по заголовку Accept-Encoding.
+    """
+    if not header:
+        return False
+    accepted = False
+    for item in header.split(','):
+        name, _, params = item.strip().partition(';')
+        name = name.strip().lower()
+        if name not in (encoding, '*'):
+            continue
+        quality = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if name == encoding:
+            return quality > 0
+        accepted = quality > 0
+    return accepted
+
+
+class Encoder:
+    def __init__(self, encoding: str, level: Optional[int] = None) -> None:
+        if level is None:
+            level = app_settings.storage_compression_level
+        if encoding == GZIP:
+            self._compressor = zlib.compressobj(
+                level, zlib.DEFLATED, zlib.MAX_WBITS | 16
+            )
+        elif encoding == ZSTD and zstandard is not None:
+            self._compressor = zstandard.ZstdCompressor(
+                level=level
+            ).compressobj()
+        else:
+            raise ValueError(f'Unsupported encoding: {encoding}')
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+
+class Decoder:
+    def __init__(self, encoding: str) -> None:
+        if encoding == GZIP:
+            self._decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+        elif encoding == ZSTD and zstandard is not None:
+            self._decompressor = zstandard.ZstdDecompressor().decompressobj()
+        else:
+            raise ValueError(f'Unsupported encoding: {encoding}')
+
+    def decompress(self, data: bytes) -> bytes:
+        return self._decompressor.decompress(data)
+
+    def flush(self) -> bytes:
+        flush = getattr(self._decompressor, 'flush', None)
+        return flush() if flush is not None else b''
+
+
+async def offload(
+    func: Callable[[bytes], ResultType],
+    data: bytes
+) -> ResultType:
+    """
+        Выполняет сжатие или распаковку крупного чанка в пуле
+        потоков, мелкие обрабатываются на месте.
+    """
+    if len(data) >= OFFLOAD_THRESHOLD:
+        return await asyncio.to_thread(func, data)
+    return func(data)
+
+
+async def encode_stream(
+    chunks: AsyncIterator[bytes],
+    encoding: str,
+    level: Optional[int] = None,
+) -> AsyncIterator[bytes]:
+    encoder = Encoder(encoding, level)
+    async for chunk in chunks:
+        if data := await offload(encoder.compress, chunk):
+            yield data
+    if data := encoder.flush():
+        yield data
+
+
+async def decode_stream(
+    chunks: AsyncIterator[bytes],
+    encoding: str,
+) -> AsyncIterator[bytes]:
+    decoder = Decoder(encoding)
+    async for chunk in chunks:
+        if data := await offload(decoder.decompress, chunk):
+            yield data
+    if data := decoder.flush():
+        yield data
@@ -1,18 +1,37 @@
+import base64
+import binascii
 import uuid
+from collections import Counter
+from dataclasses import replace
 from datetime import datetime, timedelta
-from typing import Generic, List, Optional, Tuple, Type, TypeVar
+from typing import (
+    AsyncIterator, Awaitable, Callable, Dict, Generic, Iterable, List,
+    Optional, Tuple, Type, TypeVar, Union
+)
 
+import orjson
 from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
-from sqlalchemy import select, text
+from sqlalchemy import (
+    String, and_, bindparam, case, delete, exists, func, literal,
+    literal_column, or_, select, tuple_, update
+)
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from sqlalchemy.sql import Select
 
+from core.config import app_settings
 from db.db import Base
 from exceptions import dp as exceptions
+from exceptions.api import (
+    CursorError, FileError, PathConflictError, QuotaExceededError
+)
 from models import base as models
 from schemas import base as schemas
 from services import auth
+from services.changes import change_notifier
 
 
 class Repository:
@@ -39,6 +58,11 @@ class Repository:
 ModelType = TypeVar("ModelType", bound=Base)
 CreateSchemaType = TypeVar("CreateSchemaType", bound=BaseModel)
 UpdateSchemaType = TypeVar("UpdateSchemaType", bound=BaseModel)
+# Записывает содержимое блобов в хранилище; получает кодирование,
+# с которым каждый блоб учтен в базе данных
+BlobWriter = Callable[[Dict[str, Optional[str]]], Awaitable[None]]
+# Ставит фоновые задачи обработки записанных файлов
+JobEnqueuer = Callable[[AsyncSession, List[models.File]], Awaitable[None]]
 
 
 class RepositoryDB(Repository, Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
@@ -58,7 +82,7 @@ class RepositoryUser(RepositoryDB[models.User, schemas.UserAuth, schemas.UserAut
     async def create(self, db: AsyncSession, obj_in: schemas.UserAuth) -> ModelType:
         obj_in_data: dict = jsonable_encoder(obj_in)
         password: str = obj_in_data.pop('password')
-        hashed_password = auth.get_password_hash(password)
+        hashed_password = await auth.get_password_hash(password)
         obj_in_data['hashed_password'] = hashed_password
         obj_in_data['uuid'] = uuid.uuid4().hex
         db_obj = self._model(**obj_in_data)
@@ -67,16 +91,312 @@ class RepositoryUser(RepositoryDB[models.User, schemas.UserAuth, schemas.UserAut
             await db.commit()
         except IntegrityError as e:
             raise exceptions.UserAlreadyExist
+        self.invalidate(db_obj.username)
         await db.refresh(db_obj)
         return db_obj
 
+    def invalidate(self, username: str) -> None:
+        """
+            Сбрасывает закэшированные данные пользователя. Должен
+            вызываться после любого изменения записи в таблице users.
+        """
+        auth.user_cache.invalidate(username)
+
     async def get(self, db: AsyncSession, username: str) -> Optional[models.User]:
         statement = select(self._model).where(self._model.username == username)
         results = await db.execute(statement=statement)
         return results.scalar_one_or_none()
 
+    async def get_files_version(
+        self,
+        db: AsyncSession,
+        user_id: int
+    ) -> Tuple[int, Optional[datetime]]:
+        """
+            Версия списка файлов пользователя и время его последнего
+            изменения — для ETag и Last-Modified листинга.
+        """
+        statement = select(
+            self._model.files_version, self._model.files_modified_at
+        ).where(self._model.id == user_id)
+        results = await db.execute(statement=statement)
+        return tuple(results.one())
+
+    async def bump_files_version(
+        self,
+        db: AsyncSession,
+        user_ids: Iterable[int]
+    ) -> None:
+        """
+            Увеличивает версию списка файлов. Вызывается в той же
+            транзакции, что и любое изменение таблицы files. Кэш
+            пользователей эти поля не хранит, поэтому не сбрасывается.
+            Коммит выполняет вызывающий код.
+        """
+        statement = update(self._model). \
+            where(self._model.id.in_(sorted(set(user_ids)))). \
+            values(
+                files_version=self._model.files_version + 1,
+                files_modified_at=datetime.utcnow()
+        )
+        await db.execute(statement)
+
+    async def get_usage(
+        self,
+        db: AsyncSession,
+        user_id: int
+    ) -> Optional[schemas.Usage]:
+        statement = select(
+            self._model.used_bytes,
+            self._model.files_count,
+            self._model.quota_bytes
+        ).where(self._model.id == user_id)
+        results = await db.execute(statement=statement)
+        row = results.one_or_none()
+        if row is None:
+            return None
+        used_bytes, files_count, quota_bytes = row
+        return schemas.Usage(
+            used_bytes=used_bytes,
+            files_count=files_count,
+            quota_bytes=quota_limit(quota_bytes)
+        )
+
+    async def has_quotas(self, db: AsyncSession) -> bool:
+        """
+            Есть ли пользователи с индивидуальной квотой.
+        """
+        statement = select(exists().where(self._model.quota_bytes > 0))
+        return bool(await db.scalar(statement))
+
+    async def add_usage(
+        self,
+        db: AsyncSession,
+        usage: Dict[int, Tuple[int, int]]
+    ) -> None:
+        """
+            Изменяет счетчики занятого места. usage — словарь
+            user_id -> (изменение байт, изменение числа файлов). Если
+            после увеличения занятое место превышает квоту, выбрасывает
+            QuotaExceededError, и вызывающий код откатывает транзакцию.
+            Коммит выполняет вызывающий код.
+        """
+        for user_id, (size, count) in sorted(usage.items()):
+            statement = update(self._model). \
+                where(self._model.id == user_id). \
+                values(
+                    used_bytes=self._model.used_bytes + size,
+                    files_count=self._model.files_count + count
+            ). \
+                returning(self._model.used_bytes, self._model.quota_bytes)
+            results = await db.execute(statement)
+            used_bytes, quota_bytes = results.one()
+            quota_bytes = quota_limit(quota_bytes)
+            if size > 0 and quota_bytes and used_bytes > quota_bytes:
+                raise QuotaExceededError
+
+    async def reconcile_usage(
+        self,
+        db: AsyncSession,
+        after_id: int,
+        limit: int
+    ) -> Tuple[Optional[int], int]:
+        """
+            Пересчитывает счетчики занятого места пачки пользователей
+            с id больше after_id по таблице files. Строки пользователей
+            блокируются до пересчета, поэтому параллельные загрузки
+            этих пользователей ждут его завершения. Возвращает id
+            последнего обработанного пользователя (None, если
+            пользователей больше нет) и число исправленных счетчиков.
+        """
+        statement = select(
+            self._model.id, self._model.used_bytes, self._model.files_count
+        ). \
+            where(self._model.id > after_id). \
+            order_by(self._model.id). \
+            limit(limit). \
+            with_for_update()
+        users = (await db.execute(statement)).all()
+        if not users:
+            return None, 0
+        user_ids = [user_id for user_id, _, _ in users]
+        statement = select(
+            models.File.user_id,
+            func.coalesce(func.sum(models.File.size), 0),
+            func.count()
+        ). \
+            where(models.File.user_id.in_(user_ids)). \
+            group_by(models.File.user_id)
+        actual = {
+            user_id: (size, count)
+            for user_id, size, count in await db.execute(statement)
+        }
+        fixed = 0
+        for user_id, used_bytes, files_count in users:
+            size, count = actual.get(user_id, (0, 0))
+            if (used_bytes, files_count) == (size, count):
+                continue
+            await db.execute(
+                update(self._model).
+                where(self._model.id == user_id).
+                values(used_bytes=size, files_count=count)
+            )
+            fixed += 1
+        await db.commit()
+        return user_ids[-1], fixed
+
+
+def quota_limit(quota_bytes: Optional[int]) -> Optional[int]:
+    """
+        Квота пользователя с учетом значения по умолчанию.
+        None — квоты нет.
+    """
+    if quota_bytes is None:
+        quota_bytes = app_settings.user_quota_bytes
+    return quota_bytes or None
+
+
+def folder_paths(path: str) -> List[str]:
+    """
+        Пути всех каталогов, в которых лежит path, от корня вглубь.
+        Пустые компоненты пути (ведущий или двойной слеш) каталогов
+        не образуют.
+    """
+    parts = path.split('/')[:-1]
+    return [
+        '/'.join(parts[:index + 1])
+        for index, part in enumerate(parts) if part
+    ]
+
+
+def parent_folder(path: str) -> Optional[str]:
+    """
+        Путь каталога, в котором непосредственно лежит path,
+        None — корень.
+    """
+    folders = folder_paths(path)
+    return folders[-1] if folders else None
+
+
+def subtree(column, path: str):
+    """
+        Условие: путь равен path или лежит внутри каталога path.
+    """
+    return or_(column == path, column.startswith(path + '/', autoescape=True))
+
+
+def rebase(column, source: str, destination: str):
+    """
+        Путь, начинающийся с source, с source, замененным на destination.
+    """
+    return literal(destination) + func.substr(column, len(source) + 1)
+
+
+class RepositoryBlob(RepositoryDB[models.Blob, schemas.Blob, schemas.Blob]):
+    REAP_BATCH_SIZE = 1000
+
+    async def acquire(
+        self,
+        db: AsyncSession,
+        blobs: Dict[str, Tuple[schemas.Blob, int]]
+    ) -> Dict[str, Tuple[Optional[str], Optional[int]]]:
+        """
+            Увеличивает счетчики ссылок на блобы, создавая недостающие
+            записи. blobs — словарь digest -> (блоб, число ссылок).
+            Возвращает кодирование и размер в хранилище для каждого
+            блоба: у уже существующих они могут отличаться от
+            переданных. Коммит выполняет вызывающий код.
+        """
+        if not blobs:
+            return {}
+        now = datetime.utcnow()
+        statement = insert(self._model).values([
+            {
+                'digest': digest,
+                'size': blob.size,
+                'stored_size': blob.stored_size,
+                'encoding': blob.encoding,
+                'ref_count': count,
+                'created_at': now,
+                'updated_at': now,
+            } for digest, (blob, count) in sorted(blobs.items())
+        ])
+        statement = statement.on_conflict_do_update(
+            index_elements=[self._model.digest],
+            set_={
+                'ref_count': self._model.ref_count
+                + statement.excluded.ref_count,
+                'updated_at': statement.excluded.updated_at,
+            }
+        ).returning(
+            self._model.digest, self._model.encoding, self._model.stored_size
+        )
+        results = await db.execute(statement)
+        return {
+            digest: (encoding, stored_size)
+            for digest, encoding, stored_size in results
+        }
+
+    async def retain(self, db: AsyncSession, digests: Counter[str]) -> None:
+        """
+            Увеличивает счетчики ссылок существующих блобов.
+            Коммит выполняет вызывающий код.
+        """
+        await self._add_refs(db, digests, 1)
+
+    async def release(self, db: AsyncSession, digests: Counter[str]) -> None:
+        """
+            Уменьшает счетчики ссылок. Блобы без ссылок удаляются
+            позже фоновой задачей. Коммит выполняет вызывающий код.
+        """
+        await self._add_refs(db, digests, -1)
+
+    async def _add_refs(
+        self,
+        db: AsyncSession,
+        digests: Counter[str],
+        sign: int
+    ) -> None:
+        by_count: Dict[int, List[str]] = {}
+        for digest, count in sorted(digests.items()):
+            by_count.setdefault(count, []).append(digest)
+        now = datetime.utcnow()
+        for count, group in by_count.items():
+            statement = update(self._model). \
+                where(self._model.digest.in_(group)). \
+                values(
+                    ref_count=self._model.ref_count + sign * count,
+                    updated_at=now
+            )
+            await db.execute(statement)
+
+    async def reap(self, db: AsyncSession) -> List[str]:
+        """
+            Удаляет записи о блобах без ссылок и возвращает их хэши.
+            Строки остаются заблокированными до коммита.
+        """
+        # Условие совпадает с условием частичного индекса
+        # ix_blobs_unreferenced и подставляется литералом, а не
+        # параметром, иначе планировщик не может использовать индекс
+        unreferenced = select(self._model.digest). \
+            where(self._model.ref_count == literal_column('0')). \
+            order_by(self._model.updated_at). \
+            limit(self.REAP_BATCH_SIZE). \
+            with_for_update(skip_locked=True)
+        statement = delete(self._model). \
+            where(self._model.digest.in_(unreferenced)). \
+            returning(self._model.digest). \
+            execution_options(synchronize_session=False)
+        results = await db.execute(statement)
+        return results.scalars().all()
+
 
 class RepositoryFile(RepositoryDB[models.File, schemas.File, schemas.FileUpdate]):
+    BULK_BATCH_SIZE = 1000
+    DEFAULT_PAGE_SIZE = 100
+    STREAM_BATCH_SIZE = 500
+    _created_column = literal_column('xmax = 0').label('created')
+
     async def get(
         self,
         db: AsyncSession,
@@ -114,81 +434,1303 @@ class RepositoryFile(RepositoryDB[models.File, schemas.File, schemas.FileUpdate]
 
         return None
 
-    async def update(
-        self,
-        db: AsyncSession,
-        obj_in: schemas.FileUpdate
-    ) -> models.File:
-        obj_in_data = jsonable_encoder(obj_in)
-        path = obj_in_data.get('path')
-        user_id = obj_in_data.get('user_id')
-        db_obj = await self.get(db, user_id=user_id, path=path)
-        if db_obj:
-            db_obj.size = obj_in_data.get('size')
-            db_obj.created_at = datetime.utcnow()
-            db.commit()
-            return db_obj
-        raise exceptions.FileDoesNotExist
+    def _upsert_statement(self, values: List[dict]) -> Select:
+        """
+            INSERT ... ON CONFLICT (user_id, path) DO UPDATE ... RETURNING,
+            дополнительно возвращает признак того, что строка была
+            создана, а не обновлена, и блоб, на который она ссылалась
+            до обновления, и ее прежний размер (подзапросы в RETURNING
+            видят состояние таблицы до выполнения запроса).
+        """
+        table = self._model.__tablename__
+        previous = self._model.__table__.alias('previous')
+        previous_digest = select(previous.c.blob_digest). \
+            where(
+                previous.c.user_id == literal_column(f'{table}.user_id'),
+                previous.c.path == literal_column(f'{table}.path')
+        ). \
+            scalar_subquery(). \
+            label('previous_digest')
+        previous_size = select(previous.c.size). \
+            where(
+                previous.c.user_id == literal_column(f'{table}.user_id'),
+                previous.c.path == literal_column(f'{table}.path')
+        ). \
+            scalar_subquery(). \
+            label('previous_size')
+        statement = insert(self._model).values(values)
+        statement = statement.on_conflict_do_update(
+            constraint='uq_files_user_id_path',
+            set_={
+                'size': statement.excluded.size,
+                'created_at': statement.excluded.created_at,
+                'mime_type': statement.excluded.mime_type,
+                'blob_digest': statement.excluded.blob_digest,
+                'stored_size': statement.excluded.stored_size,
+                'content_encoding': statement.excluded.content_encoding,
+            }
+        ).returning(
+            self._model, self._created_column, previous_digest, previous_size
+        )
+        return select(
+            self._model, self._created_column, previous_digest, previous_size
+        ). \
+            from_statement(statement). \
+            execution_options(populate_existing=True)
 
     async def create_or_update(
         self,
         db: AsyncSession,
-        obj_in: schemas.File
+        obj_in: schemas.File,
+        write_blobs: Optional[BlobWriter] = None,
+        enqueue_jobs: Optional[JobEnqueuer] = None
     ) -> Tuple[models.File, bool]:
-        obj_in_data = jsonable_encoder(obj_in)
-        path: str = obj_in_data.get('path')
-        user_id = obj_in_data.get('user_id')
-        db_obj: Optional[models.File] = await self.get(
-            db=db,
-            user_id=user_id,
-            path=path
-        )
-        if db_obj:
-            new_size = obj_in_data.get('size')
-            db_obj = await self.update(
-                db,
-                schemas.FileUpdate(
-                    path=path,
-                    size=new_size,
-                    user_id=user_id
+        """
+            Создает или обновляет запись о файле одним запросом
+            и в той же транзакции пересчитывает ссылки на блобы.
+            Возвращает запись и признак того, что она была создана.
+
+            write_blobs вызывается перед коммитом, пока строки блобов
+            заблокированы: запись о файле не появляется раньше его
+            содержимого, а сборщик блобов пропускает эти строки.
+            enqueue_jobs ставит задачи обработки в той же транзакции.
+        """
+        files = await self._upsert(db, [obj_in], write_blobs, enqueue_jobs)
+        return files[0]
+
+    async def bulk_create_or_update(
+        self,
+        db: AsyncSession,
+        objs_in: List[schemas.File],
+        write_blobs: Optional[BlobWriter] = None,
+        enqueue_jobs: Optional[JobEnqueuer] = None
+    ) -> List[models.File]:
+        """
+            Создает или обновляет записи о файлах пачкой
+            INSERT ... ON CONFLICT в одной транзакции.
+        """
+        files = await self._upsert(db, objs_in, write_blobs, enqueue_jobs)
+        return [file for file, _ in files]
+
+    async def _assign_folders(
+        self,
+        db: AsyncSession,
+        values: List[dict]
+    ) -> Dict[Tuple[int, str], int]:
+        """
+            Создает недостающие каталоги и заполняет folder_id
+            в строках файлов. Возвращает id всех каталогов на путях.
+        """
+        folder_ids = await folder_crud.ensure(db, {
+            (row['user_id'], folder)
+            for row in values for folder in folder_paths(row['path'])
+        })
+        for row in values:
+            parent = parent_folder(row['path'])
+            row['folder_id'] = folder_ids[(row['user_id'], parent)] \
+                if parent else None
+        return folder_ids
+
+    async def _acquire_blobs(
+        self,
+        db: AsyncSession,
+        values: List[dict]
+    ) -> Dict[str, Optional[str]]:
+        """
+            Увеличивает счетчики ссылок на блобы строк и записывает
+            в строки кодирование и размер уже существующих блобов.
+            Возвращает кодирование каждого блоба.
+        """
+        acquired: Dict[str, Tuple[schemas.Blob, int]] = {}
+        for row in values:
+            if digest := row.get('blob_digest'):
+                blob, count = acquired.get(digest, (None, 0))
+                acquired[digest] = (blob or schemas.Blob(
+                    digest=digest,
+                    size=row['size'],
+                    stored_size=row.get('stored_size'),
+                    encoding=row.get('content_encoding')
+                ), count + 1)
+        stored = await blob_crud.acquire(db, acquired)
+        for row in values:
+            if digest := row.get('blob_digest'):
+                row['content_encoding'], row['stored_size'] = stored[digest]
+        return {digest: encoding for digest, (encoding, _) in stored.items()}
+
+    @staticmethod
+    def _count_usage(
+        usage: Dict[int, Tuple[int, int]],
+        folder_usage: Dict[int, Tuple[int, int]],
+        folder_ids: Dict[Tuple[int, str], int],
+        file: models.File,
+        delta_size: int,
+        delta_count: int
+    ) -> None:
+        """
+            Добавляет изменение размера и числа файлов к итогам
+            пользователя и всех каталогов на пути к файлу.
+        """
+        size, count = usage.get(file.user_id, (0, 0))
+        usage[file.user_id] = (size + delta_size, count + delta_count)
+        for folder in folder_paths(file.path):
+            folder_id = folder_ids[(file.user_id, folder)]
+            size, count = folder_usage.get(folder_id, (0, 0))
+            folder_usage[folder_id] = (size + delta_size, count + delta_count)
+
+    async def _upsert(
+        self,
+        db: AsyncSession,
+        objs_in: List[schemas.File],
+        write_blobs: Optional[BlobWriter] = None,
+        enqueue_jobs: Optional[JobEnqueuer] = None
+    ) -> List[Tuple[models.File, bool]]:
+        rows: Dict[Tuple[int, str], dict] = {}
+        created_at = datetime.utcnow()
+        for obj_in in objs_in:
+            obj_in_data = jsonable_encoder(obj_in)
+            obj_in_data['created_at'] = created_at
+            rows[(obj_in.user_id, obj_in.path)] = obj_in_data
+        values = list(rows.values())
+        user_ids = {row['user_id'] for row in values}
+
+        # Сначала блокируется строка пользователя: изменения файлов
+        # одного пользователя выполняются последовательно
+        await user_crud.bump_files_version(db, user_ids)
+        folder_ids = await self._assign_folders(db, values)
+        encodings = await self._acquire_blobs(db, values)
+
+        files: List[Tuple[models.File, bool]] = []
+        released: Counter[str] = Counter()
+        usage: Dict[int, Tuple[int, int]] = {}
+        folder_usage: Dict[int, Tuple[int, int]] = {}
+        for start in range(0, len(values), self.BULK_BATCH_SIZE):
+            results = await db.execute(
+                self._upsert_statement(
+                    values[start:start + self.BULK_BATCH_SIZE]
+                )
+            )
+            for file, created, previous_digest, previous_size in results:
+                files.append((file, created))
+                if previous_digest:
+                    released[previous_digest] += 1
+                self._count_usage(
+                    usage, folder_usage, folder_ids, file,
+                    file.size - (previous_size or 0), int(created)
                 )
+        await user_crud.add_usage(db, usage)
+        await folder_crud.add_usage(db, folder_usage)
+        await blob_crud.release(db, released)
+        for start in range(0, len(files), self.BULK_BATCH_SIZE):
+            await file_change_crud.record(db, [
+                {
+                    'user_id': file.user_id,
+                    'file_uuid': file.uuid,
+                    'path': file.path,
+                    'action': 'created' if created else 'updated',
+                    'size': file.size,
+                    'mime_type': file.mime_type,
+                    'created_at': created_at,
+                } for file, created in files[start:start + self.BULK_BATCH_SIZE]
+            ])
+        if enqueue_jobs is not None:
+            await enqueue_jobs(db, [file for file, _ in files])
+        if write_blobs is not None:
+            await write_blobs(encodings)
+        await db.commit()
+        change_notifier.notify(user_ids)
+        return files
+
+    async def get_folder_files(
+        self,
+        db: AsyncSession,
+        user_id: int,
+        folder_id: Optional[int],
+        limit: int
+    ) -> List[models.File]:
+        """
+            Файлы, лежащие непосредственно в каталоге (None — корень).
+        """
+        statement = select(self._model). \
+            where(
+                self._model.user_id == user_id,
+                self._model.folder_id == folder_id
+        ). \
+            order_by(self._model.path). \
+            limit(limit)
+        results = await db.execute(statement=statement)
+        return results.scalars().all()
+
+    async def path_exists(
+        self,
+        db: AsyncSession,
+        user_id: int,
+        path: str
+    ) -> bool:
+        """
+            Проверяет, занят ли путь файлом или каталогом.
+        """
+        file_exists = exists().where(
+            self._model.user_id == user_id, self._model.path == path
+        )
+        folder_exists = exists().where(
+            models.Folder.user_id == user_id, models.Folder.path == path
+        )
+        return await db.scalar(select(or_(file_exists, folder_exists)))
+
+    def _selection(self, user_id: int, path: str, is_folder: bool):
+        table = self._model.__table__
+        return and_(
+            table.c.user_id == user_id,
+            subtree(table.c.path, path) if is_folder else table.c.path == path
+        )
+
+    async def _record_changes(
+        self,
+        db: AsyncSession,
+        selection,
+        action: str,
+        changed_at: datetime
+    ) -> None:
+        """
+            Записывает изменения выбранных файлов одним
+            INSERT ... SELECT. Коммит выполняет вызывающий код.
+        """
+        table = self._model.__table__
+        statement = insert(models.FileChange.__table__).from_select(
+            [
+                'user_id', 'file_uuid', 'path', 'action', 'size',
+                'mime_type', 'created_at'
+            ],
+            select(
+                table.c.user_id, table.c.uuid, table.c.path, literal(action),
+                table.c.size, table.c.mime_type, literal(changed_at)
+            ).where(selection)
+        )
+        await db.execute(statement)
+
+    async def set_mime_type(
+        self,
+        db: AsyncSession,
+        file: models.File,
+        mime_type: str
+    ) -> None:
+        """
+            Заменяет MIME-тип на определенный по содержимому. Если
+            файл успели перезаписать другим содержимым, он не меняется.
+        """
+        await user_crud.bump_files_version(db, [file.user_id])
+        table = self._model.__table__
+        selection = and_(
+            table.c.id == file.id,
+            table.c.blob_digest == file.blob_digest
+        )
+        statement = update(table). \
+            where(selection). \
+            values(mime_type=mime_type)
+        await db.execute(statement)
+        await self._record_changes(
+            db, selection, 'updated', datetime.utcnow()
+        )
+        await db.commit()
+        change_notifier.notify([file.user_id])
+
+    async def _prepare_transfer(
+        self,
+        db: AsyncSession,
+        user_id: int,
+        source: str,
+        destination: str,
+        is_folder: bool
+    ) -> Tuple[int, int]:
+        """
+            Общие проверки перемещения и копирования. Блокирует строку
+            пользователя и возвращает число и объем переносимых файлов.
+        """
+        if destination == source or (
+            is_folder and destination.startswith(source + '/')
+        ):
+            raise FileError(detail='Destination is inside the source')
+        await user_crud.bump_files_version(db, [user_id])
+        if await self.path_exists(db, user_id, destination):
+            raise PathConflictError
+        statement = select(
+            func.count(),
+            func.coalesce(func.sum(self._model.size), 0),
+            func.count().filter(self._model.blob_digest.is_(None))
+        ).where(self._selection(user_id, source, is_folder))
+        count, size, legacy = (await db.execute(statement)).one()
+        if legacy:
+            raise FileError(
+                detail='Files uploaded before content-addressed storage '
+                'must be re-uploaded before they can be moved or copied'
             )
+        return count, size
 
-            return db_obj, False
+    async def remove(
+        self,
+        db: AsyncSession,
+        user_id: int,
+        source: str,
+        is_folder: bool
+    ) -> Tuple[schemas.FileOperation, List[str]]:
+        """
+            Удаляет файл или каталог со всем содержимым. Число запросов
+            не зависит от числа файлов: строки удаляются одним
+            DELETE ... RETURNING, из которого в том же запросе
+            записываются изменения и считаются ссылки на блобы.
+            Содержимое удаляется из хранилища позже фоновой задачей,
+            когда на блоб не останется ссылок.
 
-        db_obj = await self.create(db, obj_in)
-        return db_obj, True
+            Кроме итогов возвращает пути файлов, загруженных до
+            появления хранилища блобов: их вызывающий код удаляет
+            из хранилища сам.
+        """
+        await user_crud.bump_files_version(db, [user_id])
+        table = self._model.__table__
+        selection = self._selection(user_id, source, is_folder)
+        legacy = (await db.execute(
+            select(table.c.path).where(selection, table.c.blob_digest.is_(None))
+        )).scalars().all()
 
-    async def get_multi(self,
+        deleted = delete(table).where(selection).returning(
+            table.c.user_id, table.c.uuid, table.c.path, table.c.size,
+            table.c.mime_type, table.c.blob_digest
+        ).cte('deleted')
+        changes = insert(models.FileChange.__table__).from_select(
+            [
+                'user_id', 'file_uuid', 'path', 'action', 'size',
+                'mime_type', 'created_at'
+            ],
+            select(
+                deleted.c.user_id, deleted.c.uuid, deleted.c.path,
+                literal('deleted'), deleted.c.size, deleted.c.mime_type,
+                literal(datetime.utcnow())
+            )
+        ).cte('changes')
+        statement = select(
+            deleted.c.blob_digest,
+            func.count(),
+            func.coalesce(func.sum(deleted.c.size), 0)
+        ). \
+            group_by(deleted.c.blob_digest). \
+            add_cte(changes)
+        released: Counter[str] = Counter()
+        count = size = 0
+        for digest, digest_count, digest_size in await db.execute(statement):
+            count += digest_count
+            size += digest_size
+            if digest:
+                released[digest] += digest_count
+
+        await blob_crud.release(db, released)
+        await user_crud.add_usage(db, {user_id: (-size, -count)})
+        await folder_crud.add_to_ancestors(db, user_id, source, -size, -count)
+        if is_folder:
+            await folder_crud.remove_subtree(db, user_id, source)
+        await db.commit()
+        change_notifier.notify([user_id])
+        return schemas.FileOperation(files_count=count, size=size), legacy
+
+    async def move(
+        self,
         db: AsyncSession,
-        user_id: int
-    ) -> List[schemas.FileInDB]:
+        user_id: int,
+        source: str,
+        destination: str,
+        is_folder: bool
+    ) -> schemas.FileOperation:
+        """
+            Перемещает или переименовывает файл или каталог. Меняются
+            только метаданные: у каталога один UPDATE переписывает
+            пути поддерева, id каталогов и их итоги сохраняются,
+            содержимое в хранилище не трогается.
+        """
+        count, size = await self._prepare_transfer(
+            db, user_id, source, destination, is_folder
+        )
+        table = self._model.__table__
+        changed_at = datetime.utcnow()
+        selection = self._selection(user_id, source, is_folder)
+        await self._record_changes(db, selection, 'deleted', changed_at)
+        if is_folder:
+            await folder_crud.move_subtree(db, user_id, source, destination)
+            values = {'path': rebase(table.c.path, source, destination)}
+        else:
+            values = {
+                'path': destination,
+                'folder_id': await folder_crud.ensure_parent(
+                    db, user_id, destination
+                ),
+            }
+        await db.execute(update(table).where(selection).values(**values))
+        await folder_crud.add_to_ancestors(db, user_id, source, -size, -count)
+        await folder_crud.add_to_ancestors(
+            db, user_id, destination, size, count
+        )
+        await self._record_changes(
+            db,
+            self._selection(user_id, destination, is_folder),
+            'created',
+            changed_at
+        )
+        await db.commit()
+        change_notifier.notify([user_id])
+        return schemas.FileOperation(files_count=count, size=size)
+
+    async def copy(
+        self,
+        db: AsyncSession,
+        user_id: int,
+        source: str,
+        destination: str,
+        is_folder: bool
+    ) -> schemas.FileOperation:
+        """
+            Копирует файл или каталог одним INSERT ... SELECT. Копии
+            ссылаются на те же блобы, у которых увеличиваются счетчики
+            ссылок, поэтому содержимое не копируется. Копия учитывается
+            в квоте пользователя.
+        """
+        count, size = await self._prepare_transfer(
+            db, user_id, source, destination, is_folder
+        )
+        table = self._model.__table__
+        now = datetime.utcnow()
+        selection = self._selection(user_id, source, is_folder)
+        if is_folder:
+            await folder_crud.copy_subtree(db, user_id, source, destination)
+            source_folder = models.Folder.__table__.alias('source_folder')
+            copied_folder = models.Folder.__table__.alias('copied_folder')
+            folder_id = select(copied_folder.c.id). \
+                where(
+                    source_folder.c.id == table.c.folder_id,
+                    copied_folder.c.user_id == user_id,
+                    copied_folder.c.path == rebase(
+                        source_folder.c.path, source, destination
+                    )
+            ). \
+                scalar_subquery()
+            path = rebase(table.c.path, source, destination)
+        else:
+            folder_id = literal(
+                await folder_crud.ensure_parent(db, user_id, destination),
+                type_=table.c.folder_id.type
+            )
+            path = literal(destination)
+        new_uuid = func.replace(func.gen_random_uuid().cast(String), '-', '')
+        columns = {
+            'user_id': table.c.user_id,
+            'path': path,
+            'size': table.c.size,
+            'created_at': literal(now),
+            'is_downloadable': table.c.is_downloadable,
+            'uuid': new_uuid,
+            'mime_type': table.c.mime_type,
+            'blob_digest': table.c.blob_digest,
+            'stored_size': table.c.stored_size,
+            'content_encoding': table.c.content_encoding,
+            'folder_id': folder_id,
+        }
+        digests = select(table.c.blob_digest, func.count()). \
+            where(selection). \
+            group_by(table.c.blob_digest)
+        retained = Counter(dict((await db.execute(digests)).all()))
+        await db.execute(
+            insert(table).from_select(
+                list(columns), select(*columns.values()).where(selection)
+            )
+        )
+        await blob_crud.retain(db, retained)
+        await user_crud.add_usage(db, {user_id: (size, count)})
+        await folder_crud.add_to_ancestors(
+            db, user_id, destination, size, count
+        )
+        await self._record_changes(
+            db,
+            self._selection(user_id, destination, is_folder),
+            'created',
+            now
+        )
+        await db.commit()
+        change_notifier.notify([user_id])
+        return schemas.FileOperation(files_count=count, size=size)
+
+    def _list_statement(
+        self,
+        user_id: int,
+        params: schemas.FileFilter
+    ) -> Select:
+        """
+            Запрос списка файлов пользователя с фильтрами и
+            keyset-пагинацией по (order_by, id).
+        """
+        sort_column = getattr(self._model, params.order_by)
         statement = select(self._model).where(self._model.user_id == user_id)
+        if params.path:
+            statement = statement.where(
+                self._model.path.startswith(
+                    params.path.rstrip('/') + '/', autoescape=True
+                )
+            )
+        if params.mime_type:
+            if params.mime_type.endswith('/*'):
+                statement = statement.where(
+                    self._model.mime_type.startswith(
+                        params.mime_type[:-1], autoescape=True
+                    )
+                )
+            else:
+                statement = statement.where(
+                    self._model.mime_type == params.mime_type
+                )
+        if params.min_size is not None:
+            statement = statement.where(self._model.size >= params.min_size)
+        if params.max_size is not None:
+            statement = statement.where(self._model.size <= params.max_size)
+        if params.cursor:
+            value, last_id = decode_cursor(params.cursor, params.order_by)
+            keyset = tuple_(sort_column, self._model.id)
+            if params.order == 'desc':
+                statement = statement.where(keyset < tuple_(value, last_id))
+            else:
+                statement = statement.where(keyset > tuple_(value, last_id))
+        if params.order == 'desc':
+            statement = statement.order_by(
+                sort_column.desc(), self._model.id.desc()
+            )
+        else:
+            statement = statement.order_by(sort_column, self._model.id)
+        return statement
+
+    async def get_multi(
+        self,
+        db: AsyncSession,
+        user_id: int,
+        params: schemas.FileFilter
+    ) -> Tuple[List[models.File], Optional[str]]:
+        """
+            Возвращает страницу файлов пользователя и курсор
+            для получения следующей страницы.
+        """
+        limit = params.limit or self.DEFAULT_PAGE_SIZE
+        statement = self._list_statement(user_id, params).limit(limit + 1)
         results = await db.execute(statement=statement)
-        files_query = results.scalars()
-        files = [
-            schemas.FileInDB(
-                id=file.uuid,
-                name=file.path.split('/')[-1],
-                created_at=file.created_at,
-                path=file.path,
-                size=file.size,
-                is_downloadable=file.is_downloadable
-            ) for file in files_query
-        ]
-        return files
+        files = results.scalars().all()
+        next_cursor = None
+        if len(files) > limit:
+            files = files[:limit]
+            last = files[-1]
+            next_cursor = encode_cursor(
+                getattr(last, params.order_by), last.id
+            )
+        return files, next_cursor
 
+    async def stream_multi(
+        self,
+        db: AsyncSession,
+        user_id: int,
+        params: schemas.FileFilter
+    ) -> AsyncIterator[models.File]:
+        """
+            Отдает файлы пользователя страницами по STREAM_BATCH_SIZE
+            с keyset-пагинацией, не загружая весь список в память.
+            Перед отдачей страницы сессия закрывается, и соединение
+            возвращается в пул, пока клиент медленно читает ответ.
+        """
+        remaining = params.limit
+        while remaining is None or remaining > 0:
+            page_size = self.STREAM_BATCH_SIZE if remaining is None \
+                else min(remaining, self.STREAM_BATCH_SIZE)
+            files, next_cursor = await self.get_multi(
+                db, user_id, replace(params, limit=page_size)
+            )
+            await db.close()
+            for file in files:
+                yield file
+            if next_cursor is None:
+                return
+            if remaining is not None:
+                remaining -= len(files)
+            params = replace(params, cursor=next_cursor)
 
-user_crud = RepositoryUser(models.User)
-file_crud = RepositoryFile(models.File)
+
+def encode_cursor(value: Union[datetime, int, str], last_id: int) -> str:
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    return base64.urlsafe_b64encode(orjson.dumps([value, last_id])).decode()
 
 
-async def db_ping(db: AsyncSession) -> Optional[timedelta]:
-    statement = text('SELECT version();')
-    start = datetime.utcnow()
+def decode_cursor(
+    cursor: str,
+    order_by: str
+) -> Tuple[Union[datetime, int, str], int]:
     try:
+        value, last_id = orjson.loads(base64.urlsafe_b64decode(cursor))
+        if order_by == 'created_at':
+            value = datetime.fromisoformat(value)
+        elif order_by == 'size' and not isinstance(value, int):
+            raise ValueError
+        elif order_by == 'path' and not isinstance(value, str):
+            raise ValueError
+        if not isinstance(last_id, int):
+            raise ValueError
+    except (ValueError, TypeError, binascii.Error, orjson.JSONDecodeError):
+        raise CursorError
+    return value, last_id
+
+
+class RepositoryUploadSession(
+    RepositoryDB[
+        models.UploadSession,
+        schemas.UploadSessionCreate,
+        schemas.UploadSessionCreate
+    ]
+):
+    REAP_BATCH_SIZE = 100
+
+    async def create(
+        self,
+        db: AsyncSession,
+        user_id: int,
+        path: str,
+        mime_type: str,
+        ttl: float,
+    ) -> models.UploadSession:
+        now = datetime.utcnow()
+        db_obj = self._model(
+            uuid=uuid.uuid4().hex,
+            user_id=user_id,
+            path=path,
+            mime_type=mime_type,
+            created_at=now,
+            expires_at=now + timedelta(seconds=ttl),
+            parts=[]
+        )
+        db.add(db_obj)
+        await db.commit()
+        return db_obj
+
+    async def get(
+        self,
+        db: AsyncSession,
+        user_id: int,
+        upload_id: str,
+        for_update: bool = False,
+    ) -> Optional[models.UploadSession]:
+        """
+            Возвращает неистекшую сессию загрузки вместе со списком
+            полученных частей.
+        """
+        statement = select(self._model). \
+            where(
+                self._model.uuid == upload_id,
+                self._model.user_id == user_id,
+                self._model.expires_at > datetime.utcnow()
+        ). \
+            options(selectinload(self._model.parts))
+        if for_update:
+            statement = statement.with_for_update(of=self._model)
+        results = await db.execute(statement=statement)
+        return results.scalar_one_or_none()
+
+    async def add_part(
+        self,
+        db: AsyncSession,
+        session_id: int,
+        part_number: int,
+        size: int,
+        ttl: float,
+    ) -> None:
+        """
+            Сохраняет сведения о полученной части. Повторная загрузка
+            части с тем же номером заменяет предыдущую. Каждая часть
+            продлевает время жизни сессии.
+        """
+        now = datetime.utcnow()
+        statement = insert(models.UploadPart).values(
+            session_id=session_id,
+            part_number=part_number,
+            size=size,
+            created_at=now
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=['session_id', 'part_number'],
+            set_={
+                'size': statement.excluded.size,
+                'created_at': statement.excluded.created_at,
+            }
+        )
         await db.execute(statement)
-        ping = datetime.utcnow() - start
-        return ping
-    except ConnectionRefusedError:
-        return None
+        await db.execute(
+            update(self._model).
+            where(self._model.id == session_id).
+            values(expires_at=now + timedelta(seconds=ttl))
+        )
+        await db.commit()
+
+    async def remove(
+        self,
+        db: AsyncSession,
+        session: models.UploadSession
+    ) -> None:
+        """
+            Помечает сессию на удаление. Коммит выполняет вызывающий код,
+            что позволяет удалить сессию в одной транзакции с созданием
+            файла.
+        """
+        await db.delete(session)
+
+    async def reap(
+        self,
+        db: AsyncSession
+    ) -> List[Tuple[str, List[int]]]:
+        """
+            Удаляет истекшие сессии и возвращает их идентификаторы
+            вместе с номерами загруженных частей. Коммит выполняет
+            вызывающий код.
+        """
+        statement = select(self._model). \
+            where(self._model.expires_at <= datetime.utcnow()). \
+            options(selectinload(self._model.parts)). \
+            limit(self.REAP_BATCH_SIZE). \
+            with_for_update(of=self._model, skip_locked=True)
+        results = await db.execute(statement)
+        sessions = results.scalars().all()
+        expired = []
+        for session in sessions:
+            expired.append(
+                (session.uuid, [part.part_number for part in session.parts])
+            )
+            await db.delete(session)
+        await db.flush()
+        return expired
+
+
+class RepositoryFileChange(
+    RepositoryDB[models.FileChange, schemas.FileChange, schemas.FileChange]
+):
+    REAP_BATCH_SIZE = 10000
+
+    async def record(self, db: AsyncSession, changes: List[dict]) -> None:
+        """
+            Записывает изменения файлов. Должен вызываться после
+            bump_files_version в той же транзакции: блокировка строки
+            пользователя гарантирует, что id изменений одного
+            пользователя растут в порядке коммитов, и курсор по id
+            не пропускает записи. Коммит выполняет вызывающий код.
+        """
+        if changes:
+            await db.execute(insert(self._model).values(changes))
+
+    async def get_last_id(self, db: AsyncSession, user_id: int) -> int:
+        statement = select(func.max(self._model.id)). \
+            where(self._model.user_id == user_id)
+        return await db.scalar(statement) or 0
+
+    async def get_since(
+        self,
+        db: AsyncSession,
+        user_id: int,
+        last_id: int,
+        limit: int
+    ) -> List[models.FileChange]:
+        statement = select(self._model). \
+            where(
+                self._model.user_id == user_id,
+                self._model.id > last_id
+        ). \
+            order_by(self._model.id). \
+            limit(limit)
+        results = await db.execute(statement=statement)
+        return results.scalars().all()
+
+    async def reap(self, db: AsyncSession, older_than: datetime) -> int:
+        """
+            Удаляет пачку изменений старше older_than и возвращает
+            количество удаленных записей.
+        """
+        expired = select(self._model.id). \
+            where(self._model.created_at < older_than). \
+            limit(self.REAP_BATCH_SIZE)
+        statement = delete(self._model). \
+            where(self._model.id.in_(expired)). \
+            execution_options(synchronize_session=False)
+        results = await db.execute(statement)
+        await db.commit()
+        return results.rowcount
+
+
+class RepositoryFolder(
+    RepositoryDB[models.Folder, schemas.Folder, schemas.Folder]
+):
+
+    async def ensure(
+        self,
+        db: AsyncSession,
+        paths: Iterable[Tuple[int, str]]
+    ) -> Dict[Tuple[int, str], int]:
+        """
+            Создает недостающие каталоги вместе с их родителями.
+            paths — пары (user_id, путь каталога), у каждого каталога
+            должны быть перечислены и все родительские. Возвращает id
+            каталогов. Вызывается под блокировкой строки пользователя
+            (bump_files_version). Коммит выполняет вызывающий код.
+        """
+        paths = set(paths)
+        if not paths:
+            return {}
+        statement = select(
+            self._model.user_id, self._model.path, self._model.id
+        ).where(
+            tuple_(self._model.user_id, self._model.path).in_(sorted(paths))
+        )
+        ids = {
+            (user_id, path): folder_id
+            for user_id, path, folder_id in await db.execute(statement)
+        }
+        missing: Dict[int, List[Tuple[int, str]]] = {}
+        for user_id, path in paths - ids.keys():
+            depth = len(folder_paths(path))
+            missing.setdefault(depth, []).append((user_id, path))
+        now = datetime.utcnow()
+        # Родители создаются раньше детей, чтобы знать их id
+        for depth in sorted(missing):
+            rows = []
+            for user_id, path in sorted(missing[depth]):
+                parent = parent_folder(path)
+                rows.append({
+                    'user_id': user_id,
+                    'parent_id': ids[(user_id, parent)] if parent else None,
+                    'name': path.split('/')[-1],
+                    'path': path,
+                    'created_at': now,
+                })
+            statement = insert(self._model).values(rows).returning(
+                self._model.user_id, self._model.path, self._model.id
+            )
+            for user_id, path, folder_id in await db.execute(statement):
+                ids[(user_id, path)] = folder_id
+        return ids
+
+    async def add_usage(
+        self,
+        db: AsyncSession,
+        usage: Dict[int, Tuple[int, int]]
+    ) -> None:
+        """
+            Изменяет суммарный объем и количество файлов каталогов.
+            usage — словарь id каталога -> (изменение байт, изменение
+            числа файлов). Коммит выполняет вызывающий код.
+        """
+        usage = {
+            folder_id: delta for folder_id, delta in usage.items()
+            if delta != (0, 0)
+        }
+        if not usage:
+            return
+        # executemany работает только для UPDATE по таблице, не по модели
+        table = self._model.__table__
+        statement = update(table). \
+            where(table.c.id == bindparam('folder_id')). \
+            values(
+                size=table.c.size + bindparam('size_delta'),
+                files_count=table.c.files_count + bindparam('count_delta')
+        )
+        await db.execute(statement, [
+            {'folder_id': folder_id, 'size_delta': size, 'count_delta': count}
+            for folder_id, (size, count) in sorted(usage.items())
+        ])
+
+    async def ensure_parent(
+        self,
+        db: AsyncSession,
+        user_id: int,
+        path: str
+    ) -> Optional[int]:
+        """
+            Создает каталоги, в которых будет лежать path, и
+            возвращает id непосредственного родителя (None — корень).
+        """
+        parent = parent_folder(path)
+        ids = await self.ensure(
+            db, {(user_id, folder) for folder in folder_paths(path)}
+        )
+        return ids[(user_id, parent)] if parent else None
+
+    async def add_to_ancestors(
+        self,
+        db: AsyncSession,
+        user_id: int,
+        path: str,
+        size: int,
+        count: int
+    ) -> None:
+        """
+            Изменяет итоги всех каталогов, в которых лежит path.
+            Коммит выполняет вызывающий код.
+        """
+        ids = await self.ensure(
+            db, {(user_id, folder) for folder in folder_paths(path)}
+        )
+        await self.add_usage(
+            db, {folder_id: (size, count) for folder_id in ids.values()}
+        )
+
+    async def remove_subtree(
+        self,
+        db: AsyncSession,
+        user_id: int,
+        path: str
+    ) -> None:
+        table = self._model.__table__
+        statement = delete(table). \
+            where(table.c.user_id == user_id, subtree(table.c.path, path))
+        await db.execute(statement)
+
+    async def move_subtree(
+        self,
+        db: AsyncSession,
+        user_id: int,
+        source: str,
+        destination: str
+    ) -> None:
+        """
+            Переносит каталог source вместе с поддеревом в destination:
+            у корня меняются родитель и имя, у всего поддерева — пути.
+            Коммит выполняет вызывающий код.
+        """
+        table = self._model.__table__
+        parent_id = await self.ensure_parent(db, user_id, destination)
+        statement = update(table). \
+            where(table.c.user_id == user_id, table.c.path == source). \
+            values(parent_id=parent_id, name=destination.split('/')[-1])
+        await db.execute(statement)
+        statement = update(table). \
+            where(table.c.user_id == user_id, subtree(table.c.path, source)). \
+            values(path=rebase(table.c.path, source, destination))
+        await db.execute(statement)
+
+    async def copy_subtree(
+        self,
+        db: AsyncSession,
+        user_id: int,
+        source: str,
+        destination: str
+    ) -> None:
+        """
+            Копирует каталог source вместе с поддеревом и итогами в
+            destination и связывает копии с родителями по путям.
+            Коммит выполняет вызывающий код.
+        """
+        table = self._model.__table__
+        parent_id = await self.ensure_parent(db, user_id, destination)
+        await db.execute(
+            insert(table).from_select(
+                ['user_id', 'name', 'path', 'size', 'files_count',
+                 'created_at'],
+                select(
+                    table.c.user_id,
+                    table.c.name,
+                    rebase(table.c.path, source, destination),
+                    table.c.size,
+                    table.c.files_count,
+                    literal(datetime.utcnow())
+                ).where(
+                    table.c.user_id == user_id,
+                    subtree(table.c.path, source)
+                )
+            )
+        )
+        statement = update(table). \
+            where(table.c.user_id == user_id, table.c.path == destination). \
+            values(parent_id=parent_id, name=destination.split('/')[-1])
+        await db.execute(statement)
+        # Родитель копии — каталог, путь которого равен пути копии
+        # без последнего компонента
+        parent = table.alias('parent')
+        statement = update(table). \
+            where(
+                table.c.user_id == user_id,
+                table.c.path.startswith(destination + '/', autoescape=True),
+                parent.c.user_id == user_id,
+                parent.c.path == func.regexp_replace(
+                    table.c.path, '/+[^/]*$', ''
+                )
+        ). \
+            values(parent_id=parent.c.id)
+        await db.execute(statement)
+
+    async def get_by_path(
+        self,
+        db: AsyncSession,
+        user_id: int,
+        path: str
+    ) -> Optional[models.Folder]:
+        statement = select(self._model). \
+            where(self._model.user_id == user_id, self._model.path == path)
+        results = await db.execute(statement=statement)
+        return results.scalar_one_or_none()
+
+    async def get_children(
+        self,
+        db: AsyncSession,
+        user_id: int,
+        folder_id: Optional[int]
+    ) -> List[models.Folder]:
+        statement = select(self._model). \
+            where(
+                self._model.user_id == user_id,
+                self._model.parent_id == folder_id
+        ). \
+            order_by(self._model.name)
+        results = await db.execute(statement=statement)
+        return results.scalars().all()
+
+
+class RepositoryJob(RepositoryDB[models.Job, BaseModel, BaseModel]):
+
+    async def enqueue(
+        self,
+        db: AsyncSession,
+        jobs: List[Tuple[models.File, str]],
+        max_attempts: int
+    ) -> None:
+        """
+            Ставит задачи обработки файлов — пары (файл, вид задачи).
+            Невыполненные задачи тех же видов для этих файлов
+            заменяются новыми: файл мог быть перезаписан. Строку
+            пользователя блокирует, версию списка файлов увеличивает
+            и коммит выполняет вызывающий код.
+        """
+        if not jobs:
+            return
+        file_ids = sorted({file.id for file, _ in jobs})
+        pairs = sorted({(file.id, kind) for file, kind in jobs})
+        statement = delete(self._model). \
+            where(
+                tuple_(self._model.file_id, self._model.kind).in_(pairs),
+                self._model.status.in_(('pending', 'failed'))
+        ). \
+            execution_options(synchronize_session=False)
+        await db.execute(statement)
+        now = datetime.utcnow()
+        await db.execute(insert(self._model).values([
+            {
+                'kind': kind,
+                'file_id': file_id,
+                'status': 'pending',
+                'attempts': 0,
+                'max_attempts': max_attempts,
+                'run_at': now,
+                'created_at': now,
+            } for file_id, kind in pairs
+        ]))
+        statement = update(models.File). \
+            where(models.File.id.in_(file_ids)). \
+            values(processing_status='pending'). \
+            execution_options(synchronize_session='evaluate')
+        await db.execute(statement)
+
+    async def claim(
+        self,
+        db: AsyncSession,
+        lease: float
+    ) -> Optional[models.Job]:
+        """
+            Берет в работу готовую задачу. Задачи, заблокированные
+            другими воркерами, пропускаются (SKIP LOCKED), задачи
+            упавших воркеров подбираются после истечения аренды.
+        """
+        now = datetime.utcnow()
+        ready = select(self._model.id). \
+            where(
+                self._model.status.in_(('pending', 'running')),
+                self._model.run_at <= now
+        ). \
+            order_by(self._model.run_at). \
+            limit(1). \
+            with_for_update(skip_locked=True). \
+            scalar_subquery()
+        statement = update(self._model). \
+            where(self._model.id == ready). \
+            values(
+                status='running',
+                attempts=self._model.attempts + 1,
+                run_at=now + timedelta(seconds=lease)
+        ). \
+            returning(self._model)
+        orm_statement = select(self._model). \
+            from_statement(statement). \
+            execution_options(populate_existing=True)
+        results = await db.execute(orm_statement)
+        job = results.scalar_one_or_none()
+        await db.commit()
+        return job
+
+    async def finish(
+        self,
+        db: AsyncSession,
+        job_id: int,
+        file_id: Optional[int],
+        error: Optional[str] = None,
+        retry_in: Optional[float] = None
+    ) -> None:
+        """
+            Завершает задачу: выполненная удаляется, упавшая
+            откладывается на retry_in секунд или, если попытки
+            закончились, помечается failed. Когда у файла не остается
+            невыполненных задач, обновляется его processing_status
+            и версия списка файлов пользователя.
+        """
+        if error is None:
+            statement = delete(self._model).where(self._model.id == job_id)
+        elif retry_in is not None:
+            statement = update(self._model). \
+                where(self._model.id == job_id). \
+                values(
+                    status='pending',
+                    run_at=datetime.utcnow() + timedelta(seconds=retry_in),
+                    last_error=error
+            )
+        else:
+            statement = update(self._model). \
+                where(self._model.id == job_id). \
+                values(status='failed', last_error=error)
+        await db.execute(statement)
+        if file_id is not None:
+            jobs = self._model.__table__
+            files = models.File.__table__
+            failed = exists().where(
+                jobs.c.file_id == file_id, jobs.c.status == 'failed'
+            )
+            unfinished = exists().where(
+                jobs.c.file_id == file_id,
+                jobs.c.status.in_(('pending', 'running'))
+            )
+            user_id = await db.scalar(
+                select(files.c.user_id).
+                where(files.c.id == file_id, ~unfinished)
+            )
+            if user_id is not None:
+                # Строка пользователя блокируется раньше строки файла,
+                # как и при остальных изменениях файлов
+                await user_crud.bump_files_version(db, [user_id])
+                statement = update(files). \
+                    where(files.c.id == file_id, ~unfinished). \
+                    values(
+                        processing_status=case(
+                            (failed, 'failed'), else_='done'
+                        )
+                )
+                await db.execute(statement)
+        await db.commit()
+
+
+class RepositoryPreview(RepositoryDB[models.Preview, BaseModel, BaseModel]):
+    # accessed_at обновляется не чаще, чтобы чтение превью
+    # не превращалось в запись на каждый запрос
+    TOUCH_INTERVAL = timedelta(minutes=10)
+
+    async def get(
+        self,
+        db: AsyncSession,
+        digest: str,
+        size: int,
+        format: str
+    ) -> Optional[models.Preview]:
+        statement = select(self._model). \
+            where(
+                self._model.digest == digest,
+                self._model.size == size,
+                self._model.format == format
+        )
+        results = await db.execute(statement=statement)
+        return results.scalar_one_or_none()
+
+    async def add(
+        self,
+        db: AsyncSession,
+        digest: str,
+        size: int,
+        format: str,
+        stored_size: int
+    ) -> None:
+        now = datetime.utcnow()
+        statement = insert(self._model).values(
+            digest=digest,
+            size=size,
+            format=format,
+            stored_size=stored_size,
+            created_at=now,
+            accessed_at=now
+        ).on_conflict_do_nothing(constraint='uq_previews_digest_size_format')
+        await db.execute(statement)
+        await db.commit()
+
+    async def touch(self, db: AsyncSession, preview: models.Preview) -> None:
+        now = datetime.utcnow()
+        if preview.accessed_at > now - self.TOUCH_INTERVAL:
+            return
+        statement = update(self._model). \
+            where(self._model.id == preview.id). \
+            values(accessed_at=now)
+        await db.execute(statement)
+        await db.commit()
+
+    async def remove_for_blobs(
+        self,
+        db: AsyncSession,
+        digests: List[str]
+    ) -> List[Tuple[str, int, str]]:
+        """
+            Удаляет записи о превью блобов и возвращает их
+            (digest, size, format). Коммит выполняет вызывающий код.
+        """
+        if not digests:
+            return []
+        statement = delete(self._model). \
+            where(self._model.digest.in_(digests)). \
+            returning(
+                self._model.digest, self._model.size, self._model.format
+        )
+        results = await db.execute(statement)
+        return results.all()
+
+    async def evict(
+        self,
+        db: AsyncSession,
+        max_bytes: int
+    ) -> List[Tuple[str, int, str]]:
+        """
+            Удаляет давно не запрашивавшиеся превью сверх max_bytes
+            (LRU по accessed_at) и возвращает их (digest, size, format).
+            Коммит выполняет вызывающий код.
+        """
+        ranked = select(
+            self._model.id,
+            func.sum(self._model.stored_size).over(
+                order_by=self._model.accessed_at.desc()
+            ).label('total')
+        ).subquery()
+        statement = delete(self._model). \
+            where(
+                self._model.id.in_(
+                    select(ranked.c.id).where(ranked.c.total > max_bytes)
+                )
+        ). \
+            returning(
+                self._model.digest, self._model.size, self._model.format
+        ). \
+            execution_options(synchronize_session=False)
+        results = await db.execute(statement)
+        return results.all()
+
+
+user_crud = RepositoryUser(models.User)
+blob_crud = RepositoryBlob(models.Blob)
+file_crud = RepositoryFile(models.File)
+upload_session_crud = RepositoryUploadSession(models.UploadSession)
+file_change_crud = RepositoryFileChange(models.FileChange)
+folder_crud = RepositoryFolder(models.Folder)
+job_crud = RepositoryJob(models.Job)
+preview_crud = RepositoryPreview(models.Preview)
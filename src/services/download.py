@@ -0,0 +1,213 @@
+import calendar
+from datetime import datetime
+from email.utils import formatdate, parsedate_to_datetime
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+from fastapi import Request, Response, status
+from fastapi.responses import StreamingResponse
+
+from core.config import app_settings
+from core.metrics import stage, track_transfer
+from exceptions.api import FilePathError, RangeNotSatisfiableError
+from services.compression import accepts_encoding
+from services.http_cache import is_not_modified, not_modified_response
+from services.backends import StorageStat
+from services.storage import read_blob, storage
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+        Разбирает заголовок Range и возвращает границы диапазона
+        (включительно). Поддерживается только один диапазон, для
+        остальных запросов возвращается None и отдается файл целиком.
+    """
+    unit, _, ranges = header.partition('=')
+    if unit.strip().lower() != 'bytes' or ',' in ranges:
+        return None
+    first, sep, last = ranges.strip().partition('-')
+    if not sep:
+        return None
+    try:
+        if not first:
+            suffix = int(last)
+            if suffix <= 0:
+                raise RangeNotSatisfiableError(size)
+            return max(size - suffix, 0), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiableError(size)
+    if start > end:
+        return None
+    return start, min(end, size - 1)
+
+
+def if_range_matches(header: str, etag: str, mtime: float) -> bool:
+    header = header.strip()
+    if header.startswith(('"', 'W/')):
+        return header == etag
+    try:
+        return int(parsedate_to_datetime(header).timestamp()) >= int(mtime)
+    except (TypeError, ValueError):
+        return False
+
+
+async def _iter_download(
+    key: str,
+    start: int,
+    length: int
+) -> AsyncIterator[bytes]:
+    with track_transfer('download'):
+        async for chunk in storage.get(
+            key, start, length,
+            chunk_size=app_settings.download_chunk_size
+        ):
+            yield chunk
+
+
+async def _iter_decoded(
+    key: str,
+    encoding: str,
+    start: int,
+    length: int
+) -> AsyncIterator[bytes]:
+    """
+        Распаковывает блоб на лету и отдает запрошенный диапазон
+        исходного содержимого.
+    """
+    with track_transfer('download'):
+        position = 0
+        async for chunk in read_blob(key, encoding):
+            chunk_end = position + len(chunk)
+            if chunk_end > start:
+                yield chunk[
+                    max(start - position, 0):start + length - position
+                ]
+            position = chunk_end
+            if position >= start + length:
+                break
+
+
+async def _stat(key: str) -> StorageStat:
+    with stage('storage_stat'):
+        stat_result = await storage.stat(key)
+    if stat_result is None:
+        raise FilePathError
+    return stat_result
+
+
+def _response_headers(
+    etag: str,
+    mtime: float,
+    encoding: Optional[str],
+    send_encoded: bool
+) -> Dict[str, str]:
+    headers = {
+        'Accept-Ranges': 'bytes',
+        'Cache-Control': app_settings.download_cache_control,
+        'ETag': f'{etag[:-1]}-{encoding}"' if send_encoded else etag,
+        'Last-Modified': formatdate(mtime, usegmt=True),
+    }
+    if encoding:
+        headers['Vary'] = 'Accept-Encoding'
+    return headers
+
+
+def requested_range(
+    request: Request,
+    size: int,
+    etag: str,
+    mtime: float
+) -> Optional[Tuple[int, int]]:
+    """
+        Диапазон из заголовка Range, если он есть и If-Range
+        совпадает с текущей версией файла.
+    """
+    range_header = request.headers.get('range')
+    if not range_header or not size:
+        return None
+    if_range = request.headers.get('if-range')
+    if if_range and not if_range_matches(if_range, etag, mtime):
+        return None
+    return parse_range(range_header, size)
+
+
+async def file_response(
+    request: Request,
+    key: str,
+    media_type: Optional[str],
+    encoding: Optional[str] = None,
+    size: Optional[int] = None,
+    etag: Optional[str] = None,
+    last_modified: Optional[datetime] = None,
+) -> Response:
+    """
+        Отдает файл из хранилища фиксированными чанками с поддержкой
+        заголовков Range и If-Range, а также условных запросов
+        If-None-Match и If-Modified-Since.
+
+        Сжатый при хранении файл (encoding) отдается как есть с
+        Content-Encoding, если клиент его принимает и не запрашивает
+        диапазон, иначе распаковывается на лету. size — исходный
+        размер сжатого файла.
+
+        Если переданы etag и last_modified (из базы данных), ответ
+        304 отдается без обращения к хранилищу.
+    """
+    if encoding and size is None:
+        raise ValueError('size is required for encoded files')
+    send_encoded = bool(
+        encoding
+        and not request.headers.get('range')
+        and accepts_encoding(request.headers.get('accept-encoding'), encoding)
+    )
+
+    stat_result = None
+    if etag is None or last_modified is None:
+        stat_result = await _stat(key)
+        etag = etag or stat_result.etag
+        mtime = stat_result.mtime
+    else:
+        mtime = calendar.timegm(last_modified.utctimetuple())
+
+    headers = _response_headers(etag, mtime, encoding, send_encoded)
+    if is_not_modified(request.headers, headers['ETag'], mtime):
+        return not_modified_response(headers)
+
+    if stat_result is None:
+        stat_result = await _stat(key)
+    if not encoding:
+        size = stat_result.size
+
+    if send_encoded:
+        headers['Content-Encoding'] = encoding
+        headers['Content-Length'] = str(stat_result.size)
+        return StreamingResponse(
+            _iter_download(key, 0, stat_result.size),
+            headers=headers,
+            media_type=media_type,
+        )
+
+    byte_range = requested_range(request, size, etag, mtime)
+    if byte_range is None:
+        start, length = 0, size
+        status_code = status.HTTP_200_OK
+    else:
+        start, end = byte_range
+        length = end - start + 1
+        status_code = status.HTTP_206_PARTIAL_CONTENT
+        headers['Content-Range'] = f'bytes {start}-{end}/{size}'
+    headers['Content-Length'] = str(length)
+
+    if encoding:
+        content = _iter_decoded(key, encoding, start, length)
+    else:
+        content = _iter_download(key, start, length)
+    return StreamingResponse(
+        content,
+        status_code=status_code,
+        headers=headers,
+        media_type=media_type,
+    )
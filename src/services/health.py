@@ -0,0 +1,127 @@
+import asyncio
+import os
+import shutil
+import socket
+import time
+from typing import Awaitable, Callable, Dict, Optional
+
+from sqlalchemy import text
+
+from core.config import app_settings
+from db.db import async_session
+from schemas import base as schemas
+from services.auth import user_cache
+from services.backends import LocalStorage
+from services.storage import storage
+
+# Проба возвращает дополнительные сведения о сервисе или None
+Probe = Callable[[], Awaitable[Optional[dict]]]
+
+HEALTH_KEY = f'health/{socket.gethostname()}-{os.getpid()}'
+HEALTH_PAYLOAD = b'ping'
+
+
+async def probe_db() -> Optional[dict]:
+    async with async_session() as db:
+        await db.execute(text('SELECT 1'))
+    return None
+
+
+async def probe_storage() -> Optional[dict]:
+    """
+        Записывает и читает небольшой файл в хранилище, для локального
+        диска также сообщает свободное место.
+    """
+    async def payload():
+        yield HEALTH_PAYLOAD
+
+    await storage.put(HEALTH_KEY, payload())
+    data = b''.join([chunk async for chunk in storage.get(HEALTH_KEY)])
+    await storage.delete(HEALTH_KEY)
+    if data != HEALTH_PAYLOAD:
+        raise RuntimeError('Storage returned unexpected content')
+    if isinstance(storage, LocalStorage):
+        usage = await asyncio.to_thread(shutil.disk_usage, storage.root)
+        return {'free_bytes': usage.free, 'total_bytes': usage.total}
+    return None
+
+
+async def probe_cache() -> Optional[dict]:
+    return user_cache.stats()
+
+
+class HealthChecker:
+    """
+        Опрашивает все зависимости параллельно, у каждой пробы свой
+        таймаут. Результат кэшируется на ttl секунд, а одновременные
+        запросы ждут одну и ту же проверку, поэтому частые
+        health-check'и балансировщика не нагружают базу данных.
+    """
+
+    def __init__(
+        self,
+        probes: Dict[str, Probe],
+        ttl: float,
+        timeout: float,
+        timer: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.probes = probes
+        self.ttl = ttl
+        self.timeout = timeout
+        self._timer = timer
+        self._result: Optional[Dict[str, schemas.ServiceHealth]] = None
+        self._checked_at = 0.0
+        self._pending: Optional[asyncio.Future] = None
+
+    async def _run_probe(
+        self,
+        probe: Probe
+    ) -> schemas.ServiceHealth:
+        start = time.perf_counter()
+        try:
+            details = await asyncio.wait_for(probe(), self.timeout)
+        except asyncio.TimeoutError:
+            return schemas.ServiceHealth(
+                ok=False, error=f'Timed out after {self.timeout}s'
+            )
+        except Exception as e:
+            return schemas.ServiceHealth(ok=False, error=repr(e))
+        return schemas.ServiceHealth(
+            ok=True,
+            latency=time.perf_counter() - start,
+            details=details or {}
+        )
+
+    async def _check(self) -> Dict[str, schemas.ServiceHealth]:
+        results = await asyncio.gather(
+            *(self._run_probe(probe) for probe in self.probes.values())
+        )
+        return dict(zip(self.probes, results))
+
+    def _store(self, future: asyncio.Future) -> None:
+        self._pending = None
+        if not future.cancelled() and future.exception() is None:
+            self._result = future.result()
+            self._checked_at = self._timer()
+
+    async def check(self) -> Dict[str, schemas.ServiceHealth]:
+        if (
+            self._result is not None
+            and self._timer() - self._checked_at < self.ttl
+        ):
+            return self._result
+        if self._pending is None:
+            self._pending = asyncio.ensure_future(self._check())
+            self._pending.add_done_callback(self._store)
+        return await asyncio.shield(self._pending)
+
+
+health_checker = HealthChecker(
+    probes={
+        'db': probe_db,
+        'storage': probe_storage,
+        'cache': probe_cache,
+    },
+    ttl=app_settings.health_cache_ttl,
+    timeout=app_settings.health_probe_timeout,
+)
@@ -0,0 +1,54 @@
+import calendar
+from datetime import datetime
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Mapping, Optional
+
+from fastapi import Response, status
+
+
+def http_date(value: datetime) -> str:
+    """
+        Дата в формате HTTP для naive datetime в UTC.
+    """
+    return formatdate(calendar.timegm(value.utctimetuple()), usegmt=True)
+
+
+def etag_matches(header: str, etag: str) -> bool:
+    """
+        Слабое сравнение ETag для If-None-Match (RFC 9110, 13.1.2).
+    """
+    if header.strip() == '*':
+        return True
+    opaque = etag.removeprefix('W/')
+    return any(
+        candidate.strip().removeprefix('W/') == opaque
+        for candidate in header.split(',')
+    )
+
+
+def is_not_modified(
+    headers: Mapping[str, str],
+    etag: Optional[str],
+    last_modified: Optional[float],
+) -> bool:
+    """
+        Проверяет условия If-None-Match и If-Modified-Since.
+        If-Modified-Since учитывается, только если нет If-None-Match.
+    """
+    if_none_match = headers.get('if-none-match')
+    if if_none_match is not None:
+        return etag is not None and etag_matches(if_none_match, etag)
+    if_modified_since = headers.get('if-modified-since')
+    if if_modified_since is None or last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since).timestamp()
+    except (TypeError, ValueError):
+        return False
+    return int(last_modified) <= int(since)
+
+
+def not_modified_response(headers: Mapping[str, str]) -> Response:
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED, headers=dict(headers)
+    )
@@ -0,0 +1,217 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.config import app_settings
+from core.metrics import JOB_LATENCY, JOBS_PROCESSED
+from db.db import async_session
+from models import base as models
+from services.db import file_crud, job_crud
+from services.sniffing import HEAD_SIZE, corrected_mime_type, sniff_mime_type
+from services.storage import blob_key, read_blob
+
+logger = logging.getLogger(__name__)
+
+JobHandler = Callable[[AsyncSession, models.File], Awaitable[None]]
+FileFilter = Callable[[models.File], bool]
+
+
+class JobQueue:
+    """
+        Очередь фоновой обработки файлов. Задачи хранятся в таблице
+        jobs и переживают перезапуск, выполняются пулом из workers
+        asyncio-задач. Воркеры разных процессов берут задачи через
+        SELECT ... FOR UPDATE SKIP LOCKED, поэтому одна задача
+        выполняется одним воркером. Упавшая задача повторяется
+        с экспоненциальной задержкой.
+    """
+
+    def __init__(
+        self,
+        workers: int = 2,
+        poll_interval: float = 5.0,
+        timeout: float = 120.0,
+        max_attempts: int = 5,
+        backoff: float = 10.0,
+        backoff_max: float = 3600.0,
+    ) -> None:
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.handlers: Dict[str, JobHandler] = {}
+        self.filters: Dict[str, FileFilter] = {}
+        self._wakeup = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+
+    def register(
+        self,
+        kind: str,
+        accepts: Optional[FileFilter] = None
+    ) -> Callable[[JobHandler], JobHandler]:
+        """
+            Регистрирует обработчик задач вида kind. Если указан
+            accepts, задачи ставятся только для файлов, для которых
+            он возвращает True.
+        """
+        def decorator(handler: JobHandler) -> JobHandler:
+            self.handlers[kind] = handler
+            if accepts is not None:
+                self.filters[kind] = accepts
+            return handler
+        return decorator
+
+    def select_jobs(
+        self,
+        files: List[models.File],
+        kinds: List[str]
+    ) -> List[Tuple[models.File, str]]:
+        jobs = []
+        for kind in kinds:
+            accepts = self.filters.get(kind)
+            jobs.extend(
+                (file, kind) for file in files
+                if accepts is None or accepts(file)
+            )
+        return jobs
+
+    async def enqueue(
+        self,
+        db: AsyncSession,
+        files: List[models.File],
+        kinds: Optional[List[str]] = None
+    ) -> None:
+        """
+            Ставит задачи обработки файлов (по умолчанию всех
+            зарегистрированных видов) в транзакции, записавшей файлы.
+            Передается в file_crud.create_or_update; после коммита
+            нужно разбудить воркеры через wake().
+        """
+        await job_crud.enqueue(
+            db,
+            self.select_jobs(
+                files, list(self.handlers) if kinds is None else kinds
+            ),
+            self.max_attempts
+        )
+
+    def wake(self) -> None:
+        self._wakeup.set()
+
+    def retry_delay(self, attempts: int) -> float:
+        return min(self.backoff * 2 ** (attempts - 1), self.backoff_max)
+
+    async def run_once(self) -> bool:
+        """
+            Выполняет одну готовую задачу. Возвращает False, если
+            готовых задач нет.
+        """
+        async with async_session() as db:
+            job = await job_crud.claim(db, lease=self.timeout * 2)
+            if job is None:
+                return False
+            # После rollback атрибуты задачи недоступны
+            job_id, kind, file_id = job.id, job.kind, job.file_id
+            attempts, max_attempts = job.attempts, job.max_attempts
+            error = None
+            start = time.perf_counter()
+            try:
+                handler = self.handlers.get(kind)
+                if handler is None:
+                    raise LookupError(f'Unknown job kind: {kind}')
+                file = await db.get(models.File, file_id)
+                # Файл мог быть удален после постановки задачи
+                if file is not None:
+                    await asyncio.wait_for(handler(db, file), self.timeout)
+            except Exception as e:
+                await db.rollback()
+                error = repr(e)
+                logger.warning(
+                    'Job %s (%s) failed on attempt %s: %s',
+                    job_id, kind, attempts, error
+                )
+            JOB_LATENCY.labels(kind).observe(time.perf_counter() - start)
+            retry_in = None
+            if error is not None and attempts < max_attempts:
+                retry_in = self.retry_delay(attempts)
+            if error is None:
+                outcome = 'done'
+            else:
+                outcome = 'retry' if retry_in is not None else 'failed'
+            JOBS_PROCESSED.labels(kind, outcome).inc()
+            await job_crud.finish(db, job_id, file_id, error, retry_in)
+        return True
+
+    async def _work(self) -> None:
+        while True:
+            try:
+                processed = await self.run_once()
+            except Exception:
+                logger.exception('Job worker failed')
+                processed = False
+            if processed:
+                continue
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(
+                    self._wakeup.wait(), self.poll_interval
+                )
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self) -> None:
+        for _ in range(self.workers):
+            self._tasks.append(asyncio.create_task(self._work()))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+
+job_queue = JobQueue(
+    workers=app_settings.job_workers,
+    poll_interval=app_settings.job_poll_interval,
+    timeout=app_settings.job_timeout,
+    max_attempts=app_settings.job_max_attempts,
+    backoff=app_settings.job_retry_backoff,
+    backoff_max=app_settings.job_retry_backoff_max,
+)
+
+
+async def read_head(file: models.File, size: int = HEAD_SIZE) -> bytes:
+    """
+        Читает первые size байт исходного содержимого файла.
+    """
+    head = bytearray()
+    chunks = read_blob(
+        blob_key(file.blob_digest), file.content_encoding, chunk_size=size
+    )
+    try:
+        async for chunk in chunks:
+            head.extend(chunk)
+            if len(head) >= size:
+                break
+    finally:
+        await chunks.aclose()
+    return bytes(head[:size])
+
+
+@job_queue.register('sniff')
+async def sniff_file(db: AsyncSession, file: models.File) -> None:
+    """
+        Определяет MIME-тип по содержимому вместо заявленного клиентом.
+    """
+    if not file.blob_digest:
+        return
+    mime_type = corrected_mime_type(
+        file.mime_type, sniff_mime_type(await read_head(file))
+    )
+    if mime_type:
+        await file_crud.set_mime_type(db, file, mime_type)
@@ -0,0 +1,241 @@
+import asyncio
+import io
+import logging
+from typing import AsyncIterator, Dict
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.config import app_settings
+from core.metrics import stage
+from db.db import async_session
+from exceptions.api import FilePathError, PreviewNotSupportedError
+from models import base as models
+from services.db import preview_crud
+from services.jobs import job_queue
+from services.storage import blob_key, preview_key, read_blob, storage
+from services.workers import WorkerPool
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {
+    'jpeg': 'image/jpeg',
+    'webp': 'image/webp',
+}
+PREVIEW_SIZES = (64, 128, 256, 512, 1024)
+# Форматы, которые Pillow умеет открывать без дополнительных
+# библиотек (SVG — векторный, его превью не строится)
+PREVIEWABLE_TYPES = frozenset((
+    'image/jpeg',
+    'image/png',
+    'image/gif',
+    'image/webp',
+    'image/bmp',
+    'image/tiff',
+))
+
+
+def _flatten(image: 'Image.Image') -> 'Image.Image':
+    """
+        Накладывает изображение с прозрачностью на белый фон
+        (JPEG не поддерживает альфа-канал).
+    """
+    image = image.convert('RGBA')
+    background = Image.new('RGB', image.size, (255, 255, 255))
+    background.paste(image, mask=image.getchannel('A'))
+    return background
+
+
+def render_preview(data: bytes, size: int, format: str, quality: int) -> bytes:
+    """
+        Уменьшает изображение так, чтобы оно помещалось в квадрат
+        size x size, с учетом ориентации из EXIF. Изображения меньше
+        size не увеличиваются. Выполняется в пуле процессов.
+    """
+    try:
+        with Image.open(io.BytesIO(data)) as source:
+            # JPEG декодируется сразу в уменьшенном масштабе
+            source.draft('RGB', (size, size))
+            image = ImageOps.exif_transpose(source)
+            image.thumbnail((size, size))
+            if format == 'jpeg' and image.mode != 'RGB':
+                image = _flatten(image)
+            elif image.mode not in ('RGB', 'RGBA'):
+                image = image.convert('RGBA')
+            output = io.BytesIO()
+            image.save(output, format=format.upper(), quality=quality)
+    except (OSError, Image.DecompressionBombError) as e:
+        raise ValueError(f'Cannot render preview: {e}') from e
+    return output.getvalue()
+
+
+async def _iter_content(content: bytes) -> AsyncIterator[bytes]:
+    yield content
+
+
+class PreviewGenerator:
+    """
+        Строит превью изображений в пуле процессов и сохраняет их
+        в хранилище. Превью привязаны к хэшу содержимого, поэтому
+        перезаписанный файл получает новые превью, а одинаковые
+        изображения разных пользователей — общие. Одновременные
+        запросы одного превью в процессе ждут одной генерации.
+    """
+
+    def __init__(
+        self,
+        pool: WorkerPool,
+        quality: int = 80,
+        max_source_size: int = 50 * 1024 * 1024,
+    ) -> None:
+        self.pool = pool
+        self.quality = quality
+        self.max_source_size = max_source_size
+        self._pending: Dict[str, asyncio.Task] = {}
+
+    @staticmethod
+    def available() -> bool:
+        return Image is not None
+
+    def supports(self, file: models.File) -> bool:
+        return bool(
+            file.blob_digest
+            and file.mime_type in PREVIEWABLE_TYPES
+            and file.size <= self.max_source_size
+        )
+
+    async def _read_source(self, file: models.File) -> bytearray:
+        data = bytearray()
+        async for chunk in read_blob(
+            blob_key(file.blob_digest), file.content_encoding
+        ):
+            data.extend(chunk)
+        return data
+
+    async def _render(
+        self,
+        key: str,
+        file: models.File,
+        size: int,
+        format: str
+    ) -> None:
+        # Исходное изображение читается только после того, как
+        # освободилось место в пуле: ожидающие запросы не держат
+        # его в памяти
+        async with self.pool.slot():
+            with stage('preview_render'):
+                content = await self.pool.execute(
+                    render_preview,
+                    await self._read_source(file),
+                    size,
+                    format,
+                    self.quality,
+                )
+        await storage.put(key, _iter_content(content))
+        async with async_session() as db:
+            await preview_crud.add(
+                db, file.blob_digest, size, format, len(content)
+            )
+
+    async def generate(
+        self,
+        file: models.File,
+        size: int,
+        format: str
+    ) -> None:
+        key = preview_key(file.blob_digest, size, format)
+        task = self._pending.get(key)
+        if task is None:
+            task = asyncio.create_task(self._render(key, file, size, format))
+            self._pending[key] = task
+            task.add_done_callback(lambda _: self._pending.pop(key, None))
+        # Отмена одного запроса не прерывает генерацию для остальных
+        await asyncio.shield(task)
+
+    async def get(
+        self,
+        db: AsyncSession,
+        file: models.File,
+        size: int,
+        format: str
+    ) -> models.Preview:
+        """
+            Возвращает превью файла, при необходимости построив его.
+        """
+        if not self.available():
+            raise PreviewNotSupportedError(
+                status_code=501, detail='Preview generation is not available'
+            )
+        if not self.supports(file):
+            raise PreviewNotSupportedError
+        preview = await preview_crud.get(db, file.blob_digest, size, format)
+        if preview is not None:
+            await preview_crud.touch(db, preview)
+            return preview
+        try:
+            await self.generate(file, size, format)
+        except ValueError:
+            raise PreviewNotSupportedError
+        preview = await preview_crud.get(db, file.blob_digest, size, format)
+        if preview is None:
+            raise FilePathError
+        return preview
+
+
+preview_pool = WorkerPool(
+    executor='process',
+    workers=app_settings.preview_workers,
+    concurrency=app_settings.preview_concurrency,
+    name='preview',
+)
+preview_generator = PreviewGenerator(
+    preview_pool,
+    quality=app_settings.preview_quality,
+    max_source_size=app_settings.preview_max_source_size,
+)
+
+
+async def evict_previews() -> None:
+    """
+        Удаляет давно не запрашивавшиеся превью, пока их суммарный
+        размер превышает PREVIEW_CACHE_MAX_BYTES.
+    """
+    async with async_session() as db:
+        evicted = await preview_crud.evict(
+            db, app_settings.preview_cache_max_bytes
+        )
+        for preview in evicted:
+            await storage.delete(preview_key(*preview))
+        await db.commit()
+    if evicted:
+        logger.info('Evicted %s previews', len(evicted))
+
+
+def eager_preview(file: models.File) -> bool:
+    return (
+        app_settings.preview_eager_size > 0
+        and preview_generator.available()
+        and preview_generator.supports(file)
+    )
+
+
+@job_queue.register('preview', accepts=eager_preview)
+async def preview_file(db: AsyncSession, file: models.File) -> None:
+    """
+        Заранее строит превью загруженного изображения, чтобы первый
+        просмотр галереи не ждал генерации. Задача ставится только
+        для изображений, но тип файла мог измениться после
+        определения по содержимому.
+    """
+    if not eager_preview(file):
+        return
+    try:
+        await preview_generator.get(
+            db, file, app_settings.preview_eager_size, 'jpeg'
+        )
+    except PreviewNotSupportedError:
+        pass
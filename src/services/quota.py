@@ -0,0 +1,124 @@
+import logging
+import re
+from typing import Optional
+
+from fastapi.responses import ORJSONResponse
+from fastapi.security.utils import get_authorization_scheme_param
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from core.config import app_settings
+from db.db import async_session
+from exceptions.api import QuotaExceededError
+from exceptions.auth import CredentialException
+from services.auth import user_from_token
+from services.cache import TTLCache
+from services.db import user_crud
+
+logger = logging.getLogger(__name__)
+
+RECONCILE_BATCH_SIZE = 500
+# Как долго помнить результат проверки наличия квот
+QUOTAS_CHECK_TTL = 60.0
+
+UPLOAD_PATH = re.compile(
+    rf'^{re.escape(app_settings.api_v1_prefix)}'
+    r'/files/(upload|upload/batch|uploads/[^/]+/parts/\d+)$'
+)
+
+
+def exceeds_quota(
+    used_bytes: int,
+    quota_bytes: Optional[int],
+    length: int
+) -> bool:
+    return quota_bytes is not None and used_bytes + length > quota_bytes
+
+
+_quotas_cache: TTLCache[str, bool] = TTLCache(
+    maxsize=1, ttl=QUOTAS_CHECK_TTL
+)
+
+
+async def quotas_enabled() -> bool:
+    """
+        Ограничено ли место хоть у одного пользователя: задана квота
+        по умолчанию или индивидуальная квота. Результат проверки
+        базы данных кэшируется на QUOTAS_CHECK_TTL секунд.
+    """
+    if app_settings.user_quota_bytes > 0:
+        return True
+    enabled = _quotas_cache.get('enabled')
+    if enabled is None:
+        async with async_session() as db:
+            enabled = await user_crud.has_quotas(db)
+        _quotas_cache.set('enabled', enabled)
+    return enabled
+
+
+class QuotaMiddleware:
+    """
+        ASGI-middleware: отклоняет загрузку по заголовку Content-Length,
+        если она заведомо не помещается в квоту, до чтения тела
+        запроса. Запросы без Content-Length и с невалидным токеном
+        пропускаются — окончательная проверка выполняется в транзакции
+        записи файла. Если квоты не заданы, база данных не
+        запрашивается.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if (
+            scope['type'] == 'http'
+            and scope['method'] in ('POST', 'PUT')
+            and UPLOAD_PATH.match(scope['path'])
+            and await self._rejected(scope)
+        ):
+            error = QuotaExceededError()
+            response = ORJSONResponse(
+                {'detail': error.detail}, status_code=error.status_code
+            )
+            await response(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
+
+    async def _rejected(self, scope: Scope) -> bool:
+        headers = dict(scope['headers'])
+        try:
+            length = int(headers[b'content-length'])
+        except (KeyError, ValueError):
+            return False
+        if not await quotas_enabled():
+            return False
+        scheme, token = get_authorization_scheme_param(
+            headers.get(b'authorization', b'').decode('latin-1')
+        )
+        if scheme.lower() != 'bearer' or not token:
+            return False
+        async with async_session() as db:
+            try:
+                user = await user_from_token(db, token)
+            except CredentialException:
+                return False
+            usage = await user_crud.get_usage(db, user.id)
+        if usage is None:
+            return False
+        return exceeds_quota(usage.used_bytes, usage.quota_bytes, length)
+
+
+async def reconcile_usage() -> None:
+    """
+        Сверяет счетчики занятого места с таблицей files и исправляет
+        расхождения (например, после ручных правок базы данных).
+    """
+    after_id: Optional[int] = 0
+    fixed = 0
+    async with async_session() as db:
+        while after_id is not None:
+            after_id, count = await user_crud.reconcile_usage(
+                db, after_id, RECONCILE_BATCH_SIZE
+            )
+            fixed += count
+    if fixed:
+        logger.warning('Fixed usage counters of %s users', fixed)
@@ -0,0 +1,75 @@
+from typing import Optional, Tuple
+
+HEAD_SIZE = 512
+
+# (смещение, сигнатура, MIME-тип); более длинные сигнатуры раньше
+# коротких с тем же началом
+SIGNATURES: Tuple[Tuple[int, bytes, str], ...] = (
+    (0, b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (0, b'\xff\xd8\xff', 'image/jpeg'),
+    (0, b'GIF87a', 'image/gif'),
+    (0, b'GIF89a', 'image/gif'),
+    (0, b'BM', 'image/bmp'),
+    (0, b'II*\x00', 'image/tiff'),
+    (0, b'MM\x00*', 'image/tiff'),
+    (0, b'%PDF-', 'application/pdf'),
+    (0, b'PK\x03\x04', 'application/zip'),
+    (0, b'\x1f\x8b', 'application/gzip'),
+    (0, b'7z\xbc\xaf\x27\x1c', 'application/x-7z-compressed'),
+    (0, b'Rar!\x1a\x07', 'application/vnd.rar'),
+    (0, b'\x28\xb5\x2f\xfd', 'application/zstd'),
+    (0, b'ID3', 'audio/mpeg'),
+    (0, b'fLaC', 'audio/flac'),
+    (0, b'OggS', 'audio/ogg'),
+    (0, b'\x1aE\xdf\xa3', 'video/webm'),
+    (4, b'ftypqt', 'video/quicktime'),
+    (4, b'ftypheic', 'image/heic'),
+    (4, b'ftypavif', 'image/avif'),
+    (4, b'ftypM4A ', 'audio/mp4'),
+    (4, b'ftyp', 'video/mp4'),
+)
+GENERIC_TYPES = frozenset(('application/octet-stream', 'binary/octet-stream'))
+# Контейнеры, внутри которых бывают более конкретные форматы
+# (docx и epub — zip, m4v — mp4): заявленный тип из того же
+# семейства не заменяется
+CONTAINER_FAMILIES = {
+    'application/zip': ('application/',),
+    'application/gzip': ('application/',),
+    'video/mp4': ('video/', 'audio/'),
+    'video/webm': ('video/', 'audio/'),
+    'audio/ogg': ('audio/', 'video/', 'application/ogg'),
+}
+RIFF_TYPES = {
+    b'WEBP': 'image/webp',
+    b'WAVE': 'audio/wav',
+    b'AVI ': 'video/x-msvideo',
+}
+
+
+def sniff_mime_type(head: bytes) -> Optional[str]:
+    """
+        Определяет MIME-тип по сигнатуре в начале файла. Для форматов
+        без сигнатуры (в том числе текстовых) возвращает None.
+    """
+    if head[:4] == b'RIFF':
+        return RIFF_TYPES.get(head[8:12])
+    for offset, signature, mime_type in SIGNATURES:
+        if head[offset:offset + len(signature)] == signature:
+            return mime_type
+    return None
+
+
+def corrected_mime_type(
+    declared: Optional[str],
+    sniffed: Optional[str]
+) -> Optional[str]:
+    """
+        Возвращает MIME-тип, которым нужно заменить заявленный
+        клиентом, или None, если заявленный тип менять не нужно.
+    """
+    if sniffed is None or sniffed == declared:
+        return None
+    if declared and declared not in GENERIC_TYPES:
+        if declared.startswith(CONTAINER_FAMILIES.get(sniffed, ())):
+            return None
+    return sniffed
@@ -0,0 +1,247 @@
+import hashlib
+import logging
+import os
+import uuid
+from typing import AsyncIterator, Dict, Iterable, List, NamedTuple, Optional
+
+import aiofiles
+import aiofiles.os
+from fastapi import UploadFile
+
+from core.config import app_settings
+from core.metrics import stage
+from db.db import async_session
+from services.backends import (
+    LocalStorage, S3Storage, StorageBackend, iter_local_file
+)
+from services.compression import (
+    choose_encoding, decode_stream, encode_stream
+)
+from services.db import (
+    BlobWriter, blob_crud, preview_crud, upload_session_crud
+)
+
+logger = logging.getLogger(__name__)
+
+TMP_STORAGE = app_settings.storage_tmp_dir or os.path.join(
+    app_settings.storage_root, 'tmp'
+)
+
+
+class StagedFile(NamedTuple):
+    tmp_path: str
+    size: int
+    digest: str
+    stored_size: int
+    encoding: Optional[str] = None
+
+
+def create_storage() -> StorageBackend:
+    if app_settings.storage_backend == 's3':
+        return S3Storage(
+            bucket=app_settings.s3_bucket,
+            endpoint_url=app_settings.s3_endpoint_url,
+            access_key=app_settings.s3_access_key,
+            secret_key=app_settings.s3_secret_key,
+            region=app_settings.s3_region,
+            part_size=app_settings.s3_part_size,
+        )
+    return LocalStorage(app_settings.storage_root)
+
+
+storage = create_storage()
+
+
+def blob_key(digest: str) -> str:
+    return f'blobs/{digest[:2]}/{digest[2:4]}/{digest}'
+
+
+def preview_key(digest: str, size: int, format: str) -> str:
+    return f'previews/{digest[:2]}/{digest[2:4]}/{digest}/{size}.{format}'
+
+
+def legacy_key(username: str, path: str) -> str:
+    """
+        Расположение файлов, загруженных до появления хранилища блобов.
+    """
+    return f'{username}/{path}'
+
+
+def part_key(upload_id: str, part_number: int) -> str:
+    return f'uploads/{upload_id}/{part_number}'
+
+
+async def stage_stream(
+    chunks: AsyncIterator[bytes],
+    encoding: Optional[str] = None,
+) -> StagedFile:
+    """
+        Потоково записывает данные во временный файл, одновременно
+        вычисляя SHA-256 исходного содержимого. Если указано
+        encoding, данные сжимаются по мере записи.
+    """
+    await aiofiles.os.makedirs(TMP_STORAGE, exist_ok=True)
+    tmp_path = os.path.join(TMP_STORAGE, f'{uuid.uuid4().hex}.part')
+    digest = hashlib.sha256()
+    size = 0
+    stored_size = 0
+
+    async def hashed() -> AsyncIterator[bytes]:
+        nonlocal size
+        async for chunk in chunks:
+            size += len(chunk)
+            digest.update(chunk)
+            yield chunk
+
+    stored = hashed()
+    if encoding:
+        stored = encode_stream(stored, encoding)
+    try:
+        async with aiofiles.open(tmp_path, 'wb') as out_file:
+            async for chunk in stored:
+                stored_size += len(chunk)
+                await out_file.write(chunk)
+    except BaseException:
+        await discard_upload(tmp_path)
+        raise
+    return StagedFile(
+        tmp_path, size, digest.hexdigest(), stored_size, encoding
+    )
+
+
+async def iter_upload(
+    file_in: UploadFile,
+    chunk_size: int = app_settings.upload_chunk_size
+) -> AsyncIterator[bytes]:
+    while chunk := await file_in.read(chunk_size):
+        yield chunk
+
+
+async def stage_upload(file_in: UploadFile) -> StagedFile:
+    """
+        Сохраняет загружаемый файл во временный файл. В памяти
+        одновременно находится не больше одного чанка.
+    """
+    return await stage_stream(
+        iter_upload(file_in), choose_encoding(file_in.content_type)
+    )
+
+
+async def commit_upload(
+    staged: StagedFile,
+    encoding: Optional[str] = None,
+) -> None:
+    """
+        Переносит временный файл в хранилище блобов. Если блоб
+        с таким содержимым уже есть, временный файл просто удаляется.
+
+        encoding — кодирование, записанное для блоба в базе данных.
+        Если блоб был создан другой загрузкой с другим кодированием,
+        содержимое перекодируется.
+    """
+    key = blob_key(staged.digest)
+    if await storage.exists(key):
+        await discard_upload(staged.tmp_path)
+        return
+    try:
+        if staged.encoding == encoding:
+            await storage.put_file(key, staged.tmp_path)
+            return
+        chunks = iter_local_file(staged.tmp_path)
+        if staged.encoding:
+            chunks = decode_stream(chunks, staged.encoding)
+        if encoding:
+            chunks = encode_stream(chunks, encoding)
+        await storage.put(key, chunks)
+        await discard_upload(staged.tmp_path)
+    except BaseException:
+        await discard_upload(staged.tmp_path)
+        raise
+
+
+def blob_writer(staged: List[StagedFile]) -> BlobWriter:
+    """
+        Возвращает функцию для file_crud.create_or_update, которая
+        переносит временные файлы в хранилище до коммита записей
+        о файлах.
+    """
+    async def write(encodings: Dict[str, Optional[str]]) -> None:
+        with stage('commit_upload'):
+            for staged_file in staged:
+                await commit_upload(
+                    staged_file, encodings.get(staged_file.digest)
+                )
+
+    return write
+
+
+def read_blob(
+    key: str,
+    encoding: Optional[str],
+    chunk_size: int = app_settings.download_chunk_size,
+) -> AsyncIterator[bytes]:
+    """
+        Читает исходное содержимое блоба, распаковывая его на лету.
+    """
+    chunks = storage.get(key, chunk_size=chunk_size)
+    if encoding:
+        return decode_stream(chunks, encoding)
+    return chunks
+
+
+async def discard_upload(tmp_path: str) -> None:
+    try:
+        await aiofiles.os.remove(tmp_path)
+    except FileNotFoundError:
+        pass
+
+
+async def iter_parts(
+    upload_id: str,
+    part_numbers: Iterable[int]
+) -> AsyncIterator[bytes]:
+    """
+        Последовательно читает части сессии загрузки из хранилища.
+    """
+    for part_number in part_numbers:
+        async for chunk in storage.get(
+            part_key(upload_id, part_number),
+            chunk_size=app_settings.upload_chunk_size
+        ):
+            yield chunk
+
+
+async def delete_parts(upload_id: str, part_numbers: Iterable[int]) -> None:
+    for part_number in part_numbers:
+        await storage.delete(part_key(upload_id, part_number))
+
+
+async def reap_blobs() -> None:
+    """
+        Удаляет блобы, на которые больше не ссылается ни один файл,
+        вместе с их превью. Строки удаляются и файлы стираются в одной
+        транзакции, поэтому параллельная загрузка того же содержимого
+        дождется ее завершения и запишет блоб заново.
+    """
+    async with async_session() as db:
+        digests = await blob_crud.reap(db)
+        for digest in digests:
+            await storage.delete(blob_key(digest))
+        for preview in await preview_crud.remove_for_blobs(db, digests):
+            await storage.delete(preview_key(*preview))
+        await db.commit()
+    if digests:
+        logger.info('Removed %s unreferenced blobs', len(digests))
+
+
+async def reap_upload_sessions() -> None:
+    """
+        Удаляет истекшие сессии загрузки вместе с их частями.
+    """
+    async with async_session() as db:
+        expired = await upload_session_crud.reap(db)
+        for upload_id, part_numbers in expired:
+            await delete_parts(upload_id, part_numbers)
+        await db.commit()
+    if expired:
+        logger.info('Removed %s expired upload sessions', len(expired))
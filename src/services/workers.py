@@ -0,0 +1,99 @@
+import asyncio
+from concurrent.futures import (
+    Executor, ProcessPoolExecutor, ThreadPoolExecutor
+)
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Dict, Optional, TypeVar
+
+ResultType = TypeVar('ResultType')
+
+
+class WorkerPool:
+    """
+        Выполняет CPU-емкие операции (хэширование паролей, обработку
+        изображений) в отдельном пуле потоков или процессов, чтобы
+        не блокировать event loop. Количество
+        одновременно выполняемых задач ограничено семафором, остальные
+        ждут своей очереди.
+    """
+
+    def __init__(
+        self,
+        executor: str = 'thread',
+        workers: int = 2,
+        concurrency: int = 4,
+        name: str = 'worker',
+    ) -> None:
+        if executor not in ('thread', 'process'):
+            raise ValueError(f'Unknown executor type: {executor}')
+        self._executor_type = executor
+        self._workers = workers
+        self._name = name
+        self._executor: Optional[Executor] = None
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self.concurrency = concurrency
+        self.waiting = 0
+        self.running = 0
+        self.completed = 0
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self._executor_type == 'process':
+                self._executor = ProcessPoolExecutor(self._workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    self._workers, thread_name_prefix=self._name
+                )
+        return self._executor
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """
+            Занимает место в пуле. Подготовку данных для задачи стоит
+            выполнять внутри slot(), чтобы ожидающие своей очереди
+            задачи не держали их в памяти.
+        """
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.running += 1
+        try:
+            yield
+        finally:
+            self.running -= 1
+            self.completed += 1
+            self._semaphore.release()
+
+    async def execute(
+        self,
+        func: Callable[..., ResultType],
+        *args
+    ) -> ResultType:
+        """
+            Выполняет func в пуле. Вызывается внутри slot().
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), func, *args)
+
+    async def run(
+        self,
+        func: Callable[..., ResultType],
+        *args
+    ) -> ResultType:
+        async with self.slot():
+            return await self.execute(func, *args)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'concurrency': self.concurrency,
+            'waiting': self.waiting,
+            'running': self.running,
+            'completed': self.completed,
+        }
@@ -0,0 +1,298 @@
+import asyncio
+import uuid
+from collections import Counter
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from db.db import Base
+from models import base as models
+from schemas import base as schemas
+from services.db import (
+    blob_crud, file_crud, folder_paths, parent_folder, user_crud
+)
+from services.jobs import JobQueue
+from tests.test_api import SQLALCHEMY_DATABASE_URL
+
+# Счетчики занятого места, итоги каталогов и ссылки на блобы
+# проверяются на настоящей базе данных: после каждой операции они
+# должны совпадать с пересчетом по таблице files.
+
+
+def run_in_db(scenario) -> None:
+    async def main() -> None:
+        engine = create_async_engine(SQLALCHEMY_DATABASE_URL, future=True)
+        try:
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.drop_all)
+                await conn.run_sync(Base.metadata.create_all)
+        except OSError as e:
+            await engine.dispose()
+            pytest.skip(f'Test database is unavailable: {e}')
+        async_session = sessionmaker(
+            engine, class_=AsyncSession, expire_on_commit=False
+        )
+        try:
+            async with async_session() as db:
+                await scenario(db)
+        finally:
+            await engine.dispose()
+
+    asyncio.run(main())
+
+
+async def create_user(db: AsyncSession) -> int:
+    user = models.User(
+        username='alex', hashed_password='-', uuid=uuid.uuid4().hex
+    )
+    db.add(user)
+    await db.commit()
+    return user.id
+
+
+def file_in(user_id: int, path: str, digest: str, size: int) -> schemas.File:
+    return schemas.File(
+        path=path,
+        size=size,
+        user_id=user_id,
+        uuid=uuid.uuid4().hex,
+        mime_type='text/plain',
+        blob_digest=digest * 64,
+        stored_size=size,
+    )
+
+
+async def folder_totals(db: AsyncSession, user_id: int) -> dict:
+    statement = select(
+        models.Folder.path, models.Folder.size, models.Folder.files_count
+    ).where(models.Folder.user_id == user_id)
+    return {
+        path: (size, count)
+        for path, size, count in await db.execute(statement)
+    }
+
+
+async def ref_counts(db: AsyncSession) -> dict:
+    statement = select(models.Blob.digest, models.Blob.ref_count)
+    return {
+        digest[0]: count for digest, count in await db.execute(statement)
+    }
+
+
+async def assert_consistent(db: AsyncSession, user_id: int) -> None:
+    files = (await db.execute(
+        select(
+            models.File.path, models.File.size,
+            models.File.blob_digest, models.File.folder_id
+        ).where(models.File.user_id == user_id)
+    )).all()
+    folders = {
+        path: (folder_id, parent_id, size, count)
+        for folder_id, parent_id, path, size, count in await db.execute(
+            select(
+                models.Folder.id, models.Folder.parent_id,
+                models.Folder.path, models.Folder.size,
+                models.Folder.files_count
+            ).where(models.Folder.user_id == user_id)
+        )
+    }
+
+    usage = await user_crud.get_usage(db, user_id)
+    assert (usage.used_bytes, usage.files_count) == (
+        sum(file.size for file in files), len(files)
+    )
+
+    for path, (_, parent_id, size, count) in folders.items():
+        inside = [
+            file for file in files if file.path.startswith(path + '/')
+        ]
+        assert (size, count) == (
+            sum(file.size for file in inside), len(inside)
+        ), path
+        parent = parent_folder(path)
+        assert parent_id == (folders[parent][0] if parent else None), path
+
+    for file in files:
+        assert set(folder_paths(file.path)) <= set(folders), file.path
+        parent = parent_folder(file.path)
+        assert file.folder_id == (
+            folders[parent][0] if parent else None
+        ), file.path
+
+    referenced = Counter(file.blob_digest for file in files)
+    for digest, ref_count in (await db.execute(
+        select(models.Blob.digest, models.Blob.ref_count)
+    )).all():
+        assert ref_count == referenced[digest], digest
+
+
+def test_upload_and_overwrite_keep_counters():
+    async def scenario(db: AsyncSession) -> None:
+        user_id = await create_user(db)
+        await file_crud.bulk_create_or_update(db, [
+            file_in(user_id, 'a/b/1.txt', 'a', 10),
+            file_in(user_id, 'a/2.txt', 'a', 10),
+            file_in(user_id, 'c.txt', 'b', 5),
+        ])
+        await assert_consistent(db, user_id)
+        assert await folder_totals(db, user_id) == {
+            'a': (20, 2), 'a/b': (10, 1)
+        }
+        assert await ref_counts(db) == {'a': 2, 'b': 1}
+
+        await file_crud.create_or_update(
+            db, file_in(user_id, 'a/b/1.txt', 'c', 30)
+        )
+        await assert_consistent(db, user_id)
+        assert await folder_totals(db, user_id) == {
+            'a': (40, 2), 'a/b': (30, 1)
+        }
+        assert await ref_counts(db) == {'a': 1, 'b': 1, 'c': 1}
+
+    run_in_db(scenario)
+
+
+def test_move_and_copy_keep_counters():
+    async def scenario(db: AsyncSession) -> None:
+        user_id = await create_user(db)
+        await file_crud.bulk_create_or_update(db, [
+            file_in(user_id, 'a/b/1.txt', 'a', 10),
+            file_in(user_id, 'a/2.txt', 'b', 5),
+            file_in(user_id, 'd/3.txt', 'c', 1),
+        ])
+
+        await file_crud.move(db, user_id, 'a', 'x/y', is_folder=True)
+        await assert_consistent(db, user_id)
+        totals = await folder_totals(db, user_id)
+        assert 'a' not in totals
+        assert totals['x'] == totals['x/y'] == (15, 2)
+
+        await file_crud.move(db, user_id, 'd/3.txt', 'x/3.txt', False)
+        await assert_consistent(db, user_id)
+        assert (await folder_totals(db, user_id))['d'] == (0, 0)
+
+        result = await file_crud.copy(db, user_id, 'x', 'z', is_folder=True)
+        assert (result.files_count, result.size) == (3, 16)
+        await assert_consistent(db, user_id)
+        assert await ref_counts(db) == {'a': 2, 'b': 2, 'c': 2}
+
+        await file_crud.copy(db, user_id, 'z/3.txt', '3.txt', False)
+        await assert_consistent(db, user_id)
+        usage = await user_crud.get_usage(db, user_id)
+        assert (usage.used_bytes, usage.files_count) == (33, 7)
+
+    run_in_db(scenario)
+
+
+def test_remove_releases_blobs():
+    async def scenario(db: AsyncSession) -> None:
+        user_id = await create_user(db)
+        await file_crud.bulk_create_or_update(db, [
+            file_in(user_id, 'a/b/1.txt', 'a', 10),
+            file_in(user_id, 'a/2.txt', 'a', 10),
+            file_in(user_id, 'c.txt', 'b', 5),
+        ])
+
+        await file_crud.remove(db, user_id, 'a/2.txt', is_folder=False)
+        await assert_consistent(db, user_id)
+        assert await ref_counts(db) == {'a': 1, 'b': 1}
+
+        result, legacy = await file_crud.remove(
+            db, user_id, 'a', is_folder=True
+        )
+        assert (result.files_count, result.size, legacy) == (1, 10, [])
+        await assert_consistent(db, user_id)
+        assert await folder_totals(db, user_id) == {}
+
+        assert await blob_crud.reap(db) == ['a' * 64]
+        await db.commit()
+        assert await ref_counts(db) == {'b': 1}
+
+    run_in_db(scenario)
+
+
+def test_blobs_are_written_before_the_file_is_committed():
+    async def scenario(db: AsyncSession) -> None:
+        user_id = await create_user(db)
+        written = []
+
+        async def write_blobs(encodings):
+            # Запись о файле еще не видна другим транзакциям
+            async with AsyncSession(db.bind) as other:
+                assert await file_crud.path_exists(
+                    other, user_id, 'a.txt'
+                ) is False
+            written.append(encodings)
+
+        await file_crud.create_or_update(
+            db, file_in(user_id, 'a.txt', 'a', 10), write_blobs
+        )
+        assert written == [{'a' * 64: None}]
+
+        async def fail(encodings):
+            raise OSError('storage is unavailable')
+
+        with pytest.raises(OSError):
+            await file_crud.create_or_update(
+                db, file_in(user_id, 'b.txt', 'b', 5), fail
+            )
+        await db.rollback()
+        await assert_consistent(db, user_id)
+        assert await ref_counts(db) == {'a': 1}
+
+    run_in_db(scenario)
+
+
+def test_jobs_are_enqueued_with_the_upload():
+    async def scenario(db: AsyncSession) -> None:
+        user_id = await create_user(db)
+        queue = JobQueue()
+
+        @queue.register('noop')
+        async def noop(db, file):
+            pass
+
+        file, _ = await file_crud.create_or_update(
+            db, file_in(user_id, 'a.txt', 'a', 10), enqueue_jobs=queue.enqueue
+        )
+        assert file.processing_status == 'pending'
+        jobs = (await db.execute(
+            select(models.Job.file_id, models.Job.kind, models.Job.status)
+        )).all()
+        assert jobs == [(file.id, 'noop', 'pending')]
+        user = await db.get(models.User, user_id, populate_existing=True)
+        assert user.files_version == 1
+        db.expunge(file)
+        stored = await db.get(models.File, file.id)
+        assert stored.processing_status == 'pending'
+
+    run_in_db(scenario)
+
+
+def test_stream_multi_releases_the_connection_between_pages(monkeypatch):
+    async def scenario(db: AsyncSession) -> None:
+        user_id = await create_user(db)
+        await file_crud.bulk_create_or_update(db, [
+            file_in(user_id, f'a/{n}.txt', 'a', n) for n in range(5)
+        ])
+        monkeypatch.setattr(file_crud, 'STREAM_BATCH_SIZE', 2)
+        params = schemas.FileFilter(
+            path='a', mime_type=None, min_size=None, max_size=None,
+            order_by='path', order='asc', cursor=None, limit=None
+        )
+
+        paths = []
+        async for file in file_crud.stream_multi(db, user_id, params):
+            assert not db.in_transaction()
+            paths.append(file.path)
+        assert paths == [f'a/{n}.txt' for n in range(5)]
+
+        params.limit = 3
+        assert [
+            file.size
+            async for file in file_crud.stream_multi(db, user_id, params)
+        ] == [0, 1, 2]
+
+    run_in_db(scenario)
@@ -15,7 +15,7 @@ TEST_USER = {
 
 
 async def override_get_session() -> AsyncSession:
-    engine = create_async_engine(SQLALCHEMY_DATABASE_URL, echo=True, future=True)
+    engine = create_async_engine(SQLALCHEMY_DATABASE_URL, echo=False, future=True)
 
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.drop_all)
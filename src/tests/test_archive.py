@@ -0,0 +1,91 @@
+import asyncio
+import calendar
+import io
+import tarfile
+import time
+import zipfile
+from datetime import datetime
+
+import pytest
+
+from services import archive
+from services.archive import ArchiveEntry, iter_tar_gz, iter_zip
+from services.compression import OFFLOAD_THRESHOLD
+
+CONTENT = {
+    'docs/a.txt': b'hello' * 1000,
+    'docs/sub/b.bin': bytes(range(256)) * 300,
+    'docs/empty.txt': b'',
+    # Чанки этого файла сжимаются в пуле потоков
+    'docs/large.bin': bytes(range(256)) * 1024,
+}
+
+
+@pytest.fixture(autouse=True)
+def fake_storage(monkeypatch):
+    def iter_content(entry):
+        async def chunks():
+            data = CONTENT[entry.key]
+            step = OFFLOAD_THRESHOLD if len(data) > OFFLOAD_THRESHOLD \
+                else 1000
+            for i in range(0, len(data), step):
+                yield data[i:i + step]
+        return chunks()
+
+    monkeypatch.setattr(archive, '_iter_content', iter_content)
+
+
+async def entries():
+    for name, data in CONTENT.items():
+        yield ArchiveEntry(name, name, len(data), datetime(2023, 6, 1, 12))
+
+
+def build(iter_archive, level) -> bytes:
+    async def collect():
+        return b''.join([chunk async for chunk in iter_archive(
+            entries(), level
+        )])
+    return asyncio.run(collect())
+
+
+@pytest.mark.parametrize('level', [0, 6])
+def test_zip_round_trip(level):
+    with zipfile.ZipFile(io.BytesIO(build(iter_zip, level))) as result:
+        assert result.testzip() is None
+        assert {name: result.read(name) for name in result.namelist()} \
+            == CONTENT
+        assert result.getinfo('docs/a.txt').date_time == (
+            2023, 6, 1, 12, 0, 0
+        )
+
+
+@pytest.mark.parametrize('level', [0, 9])
+def test_tar_gz_round_trip(level):
+    with tarfile.open(
+        fileobj=io.BytesIO(build(iter_tar_gz, level)), mode='r:gz'
+    ) as result:
+        assert {
+            member.name: result.extractfile(member).read()
+            for member in result.getmembers()
+        } == CONTENT
+
+
+def test_tar_gz_mtime_is_utc(monkeypatch):
+    monkeypatch.setenv('TZ', 'Asia/Tokyo')
+    time.tzset()
+    try:
+        data = build(iter_tar_gz, 6)
+    finally:
+        monkeypatch.undo()
+        time.tzset()
+    with tarfile.open(fileobj=io.BytesIO(data), mode='r:gz') as result:
+        assert result.getmember('docs/a.txt').mtime == \
+            calendar.timegm((2023, 6, 1, 12, 0, 0))
+
+
+def test_zip_uses_compression_level():
+    def compressed_size(level):
+        with zipfile.ZipFile(io.BytesIO(build(iter_zip, level))) as result:
+            return result.getinfo('docs/sub/b.bin').compress_size
+
+    assert compressed_size(1) > compressed_size(9)
@@ -0,0 +1,38 @@
+import os
+
+from benchmarks.compare import compare
+from benchmarks.stats import peak_rss, percentile, summarize
+
+
+def test_percentile_nearest_rank():
+    values = [0.1 * i for i in range(1, 101)]
+    assert percentile(values, 50) == values[49]
+    assert percentile(values, 99) == values[98]
+    assert percentile([], 99) == 0.0
+
+
+def test_summarize():
+    stats = summarize([0.01, 0.02, 0.03, 0.04], errors=1, elapsed=2.0,
+                      bytes_total=4 * 1024 * 1024)
+    assert stats['requests'] == 4
+    assert stats['errors'] == 1
+    assert stats['throughput_rps'] == 2.0
+    assert stats['throughput_mb_s'] == 2.0
+    assert stats['latency_p50_ms'] == 20.0
+    assert stats['latency_p99_ms'] == 40.0
+
+
+def test_peak_rss_of_current_process():
+    rss = peak_rss(os.getpid())
+    assert rss is None or rss > 0
+
+
+def test_compare_reports_relative_change():
+    old = {'results': {'upload': {'1024': summarize([0.1], 0, 1.0)}}}
+    new = {'results': {'upload': {'1024': summarize([0.05], 0, 0.5)}}}
+    lines = compare(old, new)
+    assert any(
+        'upload.1024' in line and 'throughput_rps' in line
+        and '+100.0%' in line
+        for line in lines
+    )
@@ -0,0 +1,39 @@
+from services.cache import TTLCache
+
+
+class FakeTimer:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_ttl_and_stale():
+    timer = FakeTimer()
+    cache: TTLCache[str, int] = TTLCache(
+        maxsize=10, ttl=10, stale_ttl=5, timer=timer
+    )
+    cache.set('alex', 1)
+    assert cache.lookup('alex') == (1, False)
+    timer.now = 12
+    assert cache.lookup('alex') == (1, True)
+    assert cache.get('alex') is None
+    timer.now = 20
+    assert cache.lookup('alex') == (None, False)
+    assert cache.stats() == {
+        'size': 0, 'hits': 1, 'stale_hits': 2, 'misses': 1
+    }
+
+
+def test_lru_eviction():
+    cache: TTLCache[str, int] = TTLCache(maxsize=2, ttl=10)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+    cache.invalidate('a')
+    assert cache.get('a') is None
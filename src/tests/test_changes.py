@@ -0,0 +1,44 @@
+import asyncio
+
+from services.changes import ChangeNotifier
+
+
+def test_notify_wakes_only_listeners_of_the_user():
+    notifier = ChangeNotifier()
+
+    async def scenario():
+        first = notifier.listen(1)
+        second = notifier.listen(2)
+        assert notifier.listen(1) is first
+        waiter = asyncio.create_task(notifier.wait(1, first, 5))
+        await asyncio.sleep(0)
+        notifier.notify({1})
+        return await waiter, second.is_set()
+
+    woken, other_woken = asyncio.run(scenario())
+    assert woken is True
+    assert other_woken is False
+
+
+def test_notify_before_wait_is_not_lost():
+    notifier = ChangeNotifier()
+
+    async def scenario():
+        event = notifier.listen(1)
+        notifier.notify([1])
+        return await notifier.wait(1, event, 5)
+
+    assert asyncio.run(scenario()) is True
+
+
+def test_wait_times_out_and_forgets_the_listener():
+    notifier = ChangeNotifier()
+
+    async def scenario():
+        event = notifier.listen(1)
+        woken = await notifier.wait(1, event, 0.01)
+        return woken, notifier.listen(1) is event
+
+    woken, reused = asyncio.run(scenario())
+    assert woken is False
+    assert reused is False
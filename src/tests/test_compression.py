@@ -0,0 +1,73 @@
+import asyncio
+import gzip
+from typing import AsyncIterator, List
+
+import pytest
+
+from services import storage as storage_module
+from services.backends import LocalStorage
+from services.compression import (
+    GZIP, accepts_encoding, choose_encoding, decode_stream, encode_stream
+)
+
+CONTENT = b'timestamp,level,message\n' + b'2023-06-01,INFO,ok\n' * 50000
+
+
+async def iter_chunks(data: bytes, size: int = 65536) -> AsyncIterator[bytes]:
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+async def read_all(chunks: AsyncIterator[bytes]) -> bytes:
+    parts: List[bytes] = []
+    async for chunk in chunks:
+        parts.append(chunk)
+    return b''.join(parts)
+
+
+@pytest.mark.parametrize('header, expected', [
+    (None, False),
+    ('gzip', True),
+    ('deflate, gzip;q=0.5', True),
+    ('gzip;q=0', False),
+    ('br, *', True),
+    ('*;q=0.1, gzip;q=0', False),
+    ('identity', False),
+])
+def test_accepts_encoding(header, expected):
+    assert accepts_encoding(header, GZIP) is expected
+
+
+def test_choose_encoding_by_mime_type():
+    assert choose_encoding('text/csv') == GZIP
+    assert choose_encoding('application/json') == GZIP
+    assert choose_encoding('image/png') is None
+    assert choose_encoding(None) is None
+
+
+def test_gzip_stream_round_trip():
+    encoded = asyncio.run(read_all(encode_stream(iter_chunks(CONTENT), GZIP)))
+    assert len(encoded) < len(CONTENT) // 10
+    assert gzip.decompress(encoded) == CONTENT
+    decoded = asyncio.run(read_all(decode_stream(iter_chunks(encoded), GZIP)))
+    assert decoded == CONTENT
+
+
+def test_stage_and_commit_compressed_blob(tmp_path, monkeypatch):
+    local = LocalStorage(str(tmp_path))
+    monkeypatch.setattr(storage_module, 'storage', local)
+    monkeypatch.setattr(storage_module, 'TMP_STORAGE', str(tmp_path / 'tmp'))
+
+    async def scenario():
+        staged = await storage_module.stage_stream(
+            iter_chunks(CONTENT), GZIP
+        )
+        assert staged.size == len(CONTENT)
+        assert staged.stored_size < staged.size
+        # Блоб уже записан в базе данных без сжатия
+        await storage_module.commit_upload(staged, None)
+        key = storage_module.blob_key(staged.digest)
+        assert await read_all(local.get(key)) == CONTENT
+        assert await read_all(storage_module.read_blob(key, None)) == CONTENT
+
+    asyncio.run(scenario())
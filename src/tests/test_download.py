@@ -0,0 +1,69 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from fastapi import Request
+
+from exceptions.api import RangeNotSatisfiableError
+from services import download
+from services.download import parse_range
+
+
+@pytest.mark.parametrize('header, expected', [
+    ('bytes=0-99', (0, 99)),
+    ('bytes=100-', (100, 999)),
+    ('bytes=-100', (900, 999)),
+    ('bytes=900-5000', (900, 999)),
+    ('bytes=0-1,5-6', None),
+    ('items=0-1', None),
+    ('bytes=abc', None),
+])
+def test_parse_range(header, expected):
+    assert parse_range(header, 1000) == expected
+
+
+def test_parse_range_not_satisfiable():
+    with pytest.raises(RangeNotSatisfiableError):
+        parse_range('bytes=1000-', 1000)
+
+
+@pytest.mark.parametrize('start, length', [
+    (0, 2500), (0, 1), (999, 2), (1000, 1000), (1234, 1266), (2499, 1),
+])
+def test_decoded_range_slicing(monkeypatch, start, length):
+    content = bytes(range(250)) * 10
+
+    def read_blob(key, encoding):
+        async def chunks():
+            for i in range(0, len(content), 1000):
+                yield content[i:i + 1000]
+        return chunks()
+
+    monkeypatch.setattr(download, 'read_blob', read_blob)
+
+    async def collect():
+        return b''.join([
+            chunk async for chunk in download._iter_decoded(
+                'key', 'gzip', start, length
+            )
+        ])
+
+    assert asyncio.run(collect()) == content[start:start + length]
+
+
+def test_not_modified_does_not_touch_storage(monkeypatch):
+    async def stat(key):
+        raise AssertionError('storage must not be touched')
+
+    monkeypatch.setattr(download.storage, 'stat', stat)
+    request = Request({
+        'type': 'http',
+        'headers': [(b'if-none-match', b'"abc"')],
+    })
+    response = asyncio.run(download.file_response(
+        request, 'key', 'text/plain',
+        etag='"abc"', last_modified=datetime(2023, 6, 1, 12)
+    ))
+    assert response.status_code == 304
+    assert response.headers['etag'] == '"abc"'
+    assert response.headers['last-modified'] == 'Thu, 01 Jun 2023 12:00:00 GMT'
@@ -0,0 +1,39 @@
+from sqlalchemy.dialects import postgresql
+
+from models.base import File
+from services.db import folder_paths, parent_folder, rebase, subtree
+
+
+def test_folder_paths_lists_ancestors_from_root():
+    assert folder_paths('a/b/c.txt') == ['a', 'a/b']
+    assert folder_paths('/a/b/c.txt') == ['/a', '/a/b']
+    assert folder_paths('c.txt') == []
+
+
+def test_empty_components_do_not_form_folders():
+    assert folder_paths('a//c.txt') == ['a']
+    assert folder_paths('/c.txt') == []
+
+
+def test_parent_folder():
+    assert parent_folder('a/b/c.txt') == 'a/b'
+    assert parent_folder('a/b') == 'a'
+    assert parent_folder('c.txt') is None
+
+
+def _compile(clause):
+    return clause.compile(
+        dialect=postgresql.dialect(paramstyle='named'),
+        compile_kwargs={'literal_binds': True}
+    ).string
+
+
+def test_subtree_escapes_like_wildcards():
+    sql = _compile(subtree(File.__table__.c.path, 'a_b%'))
+    assert "files.path = 'a_b%'" in sql
+    assert "LIKE 'a/_b/%//' || '%' ESCAPE '/'" in sql
+
+
+def test_rebase_replaces_prefix():
+    sql = _compile(rebase(File.__table__.c.path, 'a/b', 'c'))
+    assert sql == "'c' || substr(files.path, 4)"
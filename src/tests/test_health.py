@@ -0,0 +1,68 @@
+import asyncio
+
+from services.health import HealthChecker
+
+
+class FakeTimer:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_probes_run_concurrently_and_failures_are_reported():
+    calls = []
+
+    async def slow():
+        calls.append('slow')
+        await asyncio.sleep(0.05)
+        return {'ok': 1}
+
+    async def hanging():
+        await asyncio.sleep(10)
+
+    async def broken():
+        raise ConnectionRefusedError
+
+    checker = HealthChecker(
+        {'slow': slow, 'hanging': hanging, 'broken': broken},
+        ttl=1, timeout=0.1
+    )
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        results = await checker.check()
+        return results, loop.time() - start
+
+    results, elapsed = asyncio.run(scenario())
+    assert elapsed < 0.5
+    assert results['slow'].ok and results['slow'].details == {'ok': 1}
+    assert results['slow'].latency >= 0.05
+    assert not results['hanging'].ok and 'Timed out' in results['hanging'].error
+    assert not results['broken'].ok and results['broken'].latency is None
+
+
+def test_results_are_cached_and_shared_between_callers():
+    calls = 0
+    timer = FakeTimer()
+
+    async def probe():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+
+    checker = HealthChecker({'db': probe}, ttl=2, timeout=1, timer=timer)
+
+    async def scenario():
+        await asyncio.gather(*(checker.check() for _ in range(10)))
+        assert calls == 1
+        timer.now = 1
+        await checker.check()
+        assert calls == 1
+        timer.now = 3
+        await checker.check()
+        assert calls == 2
+
+    asyncio.run(scenario())
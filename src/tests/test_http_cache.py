@@ -0,0 +1,40 @@
+from datetime import datetime
+
+import pytest
+
+from services.http_cache import etag_matches, http_date, is_not_modified
+
+MODIFIED = datetime(2023, 6, 1, 12, 0, 0)
+MODIFIED_TS = 1685620800
+
+
+@pytest.mark.parametrize('header, expected', [
+    ('"abc"', True),
+    ('W/"abc"', True),
+    ('"x", "abc"', True),
+    ('*', True),
+    ('"abd"', False),
+])
+def test_etag_matches(header, expected):
+    assert etag_matches(header, '"abc"') is expected
+
+
+def test_http_date():
+    assert http_date(MODIFIED) == 'Thu, 01 Jun 2023 12:00:00 GMT'
+
+
+@pytest.mark.parametrize('headers, expected', [
+    ({}, False),
+    ({'if-none-match': '"abc"'}, True),
+    ({'if-none-match': '"old"'}, False),
+    ({'if-modified-since': 'Thu, 01 Jun 2023 12:00:00 GMT'}, True),
+    ({'if-modified-since': 'Thu, 01 Jun 2023 11:59:59 GMT'}, False),
+    ({'if-modified-since': 'garbage'}, False),
+    # If-None-Match имеет приоритет над If-Modified-Since
+    ({
+        'if-none-match': '"old"',
+        'if-modified-since': 'Thu, 01 Jun 2023 12:00:00 GMT'
+    }, False),
+])
+def test_is_not_modified(headers, expected):
+    assert is_not_modified(headers, '"abc"', MODIFIED_TS) is expected
@@ -0,0 +1,71 @@
+from types import SimpleNamespace
+
+from services.jobs import JobQueue
+from services.sniffing import corrected_mime_type, sniff_mime_type
+
+
+def test_retry_delay_grows_exponentially_up_to_limit():
+    queue = JobQueue(backoff=10, backoff_max=100)
+    assert [queue.retry_delay(n) for n in range(1, 6)] == [
+        10, 20, 40, 80, 100
+    ]
+
+
+def test_register_adds_handler():
+    queue = JobQueue()
+
+    @queue.register('noop')
+    async def noop(db, file):
+        pass
+
+    assert queue.handlers == {'noop': noop}
+
+
+def test_select_jobs_applies_filters():
+    queue = JobQueue()
+
+    @queue.register('any')
+    async def any_file(db, file):
+        pass
+
+    def is_image(file):
+        return file.mime_type.startswith('image/')
+
+    @queue.register('image', accepts=is_image)
+    async def image_file(db, file):
+        pass
+
+    image = SimpleNamespace(mime_type='image/png')
+    text = SimpleNamespace(mime_type='text/plain')
+    assert queue.select_jobs([image, text], ['any', 'image']) == [
+        (image, 'any'), (text, 'any'), (image, 'image')
+    ]
+
+
+def test_sniff_mime_type_by_signature():
+    assert sniff_mime_type(b'\x89PNG\r\n\x1a\n' + b'\x00' * 8) == 'image/png'
+    assert sniff_mime_type(b'\xff\xd8\xff\xe0') == 'image/jpeg'
+    assert sniff_mime_type(b'RIFF\x00\x00\x00\x00WEBPVP8 ') == 'image/webp'
+    assert sniff_mime_type(b'\x00\x00\x00\x18ftypheic') == 'image/heic'
+    assert sniff_mime_type(b'\x00\x00\x00\x18ftypisom') == 'video/mp4'
+    assert sniff_mime_type(b'plain text') is None
+    assert sniff_mime_type(b'') is None
+
+
+def test_corrected_mime_type():
+    assert corrected_mime_type('image/png', 'image/jpeg') == 'image/jpeg'
+    assert corrected_mime_type('image/png', 'image/png') is None
+    assert corrected_mime_type('text/plain', None) is None
+    assert corrected_mime_type(
+        'application/octet-stream', 'application/zip'
+    ) == 'application/zip'
+    # docx — zip-контейнер, заявленный тип точнее
+    docx = (
+        'application/vnd.openxmlformats-officedocument'
+        '.wordprocessingml.document'
+    )
+    assert corrected_mime_type(docx, 'application/zip') is None
+    assert corrected_mime_type('audio/mp4', 'video/mp4') is None
+    assert corrected_mime_type('image/png', 'application/zip') == (
+        'application/zip'
+    )
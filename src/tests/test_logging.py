@@ -0,0 +1,52 @@
+import logging
+import queue
+import sys
+
+import orjson
+from uvicorn.logging import AccessFormatter
+
+from core.logger import JsonFormatter, LocalQueueHandler
+
+
+def test_json_formatter_includes_extra_fields():
+    record = logging.LogRecord(
+        'db.query', logging.WARNING, __file__, 1, 'Slow %s', ('query',), None
+    )
+    record.duration_ms = 12.5
+    data = orjson.loads(JsonFormatter().format(record))
+    assert data['level'] == 'WARNING'
+    assert data['logger'] == 'db.query'
+    assert data['message'] == 'Slow query'
+    assert data['duration_ms'] == 12.5
+    assert 'args' not in data
+
+
+def test_json_formatter_serializes_exceptions():
+    try:
+        raise ValueError('boom')
+    except ValueError:
+        record = logging.LogRecord(
+            'app', logging.ERROR, __file__, 1, 'failed', None,
+            sys.exc_info()
+        )
+    data = orjson.loads(JsonFormatter().format(record))
+    assert 'ValueError: boom' in data['exc_info']
+
+
+def test_queued_access_record_keeps_args():
+    access_args = ('127.0.0.1:5000', 'GET', '/api/v1/ping', '1.1', 200)
+    log_queue = queue.SimpleQueue()
+    record = logging.LogRecord(
+        'uvicorn.access', logging.INFO, __file__, 1,
+        '%s - "%s %s HTTP/%s" %d', access_args, None
+    )
+    LocalQueueHandler(log_queue).handle(record)
+    queued = log_queue.get_nowait()
+    line = AccessFormatter(
+        fmt='%(client_addr)s - %(request_line)s %(status_code)s',
+        use_colors=False
+    ).format(queued)
+    assert line == '127.0.0.1:5000 - GET /api/v1/ping HTTP/1.1 200 OK'
+    data = orjson.loads(JsonFormatter().format(queued))
+    assert data['path'] == '/api/v1/ping'
+    assert data['status_code'] == 200
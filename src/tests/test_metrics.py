@@ -0,0 +1,64 @@
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+from core.metrics import MetricsMiddleware, observe_query, stage
+
+app = FastAPI()
+app.add_middleware(MetricsMiddleware)
+
+
+@app.post('/echo/{name}')
+async def echo(name: str, request: Request) -> dict:
+    with stage('test_echo'):
+        body = await request.body()
+    return {'name': name, 'size': len(body)}
+
+
+def sample(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_middleware_records_latency_and_bytes_per_route():
+    client = TestClient(app)
+    before_in = sample(
+        'mydisk_http_request_bytes_total', route='/echo/{name}'
+    )
+    response = client.post('/echo/a', content=b'x' * 100)
+    assert response.status_code == 200
+
+    assert sample(
+        'mydisk_http_request_duration_seconds_count',
+        method='POST', route='/echo/{name}', status='200'
+    ) >= 1
+    assert sample(
+        'mydisk_http_request_bytes_total', route='/echo/{name}'
+    ) - before_in == 100
+    assert sample(
+        'mydisk_http_response_bytes_total', route='/echo/{name}'
+    ) >= len(response.content)
+    assert sample(
+        'mydisk_stage_duration_seconds_count', stage='test_echo'
+    ) >= 1
+    assert sample('mydisk_http_requests_in_flight') == 0
+
+
+def test_unmatched_routes_share_one_label():
+    client = TestClient(app)
+    client.get('/missing/1')
+    client.get('/missing/2')
+    assert sample(
+        'mydisk_http_request_duration_seconds_count',
+        method='GET', route='unmatched', status='404'
+    ) >= 2
+
+
+def test_observe_query_groups_by_operation():
+    observe_query('  select 1', 0.001)
+    observe_query('VACUUM', 0.001)
+    assert sample(
+        'mydisk_db_query_duration_seconds_count', operation='SELECT'
+    ) >= 1
+    assert sample(
+        'mydisk_db_query_duration_seconds_count', operation='OTHER'
+    ) >= 1
@@ -0,0 +1,26 @@
+from datetime import datetime
+
+import pytest
+
+from exceptions.api import CursorError
+from services.db import decode_cursor, encode_cursor
+
+
+@pytest.mark.parametrize('order_by, value', [
+    ('created_at', datetime(2023, 6, 8, 14, 48, 26, 30450)),
+    ('size', 8512),
+    ('path', 'homework/test-folder/notes.txt'),
+])
+def test_cursor_roundtrip(order_by, value):
+    cursor = encode_cursor(value, 42)
+    assert decode_cursor(cursor, order_by) == (value, 42)
+
+
+@pytest.mark.parametrize('cursor, order_by', [
+    ('not-a-cursor', 'created_at'),
+    (encode_cursor('abc', 1), 'size'),
+    (encode_cursor(10, 1), 'created_at'),
+])
+def test_invalid_cursor(cursor, order_by):
+    with pytest.raises(CursorError):
+        decode_cursor(cursor, order_by)
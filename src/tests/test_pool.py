@@ -0,0 +1,49 @@
+import asyncio
+
+import pytest
+from sqlalchemy.exc import TimeoutError
+from sqlalchemy.util import greenlet_spawn
+
+from db.pool import MeteredQueuePool
+
+
+class FakeConnection:
+    def rollback(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+def test_metered_pool_counts_waits_and_timeouts():
+    async def scenario():
+        pool = MeteredQueuePool(
+            FakeConnection, pool_size=1, max_overflow=0, timeout=0.01
+        )
+        first = await greenlet_spawn(pool.connect)
+        assert pool.waits == 0
+        assert pool.exhausted()
+
+        with pytest.raises(TimeoutError):
+            await greenlet_spawn(pool.connect)
+        assert pool.waits == 1
+        assert pool.timeouts == 1
+        assert pool.max_wait_time >= 0.01
+
+        loop = asyncio.get_running_loop()
+        loop.call_later(0.005, first.close)
+        second = await greenlet_spawn(pool.connect)
+        assert pool.waits == 2
+        assert pool.timeouts == 1
+        assert pool.stats()['checked_out'] == 1
+        await greenlet_spawn(second.close)
+
+    asyncio.run(scenario())
+
+
+def test_recreated_pool_keeps_limits():
+    pool = MeteredQueuePool(FakeConnection, pool_size=2, max_overflow=3)
+    recreated = pool.recreate()
+    assert isinstance(recreated, MeteredQueuePool)
+    assert recreated.max_overflow == 3
+    assert recreated.size() == 2
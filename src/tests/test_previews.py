@@ -0,0 +1,89 @@
+import asyncio
+import io
+from types import SimpleNamespace
+
+import pytest
+
+from services.previews import PreviewGenerator, render_preview
+from services.storage import preview_key
+
+
+def make_file(**kwargs):
+    defaults = {
+        'blob_digest': 'ab' * 32,
+        'mime_type': 'image/png',
+        'size': 1024,
+    }
+    defaults.update(kwargs)
+    return SimpleNamespace(**defaults)
+
+
+def test_preview_key_is_sharded_by_digest():
+    digest = 'abcd' + 'e' * 60
+    assert preview_key(digest, 256, 'webp') == \
+        f'previews/ab/cd/{digest}/256.webp'
+
+
+def test_supports_only_raster_images_within_size_limit():
+    generator = PreviewGenerator(pool=None, max_source_size=2048)
+    assert generator.supports(make_file())
+    assert not generator.supports(make_file(mime_type='image/svg+xml'))
+    assert not generator.supports(make_file(mime_type='text/plain'))
+    assert not generator.supports(make_file(mime_type=None))
+    assert not generator.supports(make_file(blob_digest=None))
+    assert not generator.supports(make_file(size=4096))
+
+
+def test_render_preview_fits_into_square():
+    Image = pytest.importorskip('PIL.Image')
+    source = io.BytesIO()
+    Image.new('RGBA', (400, 200), (255, 0, 0, 0)).save(source, 'PNG')
+    content = render_preview(source.getvalue(), 100, 'jpeg', 80)
+    with Image.open(io.BytesIO(content)) as preview:
+        assert preview.format == 'JPEG'
+        assert preview.size == (100, 50)
+
+
+def test_render_preview_rejects_broken_image():
+    pytest.importorskip('PIL')
+    with pytest.raises(ValueError):
+        render_preview(b'not an image', 100, 'webp', 80)
+
+
+def test_source_is_read_after_taking_a_pool_slot(monkeypatch):
+    from services import previews
+    from services.workers import WorkerPool
+
+    pool = WorkerPool(concurrency=1)
+    generator = PreviewGenerator(pool)
+    reads = []
+
+    async def read_source(file):
+        reads.append(pool.running)
+        return bytearray(b'image')
+
+    async def put(key, chunks):
+        pass
+
+    async def add(db, *args):
+        pass
+
+    async def scenario():
+        monkeypatch.setattr(generator, '_read_source', read_source)
+        monkeypatch.setattr(previews.storage, 'put', put)
+        monkeypatch.setattr(
+            previews, 'preview_crud', SimpleNamespace(add=add)
+        )
+        monkeypatch.setattr(previews, 'render_preview', lambda *args: b'')
+        async with pool.slot():
+            task = asyncio.create_task(
+                generator._render('key', make_file(), 64, 'jpeg')
+            )
+            await asyncio.sleep(0.01)
+            assert reads == []
+            assert pool.waiting == 1
+        await task
+        assert reads == [1]
+
+    asyncio.run(scenario())
+    pool.shutdown()
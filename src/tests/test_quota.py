@@ -0,0 +1,58 @@
+import asyncio
+
+from core.config import app_settings
+from services import quota
+from services.cache import TTLCache
+from services.db import quota_limit
+from services.quota import UPLOAD_PATH, exceeds_quota
+
+
+def test_quota_limit_falls_back_to_default(monkeypatch):
+    monkeypatch.setattr(app_settings, 'user_quota_bytes', 100)
+    assert quota_limit(None) == 100
+    assert quota_limit(50) == 50
+    # 0 — без ограничений
+    assert quota_limit(0) is None
+    monkeypatch.setattr(app_settings, 'user_quota_bytes', 0)
+    assert quota_limit(None) is None
+
+
+def test_exceeds_quota():
+    assert not exceeds_quota(90, None, 10 ** 12)
+    assert not exceeds_quota(90, 100, 10)
+    assert exceeds_quota(90, 100, 11)
+
+
+def test_only_upload_paths_are_checked():
+    prefix = app_settings.api_v1_prefix
+    assert UPLOAD_PATH.match(f'{prefix}/files/upload')
+    assert UPLOAD_PATH.match(f'{prefix}/files/upload/batch')
+    assert UPLOAD_PATH.match(f'{prefix}/files/uploads/abc/parts/3')
+    assert not UPLOAD_PATH.match(f'{prefix}/files/uploads')
+    assert not UPLOAD_PATH.match(f'{prefix}/files/uploads/abc/complete')
+    assert not UPLOAD_PATH.match(f'{prefix}/files')
+
+
+def test_quotas_enabled_uses_cached_check(monkeypatch):
+    monkeypatch.setattr(app_settings, 'user_quota_bytes', 0)
+    monkeypatch.setattr(quota, '_quotas_cache', TTLCache(maxsize=1, ttl=60))
+    quota._quotas_cache.set('enabled', False)
+    # Кэш заполнен, база данных не запрашивается
+    monkeypatch.setattr(quota, 'async_session', None)
+    assert not asyncio.run(quota.quotas_enabled())
+    monkeypatch.setattr(app_settings, 'user_quota_bytes', 100)
+    assert asyncio.run(quota.quotas_enabled())
+
+
+def test_middleware_skips_lookup_without_quotas(monkeypatch):
+    async def disabled():
+        return False
+
+    monkeypatch.setattr(quota, 'quotas_enabled', disabled)
+    monkeypatch.setattr(quota, 'user_from_token', None)
+    middleware = quota.QuotaMiddleware(app=None)
+    scope = {'headers': [
+        (b'content-length', b'100'),
+        (b'authorization', b'Bearer token'),
+    ]}
+    assert not asyncio.run(middleware._rejected(scope))
@@ -0,0 +1,79 @@
+import asyncio
+import socket
+from typing import AsyncIterator, List
+
+import pytest
+
+from services.backends import LocalStorage, S3Storage, StorageBackend
+
+CONTENT = bytes(range(256)) * 64 * 1024
+
+
+async def iter_chunks(data: bytes, size: int = 65536) -> AsyncIterator[bytes]:
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+async def read_all(chunks: AsyncIterator[bytes]) -> bytes:
+    parts: List[bytes] = []
+    async for chunk in chunks:
+        parts.append(chunk)
+    return b''.join(parts)
+
+
+async def check_backend(storage: StorageBackend) -> None:
+    key = 'blobs/ab/cd/abcdef'
+    assert await storage.stat(key) is None
+    await storage.put(key, iter_chunks(CONTENT))
+
+    stat = await storage.stat(key)
+    assert stat is not None
+    assert stat.size == len(CONTENT)
+    assert await read_all(storage.get(key)) == CONTENT
+    assert await read_all(storage.get(key, 100, 1000)) == CONTENT[100:1100]
+
+    await storage.delete(key)
+    assert not await storage.exists(key)
+    await storage.close()
+
+
+def test_local_storage(tmp_path):
+    asyncio.run(check_backend(LocalStorage(str(tmp_path))))
+
+
+def test_local_storage_put_file(tmp_path):
+    storage = LocalStorage(str(tmp_path / 'root'))
+    local_file = tmp_path / 'upload.part'
+    local_file.write_bytes(b'content')
+
+    asyncio.run(storage.put_file('blobs/00/00/0000', str(local_file)))
+
+    assert not local_file.exists()
+    assert (tmp_path / 'root/blobs/00/00/0000').read_bytes() == b'content'
+
+
+def test_s3_storage():
+    moto_server = pytest.importorskip('moto.server')
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    server = moto_server.ThreadedMotoServer(ip_address='127.0.0.1', port=port)
+    server.start()
+    try:
+        storage = S3Storage(
+            bucket='mydisk',
+            endpoint_url=f'http://127.0.0.1:{port}',
+            access_key='test',
+            secret_key='test',
+            region='us-east-1',
+            part_size=S3Storage.MIN_PART_SIZE,
+        )
+
+        async def run() -> None:
+            client = await storage._get_client()
+            await client.create_bucket(Bucket='mydisk')
+            await check_backend(storage)
+
+        asyncio.run(run())
+    finally:
+        server.stop()
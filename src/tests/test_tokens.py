@@ -0,0 +1,50 @@
+import asyncio
+from datetime import timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from exceptions.auth import CredentialException
+from services import auth
+
+
+@pytest.fixture(autouse=True)
+def clear_token_cache():
+    auth.token_cache.clear()
+    yield
+    auth.token_cache.clear()
+
+
+def test_embedded_claims_skip_database_and_decode_once(monkeypatch):
+    token = auth.create_access_token(
+        {'sub': 'alex'}, timedelta(minutes=5),
+        user=SimpleNamespace(id=7, uuid='abc')
+    )
+    decode = auth.jwt.decode
+    calls = []
+
+    def counting_decode(*args, **kwargs):
+        calls.append(1)
+        return decode(*args, **kwargs)
+
+    monkeypatch.setattr(auth.jwt, 'decode', counting_decode)
+    for _ in range(3):
+        user = asyncio.run(auth.get_current_user(token, db=None))
+        assert (user.username, user.id, user.uuid) == ('alex', 7, 'abc')
+    assert len(calls) == 1
+
+
+def test_tokens_from_older_epoch_are_rejected(monkeypatch):
+    token = auth.create_access_token({'sub': 'alex'}, timedelta(minutes=5))
+    monkeypatch.setattr(auth, 'TOKEN_EPOCH', auth.TOKEN_EPOCH + 1)
+    with pytest.raises(CredentialException):
+        auth.decode_token(token)
+
+
+def test_expired_and_forged_tokens_are_rejected():
+    expired = auth.create_access_token({'sub': 'alex'}, timedelta(seconds=-1))
+    with pytest.raises(CredentialException):
+        auth.decode_token(expired)
+    with pytest.raises(CredentialException):
+        auth.decode_token(expired[:-2] + 'xx')
+    assert len(auth.token_cache) == 0